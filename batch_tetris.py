@@ -0,0 +1,301 @@
+"""Пакетный тетрис на NumPy: N полей шагают одновременно.
+
+Поля хранятся одним массивом (N, height, width), а проверки столкновений,
+фиксация фигур, очистка линий и подсчёт очков выполняются векторно для
+всех полей сразу. Правила совпадают с BitboardTetris (и Tetris), что
+проверяет verify_against_scalar:
+
+    python batch_tetris.py --boards 512 --steps 2000
+
+Нужен numpy (pip install numpy); боту он не требуется.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from bitboard_tetris import (
+    BitboardTetris, LINE_SCORES, ROTATIONS, SHAPES,
+    LEFT, RIGHT, DOWN, ROTATE, DROP, HARD_DROP
+)
+
+# Действия: по одному на поле за шаг (коды общие с BitboardTetris.apply)
+ACTIONS = ("noop", "left", "right", "down", "rotate", "drop", "hard_drop")
+
+
+def _build_cells():
+    # CELLS[kind, rot] = 4 клетки фигуры как (dy, dx); у всех фигур по 4 клетки
+    cells = np.zeros((len(SHAPES), 4, 4, 2), dtype=np.int16)
+    for kind, rotations in enumerate(ROTATIONS):
+        for rotation, (matrix, _, _) in enumerate(rotations):
+            cells[kind, rotation] = [
+                (dy, dx) for dy, row in enumerate(matrix) for dx, cell in enumerate(row) if cell
+            ]
+    return cells
+
+
+CELLS = _build_cells()
+SPAWN_WIDTH = np.array([rotations[0][2] for rotations in ROTATIONS], dtype=np.int16)
+SCORE_TABLE = np.array(LINE_SCORES, dtype=np.int64)
+
+
+class BatchTetris:
+    """N независимых игр с векторным шагом step(actions).
+
+    Действия совпадают с методами движка: LEFT/RIGHT/DOWN — move(±1, 0) и
+    move(0, 1), ROTATE — rotate_piece(), DROP — drop() (фиксирует фигуру,
+    если ниже некуда), HARD_DROP — hard_drop(). Фигуры берутся из
+    piece_queue (N, K), если она задана, иначе из генератора NumPy.
+    """
+
+    def __init__(self, n, width=10, height=20, seed=None, piece_queue=None):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.piece_queue = None if piece_queue is None else np.asarray(piece_queue, dtype=np.int8)
+        self._queue_pos = np.zeros(n, dtype=np.int64)
+        self._all = np.arange(n)
+
+        self.board = np.zeros((n, height, width), dtype=bool)
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.rotation = np.zeros(n, dtype=np.int8)
+        self.piece_x = np.zeros(n, dtype=np.int16)
+        self.piece_y = np.zeros(n, dtype=np.int16)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.level = np.ones(n, dtype=np.int32)
+        self.lines_cleared = np.zeros(n, dtype=np.int32)
+        self.game_over = np.zeros(n, dtype=bool)
+        self._spawn(self._all)
+
+    # ===== ФИГУРЫ =====
+    def _next_kinds(self, idx):
+        if self.piece_queue is None:
+            return self.rng.integers(0, len(SHAPES), size=len(idx), dtype=np.int8)
+        kinds = self.piece_queue[idx, self._queue_pos[idx]]
+        self._queue_pos[idx] += 1
+        return kinds
+
+    def _spawn(self, idx):
+        """new_piece() для полей idx"""
+        if len(idx) == 0:
+            return
+        kinds = self._next_kinds(idx)
+        self.kind[idx] = kinds
+        self.rotation[idx] = 0
+        self.piece_x[idx] = self.width // 2 - SPAWN_WIDTH[kinds] // 2
+        self.piece_y[idx] = 0
+        fits = self._fits(idx, kinds, self.rotation[idx], self.piece_x[idx], self.piece_y[idx])
+        self.game_over[idx[~fits]] = True
+
+    def _fits(self, idx, kinds, rotations, xs, ys):
+        """Помещается ли фигура в позицию на полях idx (векторный _fits)"""
+        cells = CELLS[kinds, rotations]
+        cy = ys[:, None] + cells[:, :, 0]
+        cx = xs[:, None] + cells[:, :, 1]
+        inside = (cx >= 0) & (cx < self.width) & (cy < self.height)
+        # Клетки выше поля разрешены и ни с чем не сталкиваются
+        on_board = inside & (cy >= 0)
+        occupied = self.board[
+            idx[:, None], np.clip(cy, 0, self.height - 1), np.clip(cx, 0, self.width - 1)
+        ] & on_board
+        return inside.all(axis=1) & ~occupied.any(axis=1)
+
+    # ===== ДЕЙСТВИЯ =====
+    def _move(self, idx, dx, dy):
+        idx = idx[~self.game_over[idx]]
+        fits = self._fits(idx, self.kind[idx], self.rotation[idx],
+                          self.piece_x[idx] + dx, self.piece_y[idx] + dy)
+        moved = idx[fits]
+        self.piece_x[moved] += dx
+        self.piece_y[moved] += dy
+        return idx[~fits]
+
+    def _rotate(self, idx):
+        # Как rotate_piece: проверки на конец игры нет
+        rotations = (self.rotation[idx] + 1) % 4
+        fits = self._fits(idx, self.kind[idx], rotations, self.piece_x[idx], self.piece_y[idx])
+        self.rotation[idx[fits]] = rotations[fits]
+
+    def _hard_drop(self, idx):
+        idx = idx[~self.game_over[idx]]
+        falling = idx
+        # Не больше height шагов, каждый — для всех ещё падающих полей сразу
+        while len(falling):
+            fits = self._fits(falling, self.kind[falling], self.rotation[falling],
+                              self.piece_x[falling], self.piece_y[falling] + 1)
+            falling = falling[fits]
+            self.piece_y[falling] += 1
+        return idx
+
+    def _lock(self, idx):
+        """Фиксирует фигуры, очищает линии, начисляет очки и выдаёт новые фигуры"""
+        if len(idx) == 0:
+            return np.zeros(0, dtype=np.int32)
+        cells = CELLS[self.kind[idx], self.rotation[idx]]
+        cy = self.piece_y[idx, None] + cells[:, :, 0]
+        cx = self.piece_x[idx, None] + cells[:, :, 1]
+        visible = (cy >= 0) & (cy < self.height)
+        rows = np.broadcast_to(idx[:, None], cy.shape)
+        self.board[rows[visible], cy[visible], cx[visible]] = True
+
+        boards = self.board[idx]
+        full = boards.all(axis=2)
+        cleared = full.sum(axis=1).astype(np.int32)
+        if cleared.any():
+            # Полные строки уходят наверх (стабильно) и обнуляются
+            order = np.argsort(~full, axis=1, kind="stable")
+            boards = np.take_along_axis(boards, order[:, :, None], axis=1)
+            boards[np.arange(self.height)[None, :] < cleared[:, None]] = False
+            self.board[idx] = boards
+            self.score[idx] += SCORE_TABLE[np.minimum(cleared, 4)] * self.level[idx]
+            self.lines_cleared[idx] += cleared
+            self.level[idx] = self.lines_cleared[idx] // 10 + 1
+
+        self._spawn(idx)
+        return cleared
+
+    def step(self, actions):
+        """Применяет по действию к каждому полю; возвращает число очищенных линий"""
+        actions = np.asarray(actions)
+        cleared = np.zeros(self.n, dtype=np.int32)
+        self._move(self._all[actions == LEFT], -1, 0)
+        self._move(self._all[actions == RIGHT], 1, 0)
+        self._move(self._all[actions == DOWN], 0, 1)
+        self._rotate(self._all[actions == ROTATE])
+        locked = self._move(self._all[actions == DROP], 0, 1)
+        locked = np.concatenate([locked, self._hard_drop(self._all[actions == HARD_DROP])])
+        cleared[locked] = self._lock(locked)
+        return cleared
+
+    def reset(self, idx=None):
+        """Начинает заново игры idx (по умолчанию все)"""
+        idx = self._all if idx is None else np.asarray(idx)
+        self.board[idx] = False
+        self.score[idx] = 0
+        self.level[idx] = 1
+        self.lines_cleared[idx] = 0
+        self.game_over[idx] = False
+        self._spawn(idx)
+
+    def set_rows(self, i, rows):
+        """Заполняет поле i битовыми масками строк (как BitboardTetris.rows)"""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.board[i] = (rows[:, None] >> np.arange(self.width)) & 1
+
+    def row_masks(self, i):
+        """Строки поля i как битовые маски, в формате BitboardTetris.rows"""
+        weights = 1 << np.arange(self.width, dtype=np.int64)
+        return [int(value) for value in (self.board[i] * weights).sum(axis=1)]
+
+
+# ===== СВЕРКА СО СКАЛЯРНЫМ ДВИЖКОМ =====
+class _ScriptedRandom:
+    """Выдаёт BitboardTetris фигуры из заранее заданной очереди"""
+
+    def __init__(self, kinds):
+        self._kinds = iter(kinds)
+
+    def randrange(self, n):
+        return next(self._kinds)
+
+
+def _apply_scalar(tetris, action):
+    if action == LEFT:
+        tetris.move(-1, 0)
+    elif action == RIGHT:
+        tetris.move(1, 0)
+    elif action == DOWN:
+        tetris.move(0, 1)
+    elif action == ROTATE:
+        tetris.rotate_piece()
+    elif action == DROP:
+        tetris.drop()
+    elif action == HARD_DROP:
+        tetris.hard_drop()
+
+
+def _state_of_scalar(tetris):
+    return (tetris.rows, tetris.kind, tetris.rotation, tetris.piece_x, tetris.piece_y,
+            tetris.score, tetris.level, tetris.lines_cleared, tetris.game_over)
+
+
+def _state_of_batch(batch, i):
+    return (batch.row_masks(i), int(batch.kind[i]), int(batch.rotation[i]), int(batch.piece_x[i]),
+            int(batch.piece_y[i]), int(batch.score[i]), int(batch.level[i]),
+            int(batch.lines_cleared[i]), bool(batch.game_over[i]))
+
+
+def _add_garbage(rng, batch, scalar, idx, garbage_rows):
+    """Нижние строки полей idx — заполненные, с одной дыркой (чтобы линии чистились часто)"""
+    width, height = batch.width, batch.height
+    full_row = (1 << width) - 1
+    for i in idx:
+        holes = rng.integers(0, width, size=garbage_rows)
+        rows = [0] * (height - garbage_rows) + [full_row & ~(1 << int(hole)) for hole in holes]
+        batch.set_rows(i, rows)
+        scalar[i].rows = rows
+
+
+def verify_against_scalar(boards=256, steps=2000, width=10, height=20, seed=0, garbage_rows=8):
+    """Гоняет BatchTetris и BitboardTetris на одних фигурах и действиях.
+
+    Поля начинаются с garbage_rows строк «мусора» с дыркой, поэтому
+    очистка линий и очки проверяются постоянно. Закончившиеся игры
+    перезапускаются в обоих движках. При первом расхождении бросает
+    AssertionError с номером поля и шага.
+    """
+    rng = np.random.default_rng(seed)
+    # Каждая фиксация и каждый перезапуск берут одну фигуру
+    queue = rng.integers(0, len(SHAPES), size=(boards, 2 * steps + 2), dtype=np.int8)
+    batch = BatchTetris(boards, width, height, piece_queue=queue)
+    scalar = [BitboardTetris(width, height, rng=_ScriptedRandom(queue[i].tolist())) for i in range(boards)]
+    # Перемещения чаще, чем падения: так поля успевают заполниться
+    weights = np.array([1, 4, 4, 3, 3, 2, 1], dtype=float)
+    weights /= weights.sum()
+    _add_garbage(rng, batch, scalar, range(boards), garbage_rows)
+
+    lines = 0
+    for step in range(steps):
+        actions = rng.choice(len(ACTIONS), size=boards, p=weights)
+        lines += int(batch.step(actions).sum())
+        for i, tetris in enumerate(scalar):
+            _apply_scalar(tetris, actions[i])
+
+        over = np.flatnonzero(batch.game_over)
+        batch.reset(over)
+        for i in over:
+            scalar[i].reset()
+        _add_garbage(rng, batch, scalar, over, garbage_rows)
+
+        for i, tetris in enumerate(scalar):
+            expected = _state_of_scalar(tetris)
+            actual = _state_of_batch(batch, i)
+            assert actual == expected, (
+                f"Расхождение на поле {i}, шаг {step}, действие {ACTIONS[actions[i]]}: "
+                f"{actual} != {expected}"
+            )
+    return {"boards": boards, "steps": steps, "lines_cleared": lines}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сверка BatchTetris со скалярным движком и его скорость")
+    parser.add_argument("--boards", type=int, default=256)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("Сверка:", verify_against_scalar(args.boards, args.steps, seed=args.seed))
+
+    batch = BatchTetris(args.boards, seed=args.seed)
+    actions = np.random.default_rng(args.seed).integers(0, len(ACTIONS), size=(args.steps, args.boards))
+    started = time.perf_counter()
+    for step_actions in actions:
+        batch.step(step_actions)
+        batch.reset(np.flatnonzero(batch.game_over))
+    elapsed = time.perf_counter() - started
+    print(f"Скорость: {args.boards * args.steps / elapsed:.0f} шагов полей в секунду")
+
+
+if __name__ == "__main__":
+    main()
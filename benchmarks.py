@@ -0,0 +1,455 @@
+"""Бенчмарки движка, рендера, хранилища отношений, обработчиков тетриса и запуска бота.
+
+    python benchmarks.py --output bench.json
+    python benchmarks.py --baseline bench.json --threshold 0.2
+
+Результат — JSON с медианой и минимумом наносекунд на операцию. С
+--baseline бенчмарки, ставшие медленнее больше чем на threshold,
+перечисляются в "regressions", и скрипт завершается с кодом 1.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = []
+
+
+def benchmark(name, ops):
+    """Регистрирует фабрику бенчмарка: она готовит состояние и возвращает
+    функцию (или корутину-функцию), выполняющую ops операций"""
+    def decorator(factory):
+        BENCHMARKS.append((name, ops, factory))
+        return factory
+    return decorator
+
+
+def measure(factory, ops, repeat, loop):
+    samples = []
+    for _ in range(repeat):
+        run = factory(ops)
+        started = time.perf_counter()
+        if asyncio.iscoroutinefunction(run):
+            loop.run_until_complete(run())
+        else:
+            run()
+        samples.append((time.perf_counter() - started) / ops * 1e9)
+    return {
+        "ops": ops,
+        "repeat": repeat,
+        "ns_per_op_median": round(statistics.median(samples), 1),
+        "ns_per_op_min": round(min(samples), 1),
+    }
+
+
+# ===== ДВИЖОК =====
+def _record_stream(length, seed=1):
+    """«Записанная» партия: типичная последовательность ходов игрока"""
+    rng = random.Random(seed)
+    stream = []
+    while len(stream) < length:
+        stream += ["rotate"] * rng.randrange(3)
+        step = rng.choice((-1, 1))
+        stream += ["left" if step < 0 else "right"] * rng.randrange(5)
+        stream += ["down"] * rng.randrange(3)
+        stream.append("drop")
+    return stream[:length]
+
+
+def _apply(tetris, action):
+    if action == "left":
+        tetris.move(-1, 0)
+    elif action == "right":
+        tetris.move(1, 0)
+    elif action == "down":
+        tetris.drop()
+    elif action == "rotate":
+        tetris.rotate_piece()
+    elif action == "drop":
+        tetris.hard_drop()
+    if tetris.game_over:
+        tetris.reset()
+
+
+@benchmark("engine_recorded_stream", 20000)
+def bench_engine_recorded(ops):
+    from bitboard_tetris import BitboardTetris
+    stream = _record_stream(ops)
+    tetris = BitboardTetris(rng=random.Random(1))
+
+    def run():
+        for action in stream:
+            _apply(tetris, action)
+    return run
+
+
+@benchmark("engine_random_stream", 20000)
+def bench_engine_random(ops):
+    from bitboard_tetris import BitboardTetris
+    rng = random.Random(2)
+    actions = ("left", "right", "down", "rotate", "drop")
+    tetris = BitboardTetris(rng=random.Random(2))
+
+    def run():
+        for _ in range(ops):
+            _apply(tetris, rng.choice(actions))
+    return run
+
+
+@benchmark("engine_move", 50000)
+def bench_engine_move(ops):
+    from bitboard_tetris import BitboardTetris
+    tetris = BitboardTetris(rng=random.Random(3))
+
+    def run():
+        dx = 1
+        for _ in range(ops):
+            if not tetris.move(dx, 0):
+                dx = -dx
+    return run
+
+
+@benchmark("engine_rotate_piece", 50000)
+def bench_engine_rotate(ops):
+    from bitboard_tetris import BitboardTetris
+    tetris = BitboardTetris(rng=random.Random(4))
+
+    def run():
+        for _ in range(ops):
+            tetris.rotate_piece()
+    return run
+
+
+@benchmark("engine_drop", 50000)
+def bench_engine_drop(ops):
+    from bitboard_tetris import BitboardTetris
+    tetris = BitboardTetris(rng=random.Random(5))
+
+    def run():
+        for _ in range(ops):
+            tetris.drop()
+            if tetris.game_over:
+                tetris.reset()
+    return run
+
+
+@benchmark("engine_clear_lines", 20000)
+def bench_engine_clear_lines(ops):
+    from bitboard_tetris import BitboardTetris
+    tetris = BitboardTetris(rng=random.Random(6))
+    # Четыре полных строки под неровной кучей; время включает восстановление поля
+    rows = [0] * 12 + [0b0110011001, 0b1111011111, 0b1011111101, 0b1111111110] + [tetris.full_row] * 4
+
+    def run():
+        for _ in range(ops):
+            tetris.rows = list(rows)
+            tetris.clear_lines()
+    return run
+
+
+@benchmark("replay_seek", 2000)
+def bench_replay_seek(ops):
+    from bitboard_tetris import LEFT, RIGHT, DOWN, ROTATE, DROP, HARD_DROP, RESET
+    from replay import Replay, recorded_game
+    rng = random.Random(8)
+    game = recorded_game(seed=8)
+    for _ in range(20000):
+        game.apply(RESET if game.game_over else rng.choice((LEFT, RIGHT, DOWN, ROTATE, DROP, HARD_DROP)))
+    # Ключевые кадры строятся вне замера; одна операция — состояние на случайном шаге
+    replay = Replay(game.log)
+    steps = [rng.randrange(len(replay) + 1) for _ in range(ops)]
+
+    def run():
+        for step in steps:
+            replay.game_at(step)
+    return run
+
+
+def bench_engine_batch(ops):
+    import numpy as np
+    from batch_tetris import ACTIONS, BatchTetris
+    batch = BatchTetris(1024, seed=9)
+    actions = np.random.default_rng(9).integers(0, len(ACTIONS), size=(ops, batch.n))
+
+    def run():
+        for step_actions in actions:
+            batch.step(step_actions)
+            batch.reset(np.flatnonzero(batch.game_over))
+    return run
+
+
+# Пакетный движок нужен только при установленном numpy; одна операция — шаг 1024 полей
+if importlib.util.find_spec("numpy") is not None:
+    benchmark("engine_batch_step_1024", 200)(bench_engine_batch)
+
+
+# ===== РЕНДЕР =====
+def _positions(count, seed=7):
+    """Состояния поля из настоящей партии, чтобы рендер видел реальные изменения"""
+    from bitboard_tetris import BitboardTetris
+    tetris = BitboardTetris(rng=random.Random(seed))
+    states = []
+    for action in _record_stream(count, seed):
+        _apply(tetris, action)
+        states.append(tetris.to_bytes())
+    return [BitboardTetris.from_bytes(state) for state in states]
+
+
+@benchmark("render_board", 2000)
+def bench_render(ops):
+    from board_renderer import BoardRenderer
+    renderer = BoardRenderer()
+    games = _positions(ops)
+
+    def run():
+        for tetris in games:
+            renderer.render(tetris)
+    return run
+
+
+def _bench_encode(image_format):
+    def factory(ops):
+        from board_renderer import BoardRenderer
+        renderer = BoardRenderer(image_format=image_format)
+        images = [renderer.render(tetris).copy() for tetris in _positions(ops)]
+
+        def run():
+            for image in images:
+                renderer.encode(image)
+        return run
+    return factory
+
+
+benchmark("encode_png", 300)(_bench_encode("PNG"))
+benchmark("encode_webp", 300)(_bench_encode("WEBP"))
+
+
+def _bench_pygame_frame(full_redraw):
+    def factory(ops):
+        # Окно без дисплея: считаются отрисовка и update, но не вывод на экран
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame
+        from tetris_app import BoardView
+        pygame.init()
+        games = _positions(ops)
+        width, height = games[0].width, games[0].height
+        screen = pygame.display.set_mode((width * 30 + 40, height * 30 + 190))
+        view = BoardView(screen, width, height)
+
+        def run():
+            for tetris in games:
+                if full_redraw:
+                    tetris.draw(screen)
+                    pygame.display.flip()
+                else:
+                    pygame.display.update(view.draw(tetris))
+        return run
+    return factory
+
+
+# Окно TetrisApp на pygame; одна операция — кадр: вся поверхность или грязные прямоугольники
+if importlib.util.find_spec("pygame") is not None:
+    benchmark("pygame_frame_full", 300)(_bench_pygame_frame(True))
+    benchmark("pygame_frame_dirty", 300)(_bench_pygame_frame(False))
+
+
+# ===== ОТНОШЕНИЯ И АДМИНИСТРАТОРЫ =====
+RELATION_SIZES = (10, 1000, 10000, 100000)
+
+
+def _relation_files(size, directory):
+    rng = random.Random(size)
+    relations = {}
+    for i in range(size):
+        if i % 2:
+            relations[str(100000000 + i)] = {"relation": "friend", "username": None}
+        else:
+            relations[f"username_user{i}"] = {"relation": "sister", "username": f"User{i}"}
+    admins = {"admins": [f"admin{i}" for i in range(max(1, size // 100))]}
+    relations_file = os.path.join(directory, f"relations_{size}.json")
+    admins_file = os.path.join(directory, f"admins_{size}.json")
+    with open(relations_file, "w", encoding="utf-8") as f:
+        json.dump(relations, f)
+    with open(admins_file, "w", encoding="utf-8") as f:
+        json.dump(admins, f)
+
+    # Поровну: поиск по id, по username и промахи
+    lookups = []
+    for _ in range(1000):
+        i = rng.randrange(size)
+        kind = rng.randrange(3)
+        if kind == 0:
+            lookups.append((str(100000000 + (i | 1)), None))
+        elif kind == 1:
+            lookups.append(("1", f"user{i & ~1}"))
+        else:
+            lookups.append(("2", f"stranger{i}"))
+    return relations_file, admins_file, lookups
+
+
+def _bench_relations(size, directory):
+    def factory(ops):
+        import hearts
+        from relation_repo import RelationRepository, AdminRepository
+        relations_file, admins_file, lookups = _relation_files(size, directory)
+        relations = RelationRepository(relations_file)
+        hearts._repositories = (relations, AdminRepository(admins_file, hearts.MAIN_ADMIN))
+        # Файлы читаются при первом обращении — загрузку не замеряем
+        relations.find("0", None)
+        hearts.is_admin("nobody")
+
+        async def run():
+            for i in range(ops):
+                user_id, username = lookups[i % len(lookups)]
+                await hearts.find_user_relation(user_id, username)
+                hearts.is_admin(username)
+        return run
+    return factory
+
+
+# ===== ОБРАБОТЧИКИ =====
+class _InlineEdits:
+    """Вместо планировщика правок: отправка сразу, без ожидания лимитов Telegram"""
+
+    def __init__(self):
+        self.pending = []
+
+    def request(self, chat_id, send) -> None:
+        self.pending.append(send)
+
+    def cancel(self, chat_id) -> None:
+        pass
+
+
+def _bench_handlers():
+    def factory(ops):
+        import main
+        from telegram import Update
+        from telegram.ext import Application, CallbackContext
+        from fake_bot import FakeBotApi, make_fake_bot
+
+        api = FakeBotApi()
+        application = Application.builder().bot(make_fake_bot(api)).updater(None).build()
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(application.initialize())
+        edits = _InlineEdits()
+        main.edit_scheduler = edits
+
+        chat_id = 1000
+        user = {"id": chat_id, "is_bot": False, "first_name": "Bench"}
+        chat = {"id": chat_id, "type": "private"}
+        start = Update.de_json({"update_id": 1, "message": {
+            "message_id": 1, "date": 0, "chat": chat, "from": user, "text": "/tetris"
+        }}, application.bot)
+        loop.run_until_complete(main.start_tetris(start, CallbackContext.from_update(start, application)))
+        message_id = application.chat_data[chat_id]["tetris_message"]
+
+        stream = _record_stream(ops, seed=8)
+        updates = [
+            Update.de_json({"update_id": i + 2, "callback_query": {
+                "id": str(i), "from": user, "chat_instance": "1", "data": action,
+                "message": {"message_id": message_id, "date": 0, "chat": chat, "from": user},
+            }}, application.bot)
+            for i, action in enumerate(stream)
+        ]
+
+        async def run():
+            for update in updates:
+                await main.button_handler(update, CallbackContext.from_update(update, application))
+                while edits.pending:
+                    await edits.pending.pop()()
+        return run
+    return factory
+
+
+# ===== ЗАПУСК =====
+@benchmark("startup_import_main", 10)
+def bench_startup_import(ops):
+    # Холодный импорт main в новом интерпретаторе — то, что ждет перезапуск бота
+    main_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def run():
+        for _ in range(ops):
+            subprocess.run([sys.executable, "-c", "import main"], cwd=main_dir, check=True)
+    return run
+
+
+def register_io_benchmarks(directory, quick):
+    sizes = RELATION_SIZES[:-1] if quick else RELATION_SIZES
+    for size in sizes:
+        label = f"{size // 1000}k" if size >= 1000 else str(size)
+        benchmark(f"relations_lookup_{label}", 20000)(_bench_relations(size, directory))
+    benchmark("handler_button_to_board", 500)(_bench_handlers())
+
+
+def compare(results, baseline, threshold):
+    """Бенчмарки, медиана которых выросла больше чем на threshold"""
+    regressions = {}
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        ratio = result["ns_per_op_median"] / before["ns_per_op_median"]
+        if ratio > 1 + threshold:
+            regressions[name] = round(ratio, 3)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--baseline", help="JSON прошлого запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление, доля")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="меньше операций, без 100k отношений")
+    parser.add_argument("--filter", default="", help="только бенчмарки, в имени которых есть подстрока")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="tetris-bench-")
+    # main читает конфигурацию при импорте: без сети, без гравитации, игры во временной базе
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:FAKE")
+    os.environ["GAMES_DB"] = os.path.join(directory, "games.sqlite3")
+    os.environ["LEADERBOARD_DB"] = os.path.join(directory, "leaderboard.sqlite3")
+    os.environ["TETRIS_GRAVITY"] = "0"
+    register_io_benchmarks(directory, args.quick)
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = {}
+    for name, ops, factory in BENCHMARKS:
+        if args.filter not in name:
+            continue
+        if args.quick:
+            ops = max(1, ops // 10)
+        results[name] = measure(factory, ops, args.repeat, loop)
+        print(f"{name}: {results[name]['ns_per_op_median']} нс/оп", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.threshold)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
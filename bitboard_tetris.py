@@ -0,0 +1,323 @@
+import random
+import struct
+
+# Фигуры в том же порядке и виде, что и в Tetris.new_piece
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[0, 1, 0], [1, 1, 1]],  # T
+    [[0, 1, 1], [1, 1, 0]],  # S
+    [[1, 1, 0], [0, 1, 1]],  # Z
+    [[1, 0, 0], [1, 1, 1]],  # J
+    [[0, 0, 1], [1, 1, 1]]   # L
+]
+
+LINE_SCORES = [0, 100, 300, 500, 800]
+
+# Действия для apply(): один байт в журнале ходов (replay.ActionLog).
+# Первые семь совпадают с действиями BatchTetris
+NOOP, LEFT, RIGHT, DOWN, ROTATE, DROP, HARD_DROP, PAUSE, RESET = range(9)
+ACTION_NAMES = ("noop", "left", "right", "down", "rotate", "drop", "hard_drop", "pause", "reset")
+
+# Заголовок снимка: версия, ширина, высота, счет, уровень, линии,
+# флаги (пауза/конец игры/есть состояние ГСЧ), фигура, поворот, x и y
+# фигуры, состояние PieceRandom
+SNAPSHOT_HEADER = struct.Struct("<BBBIHIBBBbbQ")
+SNAPSHOT_VERSION = 2
+# Версия 1 — без состояния ГСЧ; такие снимки еще лежат в старых базах
+SNAPSHOT_HEADER_V1 = struct.Struct("<BBBIHIBBBbb")
+
+MASK64 = (1 << 64) - 1
+
+
+def game_status(tetris) -> str:
+    """Статус для палитры и ключа кадра: play, paused или over"""
+    if tetris.game_over:
+        return "over"
+    if tetris.paused:
+        return "paused"
+    return "play"
+
+
+class PieceRandom:
+    """Генератор фигур на splitmix64: всё состояние — одно 64-битное число.
+
+    Состояние попадает в снимок, поэтому игра после пробуждения и при
+    повторе из журнала получает ту же последовательность фигур.
+    """
+
+    __slots__ = ("state",)
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & MASK64
+
+    def next(self) -> int:
+        self.state = z = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def randrange(self, n) -> int:
+        # Смещение от остатка при n = 7 — порядка 2^-61, им можно пренебречь
+        return self.next() % n
+
+
+def _rotate(matrix):
+    """Поворот по часовой стрелке, как в Tetris.rotate_piece"""
+    return [[matrix[y][x] for y in range(len(matrix) - 1, -1, -1)]
+            for x in range(len(matrix[0]))]
+
+
+def _row_masks(matrix):
+    """Переводит матрицу фигуры в кортеж масок строк (бит x = столбец x)"""
+    return tuple(sum(1 << x for x, cell in enumerate(row) if cell) for row in matrix)
+
+
+def _build_rotations():
+    # ROTATIONS[kind][rot] = (матрица, маски строк, ширина)
+    table = []
+    for shape in SHAPES:
+        states = []
+        matrix = shape
+        for _ in range(4):
+            states.append((matrix, _row_masks(matrix), len(matrix[0])))
+            matrix = _rotate(matrix)
+        table.append(tuple(states))
+    return tuple(table)
+
+
+# Таблица поворотов считается один раз при импорте
+ROTATIONS = _build_rotations()
+
+
+class BitboardTetris:
+    """Движок тетриса на битовых масках: строка поля — одно целое число.
+
+    Публичный API совпадает с Tetris из tetris_engine.py, поэтому движок
+    можно подставить и в бота, и в TetrisApp.
+    """
+
+    __slots__ = (
+        "width", "height", "full_row", "rows", "score", "level",
+        "lines_cleared", "game_over", "paused", "kind", "rotation",
+        "piece_x", "piece_y", "rng", "log", "__weakref__"
+    )
+
+    def __init__(self, width=10, height=20, rng=None, seed=None):
+        self.width = width
+        self.height = height
+        self.full_row = (1 << width) - 1
+        # Источник случайности для выбора фигур: свой PieceRandom у каждой игры
+        self.rng = rng or PieceRandom(seed)
+        # Журнал ходов (replay.ActionLog); пишется только через apply()
+        self.log = None
+        self.reset()
+
+    def reset(self):
+        self.rows = [0] * self.height
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.game_over = False
+        self.paused = False
+        self.new_piece()
+
+    def new_piece(self):
+        self.kind = self.rng.randrange(len(SHAPES))
+        self.rotation = 0
+        self.piece_x = self.width // 2 - ROTATIONS[self.kind][0][2] // 2
+        self.piece_y = 0
+
+        if not self.is_valid_position():
+            self.game_over = True
+
+    # ===== СОВМЕСТИМОСТЬ С Tetris =====
+    @property
+    def board(self):
+        """Поле в виде списка списков 0/1, как Tetris.board"""
+        return [[(row >> x) & 1 for x in range(self.width)] for row in self.rows]
+
+    @property
+    def current_piece(self):
+        return ROTATIONS[self.kind][self.rotation][0]
+
+    def draw(self, screen, cell_size=30, padding=20):
+        """Отрисовка через Tetris.draw; pygame импортируется только здесь"""
+        from tetris_engine import Tetris
+        Tetris.draw(self, screen, cell_size, padding)
+
+    def get_board_image(self):
+        """PNG/WebP кадра для бота (безголовый рендерер на Pillow)"""
+        from board_renderer import get_renderer
+        return get_renderer().render_bytes(self)
+
+    def get_state_text(self):
+        status = "🟢 Играем" if not self.paused and not self.game_over else \
+                 "⏸ Пауза" if self.paused else \
+                 "🔴 Игра окончена"
+        return (
+            f"Счет: {self.score}\n"
+            f"Уровень: {self.level}\n"
+            f"Линий: {self.lines_cleared}\n"
+            f"Статус: {status}"
+        )
+
+    # ===== ЛОГИКА =====
+    def _fits(self, masks, x, y):
+        if x < 0:
+            return False
+        rows = self.rows
+        for dy, mask in enumerate(masks):
+            shifted = mask << x
+            if shifted & ~self.full_row:
+                return False
+            row_y = y + dy
+            if row_y >= self.height:
+                return False
+            if row_y >= 0 and rows[row_y] & shifted:
+                return False
+        return True
+
+    def is_valid_position(self, x_offset=0, y_offset=0):
+        masks = ROTATIONS[self.kind][self.rotation][1]
+        return self._fits(masks, self.piece_x + x_offset, self.piece_y + y_offset)
+
+    def rotate_piece(self):
+        rotation = (self.rotation + 1) % 4
+        if self._fits(ROTATIONS[self.kind][rotation][1], self.piece_x, self.piece_y):
+            self.rotation = rotation
+
+    def move(self, dx, dy):
+        if not self.paused and not self.game_over and self.is_valid_position(x_offset=dx, y_offset=dy):
+            self.piece_x += dx
+            self.piece_y += dy
+            return True
+        return False
+
+    def drop(self):
+        if self.paused or self.game_over:
+            return False
+
+        if self.move(0, 1):
+            return True
+
+        self._lock()
+        return False
+
+    def hard_drop(self):
+        """Мгновенное падение: то же, что `while drop(): pass`, но без лишних вызовов"""
+        if self.paused or self.game_over:
+            return
+        masks = ROTATIONS[self.kind][self.rotation][1]
+        while self._fits(masks, self.piece_x, self.piece_y + 1):
+            self.piece_y += 1
+        self._lock()
+
+    def _lock(self):
+        masks = ROTATIONS[self.kind][self.rotation][1]
+        for dy, mask in enumerate(masks):
+            row_y = self.piece_y + dy
+            if 0 <= row_y < self.height:
+                self.rows[row_y] |= mask << self.piece_x
+
+        self.clear_lines()
+        self.new_piece()
+
+    def clear_lines(self):
+        full = self.full_row
+        remaining = [row for row in self.rows if row != full]
+        cleared = self.height - len(remaining)
+        if cleared > 0:
+            self.rows = [0] * cleared + remaining
+            self.lines_cleared += cleared
+            self.score += LINE_SCORES[min(cleared, 4)] * self.level
+            self.level = self.lines_cleared // 10 + 1
+
+    def apply(self, action):
+        """Выполняет действие по коду (LEFT, ROTATE, DROP...) и пишет его в журнал"""
+        if self.log is not None:
+            self.log.append(action)
+        if action == LEFT:
+            self.move(-1, 0)
+        elif action == RIGHT:
+            self.move(1, 0)
+        elif action == DOWN:
+            self.move(0, 1)
+        elif action == ROTATE:
+            self.rotate_piece()
+        elif action == DROP:
+            self.drop()
+        elif action == HARD_DROP:
+            self.hard_drop()
+        elif action == PAUSE:
+            self.paused = not self.paused
+        elif action == RESET:
+            self.reset()
+        elif action != NOOP:
+            raise ValueError(f"Неизвестное действие: {action}")
+
+    def frame_rows(self):
+        """Строки поля вместе с текущей фигурой (для рендеринга и кэширования)"""
+        rows = list(self.rows)
+        if not self.game_over:
+            for dy, mask in enumerate(ROTATIONS[self.kind][self.rotation][1]):
+                row_y = self.piece_y + dy
+                if 0 <= row_y < self.height:
+                    rows[row_y] |= mask << self.piece_x
+        return tuple(rows)
+
+    # ===== СНИМКИ =====
+    def to_bytes(self) -> bytes:
+        """Компактный бинарный снимок игры вместе с состоянием PieceRandom"""
+        has_state = isinstance(self.rng, PieceRandom)
+        flags = int(self.paused) | int(self.game_over) << 1 | int(has_state) << 2
+        row_bytes = (self.width + 7) // 8
+        header = SNAPSHOT_HEADER.pack(
+            SNAPSHOT_VERSION, self.width, self.height, self.score, self.level,
+            self.lines_cleared, flags, self.kind, self.rotation,
+            self.piece_x, self.piece_y, self.rng.state if has_state else 0
+        )
+        return header + b"".join(row.to_bytes(row_bytes, "little") for row in self.rows)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, rng=None):
+        version = data[0] if data else None
+        if version == SNAPSHOT_VERSION:
+            header = SNAPSHOT_HEADER
+            (version, width, height, score, level, lines_cleared, flags,
+             kind, rotation, piece_x, piece_y, rng_state) = header.unpack_from(data)
+        elif version == 1:
+            header = SNAPSHOT_HEADER_V1
+            (version, width, height, score, level, lines_cleared, flags,
+             kind, rotation, piece_x, piece_y) = header.unpack_from(data)
+            flags &= 3
+        else:
+            raise ValueError(f"Неизвестная версия снимка: {version}")
+
+        game = cls.__new__(cls)
+        game.width = width
+        game.height = height
+        game.full_row = (1 << width) - 1
+        if rng is None:
+            # Без сохраненного состояния (версия 1) игра получает новое зерно
+            rng = PieceRandom(rng_state) if flags & 4 else PieceRandom()
+        game.rng = rng
+        game.log = None
+        row_bytes = (width + 7) // 8
+        offset = header.size
+        game.rows = [
+            int.from_bytes(data[offset + i * row_bytes:offset + (i + 1) * row_bytes], "little")
+            for i in range(height)
+        ]
+        game.score = score
+        game.level = level
+        game.lines_cleared = lines_cleared
+        game.paused = bool(flags & 1)
+        game.game_over = bool(flags & 2)
+        game.kind = kind
+        game.rotation = rotation
+        game.piece_x = piece_x
+        game.piece_y = piece_y
+        return game
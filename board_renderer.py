@@ -0,0 +1,158 @@
+import io
+import os
+import time
+
+from PIL import Image, ImageDraw
+
+from bitboard_tetris import game_status
+
+# Индексы палитры
+EMPTY, GRID, FILLED = 0, 1, 2
+
+# Палитры для разных состояний игры: меняется только палитра, пиксели те же
+PALETTES = {
+    "play": [(40, 40, 60), (70, 70, 90), (255, 0, 0)],
+    "paused": [(25, 25, 35), (45, 45, 55), (120, 60, 60)],
+    "over": [(60, 20, 20), (90, 40, 40), (140, 30, 30)],
+}
+
+
+class RenderStats:
+    """Время последнего рендера/кодирования и накопленные счётчики"""
+
+    def __init__(self):
+        self.frames = 0
+        self.render_ms = 0.0
+        self.encode_ms = 0.0
+        self.dirty_cells = 0
+        self.total_render_ms = 0.0
+        self.total_encode_ms = 0.0
+        self.bytes = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "render_ms": round(self.render_ms, 3),
+            "encode_ms": round(self.encode_ms, 3),
+            "dirty_cells": self.dirty_cells,
+            "bytes": self.bytes,
+            "avg_render_ms": round(self.total_render_ms / self.frames, 3) if self.frames else 0.0,
+            "avg_encode_ms": round(self.total_encode_ms / self.frames, 3) if self.frames else 0.0,
+        }
+
+
+class BoardRenderer:
+    """Безголовый рендерер поля на Pillow.
+
+    Клетки рисуются один раз в виде плиток, фон с сеткой кэшируется.
+    Холст один на размер поля и общий для всех игр: рядом с ним хранится
+    последний нарисованный на нем кадр, и при новом кадре (той же или
+    другой игры) перерисовываются только отличающиеся клетки. Память не
+    растет с числом игр; возвращенный холст действителен до следующего
+    render, хранить его нужно копией.
+    """
+
+    def __init__(self, cell_size=30, padding=20, image_format="PNG"):
+        self.cell_size = cell_size
+        self.padding = padding
+        self.image_format = image_format.upper()
+        self.stats = RenderStats()
+        self._tiles = {EMPTY: self._make_tile(EMPTY), FILLED: self._make_tile(FILLED)}
+        self._backgrounds = {}
+        # (ширина, высота) -> (холст, последний нарисованный на нем кадр)
+        self._canvases = {}
+        # Переиспользуемый буфер для кодирования
+        self._buffer = io.BytesIO()
+        self._palettes = {
+            status: [channel for color in colors for channel in color]
+            for status, colors in PALETTES.items()
+        }
+
+    def _make_tile(self, fill):
+        tile = Image.new("P", (self.cell_size, self.cell_size), fill)
+        ImageDraw.Draw(tile).rectangle(
+            (0, 0, self.cell_size - 1, self.cell_size - 1), outline=GRID
+        )
+        return tile
+
+    def _background(self, width, height):
+        """Фон с пустой сеткой для поля заданного размера"""
+        key = (width, height)
+        if key not in self._backgrounds:
+            size = (width * self.cell_size + self.padding * 2,
+                    height * self.cell_size + self.padding * 2)
+            image = Image.new("P", size, EMPTY)
+            for y in range(height):
+                for x in range(width):
+                    image.paste(self._tiles[EMPTY], self._cell_origin(x, y))
+            self._backgrounds[key] = image
+        return self._backgrounds[key]
+
+    def _cell_origin(self, x, y):
+        return (self.padding + x * self.cell_size, self.padding + y * self.cell_size)
+
+    def render(self, tetris) -> Image.Image:
+        """Рисует текущий кадр игры на общем холсте и возвращает холст"""
+        started = time.perf_counter()
+        rows = tetris.frame_rows()
+
+        key = (tetris.width, len(rows))
+        state = self._canvases.get(key)
+        if state is None:
+            canvas = self._background(*key).copy()
+            previous = (0,) * len(rows)
+        else:
+            canvas, previous = state
+
+        dirty = 0
+        tiles = self._tiles
+        for y, (row, old_row) in enumerate(zip(rows, previous)):
+            changed = row ^ old_row
+            x = 0
+            while changed:
+                if changed & 1:
+                    tile = tiles[FILLED] if (row >> x) & 1 else tiles[EMPTY]
+                    canvas.paste(tile, self._cell_origin(x, y))
+                    dirty += 1
+                changed >>= 1
+                x += 1
+
+        canvas.putpalette(self._palettes[game_status(tetris)])
+        self._canvases[key] = (canvas, rows)
+
+        self.stats.render_ms = (time.perf_counter() - started) * 1000
+        self.stats.total_render_ms += self.stats.render_ms
+        self.stats.dirty_cells = dirty
+        return canvas
+
+    def encode(self, image) -> bytes:
+        """Кодирует изображение в PNG/WebP через переиспользуемый буфер"""
+        started = time.perf_counter()
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        if self.image_format == "WEBP":
+            image.save(buffer, format="WEBP", lossless=True, method=0)
+        else:
+            image.save(buffer, format="PNG", compress_level=1)
+        data = buffer.getvalue()
+
+        self.stats.encode_ms = (time.perf_counter() - started) * 1000
+        self.stats.total_encode_ms += self.stats.encode_ms
+        self.stats.bytes = len(data)
+        self.stats.frames += 1
+        return data
+
+    def render_bytes(self, tetris) -> bytes:
+        return self.encode(self.render(tetris))
+
+
+_renderer = None
+
+
+def get_renderer() -> BoardRenderer:
+    """Общий рендерер процесса, создаётся при первом обращении"""
+    global _renderer
+    if _renderer is None:
+        _renderer = BoardRenderer(image_format=os.getenv("TETRIS_IMAGE_FORMAT", "PNG"))
+    return _renderer
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import RetryAfter
+
+from rate_limit import TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота, ~1 в секунду на чат,
+# 20 в минуту для групп
+GLOBAL_RATE = 30.0
+PRIVATE_CHAT_RATE = 1.0
+GROUP_CHAT_RATE = 20 / 60
+
+
+class EditScheduler:
+    """Планировщик редактирования сообщений с объединением нажатий.
+
+    Ходы применяются к игре сразу, а в каждый чат уходит не больше одного
+    редактирования за min_interval секунд — всегда с последним состоянием.
+    """
+
+    def __init__(self, min_interval=1.0, global_rate=GLOBAL_RATE):
+        self.min_interval = min_interval
+        self.global_bucket = TokenBucket(global_rate)
+        self._chat_buckets = {}
+        # chat_id -> корутина-функция, отправляющая актуальное состояние
+        self._pending = {}
+        self._tasks = {}
+        self._last_sent = {}
+        self.edits_sent = 0
+        self.edits_coalesced = 0
+        self.retries = 0
+        self.errors = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Отрицательные id — группы и каналы, у них лимит строже
+            rate = GROUP_CHAT_RATE if chat_id < 0 else PRIVATE_CHAT_RATE
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, capacity=1)
+        return bucket
+
+    def request(self, chat_id, send) -> None:
+        """Просит показать актуальное состояние чата; send — корутина-функция без аргументов"""
+        if chat_id in self._pending:
+            self.edits_coalesced += 1
+        self._pending[chat_id] = send
+        if chat_id not in self._tasks:
+            self._tasks[chat_id] = asyncio.create_task(self._flush(chat_id))
+
+    def cancel(self, chat_id) -> None:
+        """Отменяет ожидающее редактирование (например, игра завершена)"""
+        self._pending.pop(chat_id, None)
+        task = self._tasks.pop(chat_id, None)
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+
+    def cancel_all(self) -> None:
+        """Отменяет все ожидающие редактирования (при остановке бота)"""
+        for chat_id in list(self._tasks):
+            self.cancel(chat_id)
+
+    async def _flush(self, chat_id):
+        try:
+            while chat_id in self._pending:
+                wait = self._last_sent.get(chat_id, 0.0) + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await self._chat_bucket(chat_id).acquire()
+                await self.global_bucket.acquire()
+
+                send = self._pending.pop(chat_id, None)
+                if send is None:
+                    break
+                try:
+                    await send()
+                    self.edits_sent += 1
+                except RetryAfter as e:
+                    delay = retry_after_seconds(e)
+                    self.retries += 1
+                    logger.warning(f"Лимит Telegram для чата {chat_id}, повтор через {delay} с")
+                    self._chat_bucket(chat_id).block(delay)
+                    # Повторяем, если за это время не пришло более свежее состояние
+                    self._pending.setdefault(chat_id, send)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Ошибка при обновлении поля в чате {chat_id}: {e}")
+                self._last_sent[chat_id] = time.monotonic()
+        finally:
+            if self._tasks.get(chat_id) is asyncio.current_task():
+                del self._tasks[chat_id]
+            self._prune()
+
+    def _prune(self):
+        """Выбрасывает вёдра и отметки времени простаивающих чатов"""
+        if len(self._chat_buckets) < 1024:
+            return
+        now = time.monotonic()
+        for chat_id in list(self._chat_buckets):
+            if chat_id in self._tasks:
+                continue
+            if now - self._last_sent.get(chat_id, 0.0) > self.min_interval and self._chat_buckets[chat_id].idle():
+                del self._chat_buckets[chat_id]
+                self._last_sent.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "active_chats": len(self._tasks),
+            "edits_sent": self.edits_sent,
+            "edits_coalesced": self.edits_coalesced,
+            "retries": self.retries,
+            "errors": self.errors,
+        }
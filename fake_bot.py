@@ -0,0 +1,106 @@
+import itertools
+import json
+import time
+from collections import Counter, deque
+
+from telegram import Bot
+from telegram.request import BaseRequest
+
+FAKE_TOKEN = "123456:FAKE"
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+
+
+class FakeBotApi:
+    """Ответы Bot API без сети: отправленные сообщения получают id и file_id.
+
+    Запоминает последние вызовы, чтобы бенчмарки и проверки могли
+    посмотреть, что бот отправил.
+    """
+
+    def __init__(self, history=1000):
+        self.calls = deque(maxlen=history)
+        self.counts = Counter()
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        # Очередь обновлений для getUpdates
+        self.updates = deque()
+
+    def _message(self, params, **fields):
+        chat_id = int(params.get("chat_id", 0))
+        return {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+            "from": BOT_USER,
+            **fields,
+        }
+
+    def _photo_message(self, params, media):
+        # Ранее выданный file_id возвращается как есть, новые байты получают новый
+        file_id = media if isinstance(media, str) and media.startswith("fake-") else f"fake-{next(self._file_ids)}"
+        return self._message(params, photo=[{
+            "file_id": file_id, "file_unique_id": file_id, "width": 340, "height": 640
+        }], caption=params.get("caption"))
+
+    def handle(self, method: str, params: dict):
+        """Результат метода Bot API (поле result ответа)"""
+        self.calls.append((method, params))
+        self.counts[method] += 1
+
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            updates = list(self.updates)
+            self.updates.clear()
+            return updates
+        if method in ("sendMessage", "editMessageText"):
+            return self._message(params, text=params.get("text", ""))
+        if method == "sendPhoto":
+            return self._photo_message(params, params.get("photo"))
+        if method in ("sendAnimation", "sendDocument"):
+            # Повторы /replay: содержимое файла не важно, нужен только ответ-сообщение
+            file_id = f"fake-{next(self._file_ids)}"
+            media = {"file_id": file_id, "file_unique_id": file_id}
+            if method == "sendAnimation":
+                return self._message(params, caption=params.get("caption"),
+                                     animation={**media, "width": 176, "height": 336, "duration": 0})
+            return self._message(params, caption=params.get("caption"), document=media)
+        if method == "editMessageMedia":
+            media = params.get("media")
+            if isinstance(media, str):
+                media = json.loads(media)
+            return self._photo_message(params, (media or {}).get("media"))
+        # answerCallbackQuery, deleteMessage, setWebhook и прочие
+        return True
+
+
+class FakeRequest(BaseRequest):
+    """Транспорт python-telegram-bot, который вместо HTTP вызывает FakeBotApi"""
+
+    def __init__(self, api=None):
+        self.api = api or FakeBotApi()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit("/", 1)[-1]
+        # Параметры в том виде, в каком ушли бы в Telegram (строки, JSON для объектов)
+        params = dict(request_data.json_parameters) if request_data is not None else {}
+        result = self.api.handle(api_method, params)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def make_fake_bot(api=None) -> Bot:
+    """Настоящий telegram.Bot, работающий с FakeBotApi вместо сети"""
+    request = FakeRequest(api)
+    return Bot(FAKE_TOKEN, request=request, get_updates_request=FakeRequest(request.api))
@@ -0,0 +1,96 @@
+import hashlib
+from collections import OrderedDict
+
+from bitboard_tetris import game_status
+
+
+class CachedFrame:
+    """Закодированный кадр и file_id, который вернул Telegram после загрузки"""
+
+    __slots__ = ("data", "file_id")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.file_id = None
+
+    @property
+    def media(self):
+        """Что отправлять: file_id, если кадр уже загружался, иначе байты"""
+        return self.file_id or self.data
+
+
+class FrameCache:
+    """LRU-кэш кадров тетриса, адресуемый по содержимому кадра.
+
+    Ключ — хэш строк поля с фигурой и статуса игры, поэтому одинаковые
+    кадры из разных чатов и ходов попадают в одну запись.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._frames = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.file_id_hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(tetris) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{tetris.width}x{tetris.height}:{game_status(tetris)}:".encode())
+        digest.update(",".join(map(str, tetris.frame_rows())).encode())
+        return digest.digest()
+
+    def get(self, key: bytes):
+        frame = self._frames.get(key)
+        if frame is None:
+            self.misses += 1
+            return None
+        self._frames.move_to_end(key)
+        self.hits += 1
+        if frame.file_id:
+            self.file_id_hits += 1
+        return frame
+
+    def put(self, key: bytes, data: bytes) -> CachedFrame:
+        frame = CachedFrame(data)
+        self._frames[key] = frame
+        self._frames.move_to_end(key)
+        while len(self._frames) > self.max_entries:
+            self._frames.popitem(last=False)
+            self.evictions += 1
+        return frame
+
+    def get_or_render(self, tetris):
+        """Возвращает (ключ, кадр), рендеря кадр только при промахе"""
+        key = self.key_for(tetris)
+        frame = self.get(key)
+        if frame is None:
+            frame = self.put(key, tetris.get_board_image())
+        return key, frame
+
+    def remember_file_id(self, key: bytes, message) -> None:
+        """Запоминает file_id из сообщения, которое вернул Telegram"""
+        frame = self._frames.get(key)
+        photo = getattr(message, "photo", None)
+        if frame is not None and photo:
+            frame.file_id = photo[-1].file_id
+
+    def forget_file_id(self, key: bytes) -> None:
+        frame = self._frames.get(key)
+        if frame is not None:
+            frame.file_id = None
+
+    def __len__(self):
+        return len(self._frames)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._frames),
+            "hits": self.hits,
+            "misses": self.misses,
+            "file_id_hits": self.file_id_hits,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
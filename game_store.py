@@ -0,0 +1,254 @@
+import logging
+import sqlite3
+import struct
+import time
+from collections import OrderedDict
+
+from bitboard_tetris import BitboardTetris
+from replay import ActionLog
+
+logger = logging.getLogger(__name__)
+
+
+class GameStore:
+    """Хранилище игр с ограничением по памяти.
+
+    Активные игры лежат в памяти (LRU + TTL простоя), остальные
+    «засыпают»: сериализуются в компактный снимок в SQLite (вместе с
+    журналом ходов, если он есть) и поднимаются обратно при первом
+    обращении. Снаружи выглядит как dict.
+    """
+
+    def __init__(self, path="games.sqlite3", max_resident=1000, idle_ttl=600.0,
+                 sweep_interval=30.0, engine=BitboardTetris):
+        self.max_resident = max_resident
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.engine = engine
+        # chat_id -> [игра, время последнего обращения]
+        self._hot = OrderedDict()
+        self._last_sweep = time.monotonic()
+
+        # База открывается при первом обращении, а не при создании хранилища
+        self.path = path
+        self._conn = None
+
+        self.hibernations = 0
+        self.rehydrations = 0
+        self.rehydrate_ms_total = 0.0
+        self.rehydrate_ms_last = 0.0
+        self.snapshot_bytes_total = 0
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            self._conn = self._open()
+        return self._conn
+
+    def _open(self):
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "chat_id INTEGER PRIMARY KEY, snapshot BLOB NOT NULL, updated REAL NOT NULL, log BLOB)"
+        )
+        # Базы, созданные до журналов ходов
+        columns = {row[1] for row in db.execute("PRAGMA table_info(games)")}
+        if "log" not in columns:
+            db.execute("ALTER TABLE games ADD COLUMN log BLOB")
+        # Журнал последней законченной игры чата — для /replay
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS replays ("
+            "chat_id INTEGER PRIMARY KEY, log BLOB NOT NULL, start INTEGER NOT NULL, "
+            "stop INTEGER NOT NULL, ended REAL NOT NULL)"
+        )
+        return db
+
+    # ===== ИНТЕРФЕЙС СЛОВАРЯ =====
+    def __contains__(self, chat_id) -> bool:
+        if chat_id in self._hot:
+            return True
+        row = self._db.execute("SELECT 1 FROM games WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row is not None
+
+    def __getitem__(self, chat_id):
+        game = self.get(chat_id)
+        if game is None:
+            raise KeyError(chat_id)
+        return game
+
+    def get(self, chat_id, default=None):
+        entry = self._hot.get(chat_id)
+        if entry is not None:
+            entry[1] = time.monotonic()
+            self._hot.move_to_end(chat_id)
+            self._maybe_sweep()
+            return entry[0]
+
+        game = self._rehydrate(chat_id)
+        if game is None:
+            return default
+        self._put(chat_id, game)
+        return game
+
+    def peek(self, chat_id):
+        """Игра из памяти без пробуждения и без продления её жизни в LRU"""
+        entry = self._hot.get(chat_id)
+        return entry[0] if entry is not None else None
+
+    def __setitem__(self, chat_id, game) -> None:
+        self._put(chat_id, game)
+
+    def __delitem__(self, chat_id) -> None:
+        in_memory = self._hot.pop(chat_id, None) is not None
+        deleted = self._db.execute("DELETE FROM games WHERE chat_id = ?", (chat_id,)).rowcount
+        if not in_memory and not deleted:
+            raise KeyError(chat_id)
+
+    def pop(self, chat_id, default=None):
+        game = self.get(chat_id)
+        if game is None:
+            return default
+        del self[chat_id]
+        return game
+
+    def __len__(self) -> int:
+        """Количество игр в памяти"""
+        return len(self._hot)
+
+    # ===== ВЫТЕСНЕНИЕ =====
+    def _put(self, chat_id, game):
+        self._hot[chat_id] = [game, time.monotonic()]
+        self._hot.move_to_end(chat_id)
+        while len(self._hot) > self.max_resident:
+            old_chat_id, (old_game, _) = self._hot.popitem(last=False)
+            self._hibernate(old_chat_id, old_game)
+        self._maybe_sweep()
+
+    def _maybe_sweep(self):
+        now = time.monotonic()
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self.evict_idle(now)
+
+    def evict_idle(self, now=None) -> int:
+        """Усыпляет игры, к которым не обращались дольше idle_ttl"""
+        now = now if now is not None else time.monotonic()
+        evicted = 0
+        # Словарь упорядочен по времени обращения: самые старые в начале
+        while self._hot:
+            chat_id, (game, last_access) = next(iter(self._hot.items()))
+            if now - last_access < self.idle_ttl:
+                break
+            del self._hot[chat_id]
+            self._hibernate(chat_id, game)
+            evicted += 1
+        if evicted:
+            logger.info(f"Усыплено игр: {evicted}, в памяти: {len(self._hot)}")
+        return evicted
+
+    def _hibernate(self, chat_id, game):
+        snapshot = game.to_bytes()
+        log = getattr(game, "log", None)
+        self._db.execute(
+            "INSERT OR REPLACE INTO games (chat_id, snapshot, updated, log) VALUES (?, ?, ?, ?)",
+            (chat_id, snapshot, time.time(), log.to_bytes() if log is not None else None)
+        )
+        self.hibernations += 1
+        self.snapshot_bytes_total += len(snapshot)
+
+    def _rehydrate(self, chat_id):
+        started = time.perf_counter()
+        row = self._db.execute("SELECT snapshot, log FROM games WHERE chat_id = ?", (chat_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            game = self.engine.from_bytes(row[0])
+            if row[1] is not None:
+                game.log = ActionLog.from_bytes(row[1])
+        except (ValueError, struct.error) as e:
+            logger.error(f"Не удалось восстановить игру чата {chat_id}: {e}")
+            self._db.execute("DELETE FROM games WHERE chat_id = ?", (chat_id,))
+            return None
+        # Игра снова в памяти: строка в базе устарела с первым же ходом
+        self._db.execute("DELETE FROM games WHERE chat_id = ?", (chat_id,))
+        self.rehydrations += 1
+        self.rehydrate_ms_last = (time.perf_counter() - started) * 1000
+        self.rehydrate_ms_total += self.rehydrate_ms_last
+        return game
+
+    def hibernate(self, chat_id) -> bool:
+        """Сразу усыпляет игру чата, если она в памяти"""
+        entry = self._hot.pop(chat_id, None)
+        if entry is None:
+            return False
+        self._hibernate(chat_id, entry[0])
+        return True
+
+    def hibernate_where(self, predicate) -> int:
+        """Усыпляет игры чатов, для которых predicate(chat_id) истинно"""
+        chat_ids = [chat_id for chat_id in self._hot if predicate(chat_id)]
+        for chat_id in chat_ids:
+            self.hibernate(chat_id)
+        return len(chat_ids)
+
+    # ===== ПОВТОРЫ =====
+    def archive(self, chat_id, game, start=0) -> bool:
+        """Сохраняет журнал законченной игры: шаги [start, len(log)]"""
+        log = getattr(game, "log", None)
+        if log is None or len(log) <= start:
+            return False
+        self._db.execute(
+            "INSERT OR REPLACE INTO replays (chat_id, log, start, stop, ended) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, log.to_bytes(), start, len(log), time.time())
+        )
+        return True
+
+    def last_replay(self, chat_id):
+        """(журнал, start, stop) последней сохраненной игры чата или None"""
+        row = self._db.execute("SELECT log, start, stop FROM replays WHERE chat_id = ?", (chat_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return ActionLog.from_bytes(row[0]), row[1], row[2]
+        except (ValueError, struct.error) as e:
+            logger.error(f"Не удалось прочитать повтор чата {chat_id}: {e}")
+            return None
+
+    def flush(self) -> None:
+        """Сохраняет все игры из памяти на диск (при остановке бота)"""
+        self._db.execute("BEGIN")
+        for chat_id, (game, _) in self._hot.items():
+            self._hibernate(chat_id, game)
+        self._db.execute("COMMIT")
+
+    def close(self) -> None:
+        if self._conn is None and not self._hot:
+            return
+        self.flush()
+        self._db.close()
+        self._conn = None
+
+    def _stored(self) -> int:
+        """Сколько игр спит в базе: строки игр из памяти (после flush) не считаются"""
+        stored = self._db.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+        chat_ids = list(self._hot)
+        for i in range(0, len(chat_ids), 500):
+            chunk = chat_ids[i:i + 500]
+            stored -= self._db.execute(
+                f"SELECT COUNT(*) FROM games WHERE chat_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchone()[0]
+        return stored
+
+    def stats(self) -> dict:
+        stored = self._stored()
+        return {
+            "resident": len(self._hot),
+            "stored": stored,
+            "hibernations": self.hibernations,
+            "rehydrations": self.rehydrations,
+            "bytes_per_game": round(self.snapshot_bytes_total / self.hibernations, 1) if self.hibernations else 0.0,
+            "rehydrate_ms_last": round(self.rehydrate_ms_last, 3),
+            "rehydrate_ms_avg": round(self.rehydrate_ms_total / self.rehydrations, 3) if self.rehydrations else 0.0,
+        }
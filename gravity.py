@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+
+from bitboard_tetris import DROP
+
+logger = logging.getLogger(__name__)
+
+
+class GravityScheduler:
+    """Гравитация для всех чатовых игр на одном колесе таймеров.
+
+    Колесо — кольцо из slots ячеек по tick секунд; в ячейке лежат чаты,
+    у которых фигура должна упасть на этом тике. За тик обрабатывается
+    только одна ячейка, поэтому стоимость тика не зависит от числа игр.
+    Игры на паузе, законченные и давно не трогавшиеся из колеса выпадают
+    и возвращаются в него при следующем действии игрока.
+    """
+
+    def __init__(self, games, on_tick=None, tick=0.25, slots=512,
+                 base_interval=2.0, min_interval=0.5, idle_timeout=120.0):
+        self.games = games
+        # Вызывается с chat_id после падения фигуры
+        self.on_tick = on_tick
+        self.tick = tick
+        self.slots = slots
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.idle_timeout = idle_timeout
+        self._wheel = [set() for _ in range(slots)]
+        self._position = 0
+        # chat_id -> индекс ячейки, в которой чат сейчас лежит
+        self._slot_of = {}
+        self._last_input = {}
+        self._task = None
+        self.ticks = 0
+        self.drops = 0
+        self.lag_ticks = 0
+
+    def interval_for(self, level: int) -> float:
+        """Интервал падения: быстрее с каждым уровнем, но не быстрее min_interval"""
+        return max(self.min_interval, self.base_interval * 0.85 ** (level - 1))
+
+    def _schedule(self, chat_id, level):
+        ticks = max(1, min(self.slots - 1, round(self.interval_for(level) / self.tick)))
+        slot = (self._position + ticks) % self.slots
+        old_slot = self._slot_of.get(chat_id)
+        if old_slot is not None:
+            self._wheel[old_slot].discard(chat_id)
+        self._wheel[slot].add(chat_id)
+        self._slot_of[chat_id] = slot
+
+    def touch(self, chat_id, game) -> None:
+        """Игрок что-то сделал: игра активна и должна падать"""
+        self._last_input[chat_id] = time.monotonic()
+        if chat_id not in self._slot_of and not game.paused and not game.game_over:
+            self._schedule(chat_id, game.level)
+
+    def remove(self, chat_id) -> None:
+        slot = self._slot_of.pop(chat_id, None)
+        if slot is not None:
+            self._wheel[slot].discard(chat_id)
+        self._last_input.pop(chat_id, None)
+
+    def _advance(self, now) -> list:
+        self._position = (self._position + 1) % self.slots
+        due = self._wheel[self._position]
+        self._wheel[self._position] = set()
+        self.ticks += 1
+
+        dropped = []
+        for chat_id in due:
+            del self._slot_of[chat_id]
+            # Только игры в памяти: спящие не поднимаем ради гравитации
+            game = self.games.peek(chat_id)
+            if game is None or game.paused or game.game_over:
+                continue
+            if now - self._last_input.get(chat_id, 0.0) > self.idle_timeout:
+                self._last_input.pop(chat_id, None)
+                continue
+            # Через apply: тик гравитации — такое же действие в журнале ходов
+            game.apply(DROP)
+            self.drops += 1
+            dropped.append(chat_id)
+            if not game.game_over:
+                self._schedule(chat_id, game.level)
+        return dropped
+
+    async def run(self) -> None:
+        next_tick = time.monotonic()
+        while True:
+            next_tick += self.tick
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay > self.tick:
+                # Цикл событий не успевает — не пытаемся догнать пропущенные тики
+                self.lag_ticks += 1
+                next_tick = time.monotonic()
+
+            # Все падения тика сначала применяются, а потом одним проходом
+            # отдаются на перерисовку (планировщик правок склеит их по чату)
+            for chat_id in self._advance(time.monotonic()):
+                if self.on_tick is not None:
+                    try:
+                        self.on_tick(chat_id)
+                    except Exception as e:
+                        logger.error(f"Ошибка гравитации в чате {chat_id}: {e}")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": len(self._slot_of),
+            "ticks": self.ticks,
+            "drops": self.drops,
+            "lag_ticks": self.lag_ticks,
+        }
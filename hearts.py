@@ -1,14 +1,16 @@
+import os
 import random
 from telegram import Update
 from telegram.ext import CallbackContext, CommandHandler
-import os
-import json
-from typing import Dict, Any, Union
+from typing import List, Union
+from relation_repo import RelationRepository, AdminRepository
 
 # Конфигурация
 MAIN_ADMIN = "Mikilyt"  # Главный администратор
 USER_DATA_FILE = "user_relations.json"
 ADMIN_DATA_FILE = "admin_data.json"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json")  # json или sqlite
+RELATIONS_DB = os.getenv("RELATIONS_DB", "relations.sqlite3")
 
 # Коды доступа
 ACCESS_CODES = {
@@ -89,64 +91,55 @@ HEART_COLORS = [
     "#DA70D6"   # Орхидея
 ]
 
-def load_data(filename: str) -> Dict[str, Any]:
-    """Загружает данные из JSON файла с автоматическим преобразованием формата"""
-    if os.path.exists(filename):
-        try:
-            with open(filename, "r", encoding='utf-8') as f:
-                data = json.load(f)
-                # Конвертация старого формата в новый
-                new_data = {}
-                for key, value in data.items():
-                    if isinstance(value, str):  # Старый формат: "user_id": "relation"
-                        new_data[key] = {"relation": value, "username": None}
-                    else:  # Новый формат: "user_id": {"relation": "...", "username": "..."}
-                        new_data[key] = value
-                return new_data
-        except (json.JSONDecodeError, IOError) as e:
-            print(f"Ошибка загрузки данных: {e}")
-            return {}
-    return {}
-
-def save_data(data: Dict[str, Any], filename: str) -> bool:
-    """Сохраняет данные в JSON файл"""
-    try:
-        with open(filename, "w", encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except IOError as e:
-        print(f"Ошибка сохранения данных: {e}")
-        return False
+def create_repositories():
+    """Создаёт хранилища отношений и администраторов для выбранного бэкенда"""
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_storage import SqliteRelationRepository, SqliteAdminRepository, migrate_json_to_sqlite
+        migrate_json_to_sqlite(RELATIONS_DB, USER_DATA_FILE, ADMIN_DATA_FILE)
+        return SqliteRelationRepository(RELATIONS_DB), SqliteAdminRepository(RELATIONS_DB, MAIN_ADMIN)
+    # Индексы в памяти; файлы перечитываются только при изменении
+    return RelationRepository(USER_DATA_FILE), AdminRepository(ADMIN_DATA_FILE, MAIN_ADMIN)
 
-def is_admin(username: str) -> bool:
-    """Проверяет администраторские права"""
-    if not username:
-        return False
-    admin_data = load_data(ADMIN_DATA_FILE)
-    return (username.lower() == MAIN_ADMIN.lower() or 
-            username.lower() in [a.lower() for a in admin_data.get("admins", [])])
+# Хранилища открываются при первом обращении: импорт hearts не трогает диск
+_repositories = None
 
-async def find_user_relation(user_id: str, username: str) -> Union[str, None]:
-    """Находит отношения пользователя по ID или username"""
-    user_data = load_data(USER_DATA_FILE)
+def get_repositories():
+    """Хранилища (отношения, администраторы), создаются при первом обращении"""
+    global _repositories
+    if _repositories is None:
+        _repositories = create_repositories()
+    return _repositories
 
-    # 1. Поиск по user_id
-    if user_id in user_data:
-        return user_data[user_id]["relation"]
+def get_relations():
+    return get_repositories()[0]
 
-    # 2. Поиск по username (если есть)
-    if username:
-        # Проверяем все записи на совпадение username
-        for data in user_data.values():
-            if data.get("username", "").lower() == username.lower():
-                return data["relation"]
+def get_admins():
+    return get_repositories()[1]
+
+def is_admin(username: str) -> bool:
+    """Проверяет администраторские права"""
+    return get_admins().is_admin(username)
 
-        # Проверяем ключи вида "username_xxx"
-        username_key = f"username_{username.lower()}"
-        if username_key in user_data:
-            return user_data[username_key]["relation"]
+def is_main_admin(username: str) -> bool:
+    """Назначать и снимать администраторов может только главный администратор"""
+    return bool(username) and username.lower() == MAIN_ADMIN.lower()
 
-    return None
+async def find_user_relation(user_id: str, username: str) -> Union[str, None]:
+    """Находит отношения пользователя по ID или username"""
+    return get_relations().find(user_id, username)
+
+def render_heart(heart_type: str, signature: str, color: str) -> str:
+    """Собирает HTML-сообщение с сердечком"""
+    heart_art = HEART_TEMPLATE.format(heart_type, signature)
+    return f'<pre style="color: {color};">{heart_art}</pre>'
+
+def heart_variants(relation: str) -> List[str]:
+    """Все сочетания сердечка и подписи для отношения, заранее отрендеренные"""
+    return [
+        render_heart(heart_type, signature, random.choice(HEART_COLORS))
+        for heart_type in HEART_TYPES[relation]
+        for signature in SIGNATURES[relation]
+    ]
 
 async def start_love(update: Update, context: CallbackContext) -> None:
     """Обработчик команды /love"""
@@ -168,11 +161,8 @@ async def start_love(update: Update, context: CallbackContext) -> None:
         signature = random.choice(SIGNATURES[relation])
         color = random.choice(HEART_COLORS)
 
-        # Создаем сердечко
-        heart_art = HEART_TEMPLATE.format(heart_type, signature)
-
-        # Форматируем сообщение с цветом
-        message = f'<pre style="color: {color};">{heart_art}</pre>'
+        # Создаем сердечко и форматируем сообщение с цветом
+        message = render_heart(heart_type, signature, color)
 
         await update.message.reply_text(
             text=message,
@@ -203,23 +193,8 @@ async def set_user_relation(update: Update, context: CallbackContext) -> None:
         return
 
     relation = ACCESS_CODES[code]["name"]
-    user_data = load_data(USER_DATA_FILE)
-
-    # Определяем ключ для хранения
-    if user_identifier.isdigit():  # Это user_id
-        storage_key = user_identifier
-        username_to_store = None
-    else:  # Это username
-        storage_key = f"username_{user_identifier.lower()}"
-        username_to_store = user_identifier
-
-    # Сохраняем данные
-    user_data[storage_key] = {
-        "relation": relation,
-        "username": username_to_store
-    }
-
-    if save_data(user_data, USER_DATA_FILE):
+
+    if get_relations().set(user_identifier, relation):
         await update.message.reply_text(
             f"✅ Установлены отношения: {ACCESS_CODES[code]['title']} для "
             f"{'@' + user_identifier if not user_identifier.isdigit() else user_identifier}"
@@ -238,34 +213,107 @@ async def remove_user_relation(update: Update, context: CallbackContext) -> None
         return
 
     user_identifier = context.args[0]
-    user_data = load_data(USER_DATA_FILE)
-    removed = False
-
-    # Удаление по user_id или username
-    if user_identifier.isdigit():  # Это user_id
-        if user_identifier in user_data:
-            del user_data[user_identifier]
-            removed = True
-    else:  # Это username
-        # Удаляем по username в данных
-        for key, data in list(user_data.items()):
-            if data.get("username", "").lower() == user_identifier.lower():
-                del user_data[key]
-                removed = True
-
-        # Удаляем по ключу username_xxx
-        username_key = f"username_{user_identifier.lower()}"
-        if username_key in user_data:
-            del user_data[username_key]
-            removed = True
-
-    if removed:
-        if save_data(user_data, USER_DATA_FILE):
-            await update.message.reply_text(f"✅ Отношения для {user_identifier} удалены.")
-        else:
-            await update.message.reply_text("❌ Ошибка сохранения данных.")
-    else:
+    removed = get_relations().remove(user_identifier)
+
+    if removed is None:
         await update.message.reply_text(f"ℹ️ Пользователь {user_identifier} не найден.")
+    elif removed:
+        await update.message.reply_text(f"✅ Отношения для {user_identifier} удалены.")
+    else:
+        await update.message.reply_text("❌ Ошибка сохранения данных.")
+
+async def set_users_bulk(update: Update, context: CallbackContext) -> None:
+    """Устанавливает одно отношение сразу многим пользователям"""
+    if not is_admin(update.message.from_user.username):
+        await update.message.reply_text("❌ Недостаточно прав.")
+        return
+
+    # Порядок как у /setuser: сначала пользователи, код последним
+    usage = "ℹ️ Использование: /setusers [user_id/username] ... [код]"
+    if len(context.args) < 2:
+        await update.message.reply_text(usage)
+        return
+
+    code = context.args[-1]
+    if code not in ACCESS_CODES:
+        await update.message.reply_text(f"❌ Неверный код отношения.\n{usage}")
+        return
+
+    # Код среди пользователей — скорее всего, перепутан порядок аргументов
+    misplaced = [identifier for identifier in context.args[:-1] if identifier in ACCESS_CODES]
+    if misplaced:
+        await update.message.reply_text(
+            f"❌ Код {misplaced[0]} указан среди пользователей, код должен быть последним.\n{usage}"
+        )
+        return
+
+    user_identifiers = [identifier.lstrip("@") for identifier in context.args[:-1]]
+    if get_relations().set_many(user_identifiers, ACCESS_CODES[code]["name"]):
+        await update.message.reply_text(
+            f"✅ Установлены отношения: {ACCESS_CODES[code]['title']} "
+            f"для {len(user_identifiers)} пользователей"
+        )
+    else:
+        await update.message.reply_text("❌ Ошибка сохранения данных.")
+
+async def remove_users_bulk(update: Update, context: CallbackContext) -> None:
+    """Удаляет отношения сразу многих пользователей"""
+    if not is_admin(update.message.from_user.username):
+        await update.message.reply_text("❌ Недостаточно прав.")
+        return
+
+    if not context.args:
+        await update.message.reply_text("ℹ️ Использование: /removeusers [user_id/username] ...")
+        return
+
+    user_identifiers = [identifier.lstrip("@") for identifier in context.args]
+    removed, saved = get_relations().remove_many(user_identifiers)
+
+    if not saved:
+        await update.message.reply_text("❌ Ошибка сохранения данных.")
+        return
+
+    not_found = [identifier for identifier in user_identifiers if identifier not in removed]
+    message = f"✅ Удалено отношений: {len(removed)}"
+    if not_found:
+        message += f"\nℹ️ Не найдены: {', '.join(not_found)}"
+    await update.message.reply_text(message)
+
+async def add_admin(update: Update, context: CallbackContext) -> None:
+    """Добавляет администратора"""
+    if not is_main_admin(update.message.from_user.username):
+        await update.message.reply_text("❌ Недостаточно прав.")
+        return
+
+    if not context.args:
+        await update.message.reply_text("ℹ️ Использование: /addadmin [username]")
+        return
+
+    username = context.args[0].lstrip("@")
+    if get_admins().add(username):
+        await update.message.reply_text(f"✅ @{username} теперь администратор.")
+    else:
+        await update.message.reply_text("❌ Ошибка сохранения данных.")
+
+async def remove_admin(update: Update, context: CallbackContext) -> None:
+    """Удаляет администратора"""
+    if not is_main_admin(update.message.from_user.username):
+        await update.message.reply_text("❌ Недостаточно прав.")
+        return
+
+    if not context.args:
+        await update.message.reply_text("ℹ️ Использование: /removeadmin [username]")
+        return
+
+    username = context.args[0].lstrip("@")
+    removed = get_admins().remove(username)
+
+    if removed is None:
+        await update.message.reply_text(f"ℹ️ @{username} не администратор.")
+    elif removed:
+        await update.message.reply_text(f"✅ @{username} больше не администратор.")
+    else:
+        await update.message.reply_text("❌ Ошибка сохранения данных.")
 
 async def admin_profile(update: Update, context: CallbackContext) -> None:
     """Показывает админ-панель"""
@@ -279,6 +327,13 @@ async def admin_profile(update: Update, context: CallbackContext) -> None:
         "<b>Команды:</b>\n"
         "/setuser [user_id/username] [код] - установить отношения\n"
         "/removeuser [user_id/username] - удалить отношения\n"
+        "/setusers [user_id/username] ... [код] - установить отношения списку\n"
+        "/removeusers [user_id/username] ... - удалить отношения списка\n"
+        "/addadmin [username] - добавить администратора (главный админ)\n"
+        "/removeadmin [username] - удалить администратора (главный админ)\n"
+        "/lovecast - разослать сердечки всем пользователям\n"
+        "/lovecast resume - продолжить прерванную рассылку\n"
+        "/lovecast stop - остановить рассылку\n"
         "/love - отправить сердечко\n\n"
         "<b>Доступные коды:</b>\n"
         f"{codes_list}"
@@ -300,10 +355,17 @@ async def my_info(update: Update, context: CallbackContext) -> None:
     else:
         await update.message.reply_text("❌ Ваши отношения не установлены.")
 
-def setup_handlers(application):
-    """Настраивает обработчики команд"""
+def setup_handlers(application, global_bucket=None):
+    """Настраивает обработчики команд; global_bucket — общее ведро глобального лимита бота"""
+    from love_broadcast import love_broadcast, use_global_bucket
+    use_global_bucket(global_bucket)
     application.add_handler(CommandHandler("love", start_love))
     application.add_handler(CommandHandler("setuser", set_user_relation))
     application.add_handler(CommandHandler("removeuser", remove_user_relation))
+    application.add_handler(CommandHandler("setusers", set_users_bulk))
+    application.add_handler(CommandHandler("removeusers", remove_users_bulk))
+    application.add_handler(CommandHandler("addadmin", add_admin))
+    application.add_handler(CommandHandler("removeadmin", remove_admin))
     application.add_handler(CommandHandler("helpa", admin_profile))
     application.add_handler(CommandHandler("myinfo", my_info))
+    application.add_handler(CommandHandler("lovecast", love_broadcast))
@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+
+from bitboard_tetris import ROTATIONS, SHAPES
+
+logger = logging.getLogger(__name__)
+
+# Веса эвристики (Yiyuan Lee): высота, линии, дырки, неровность
+HEIGHT_WEIGHT = -0.510066
+LINES_WEIGHT = 0.760666
+HOLES_WEIGHT = -0.35663
+BUMPINESS_WEIGHT = -0.184483
+
+# Ходы поиска: имя кнопки, изменение поворота и координат
+MOVES = (("rotate", 1, 0, 0), ("left", 0, -1, 0), ("right", 0, 1, 0), ("down", 0, 0, 1))
+MOVE_LABELS = {"rotate": "↻", "left": "←", "right": "→", "down": "↓", "drop": "⏏️"}
+
+
+# ===== ПОИСК (выполняется в процессах пула) =====
+def _fits(rows, width, height, masks, x, y):
+    """Та же проверка, что BitboardTetris._fits, но для произвольного поля"""
+    if x < 0:
+        return False
+    full_row = (1 << width) - 1
+    for dy, mask in enumerate(masks):
+        shifted = mask << x
+        if shifted & ~full_row:
+            return False
+        row_y = y + dy
+        if row_y >= height:
+            return False
+        if row_y >= 0 and rows[row_y] & shifted:
+            return False
+    return True
+
+
+def _place(rows, width, height, masks, x, y):
+    """Поле после фиксации фигуры и очистки линий; (строки, очищено линий)"""
+    rows = list(rows)
+    for dy, mask in enumerate(masks):
+        if 0 <= y + dy < height:
+            rows[y + dy] |= mask << x
+    full_row = (1 << width) - 1
+    remaining = [row for row in rows if row != full_row]
+    cleared = height - len(remaining)
+    return [0] * cleared + remaining, cleared
+
+
+def evaluate(rows, width, height, lines):
+    """Оценка поля: чем больше, тем лучше"""
+    heights = [0] * width
+    holes = 0
+    seen = 0
+    for y, row in enumerate(rows):
+        # Клетки, под которыми уже был блок, но сами пустые — дырки
+        holes += bin(seen & ~row).count("1")
+        new = row & ~seen
+        x = 0
+        while new:
+            if new & 1:
+                heights[x] = height - y
+            new >>= 1
+            x += 1
+        seen |= row
+    bumpiness = sum(abs(heights[x] - heights[x + 1]) for x in range(width - 1))
+    return (HEIGHT_WEIGHT * sum(heights) + LINES_WEIGHT * lines
+            + HOLES_WEIGHT * holes + BUMPINESS_WEIGHT * bumpiness)
+
+
+def _simple_path(rows, width, height, kind, start, target):
+    """Повернуть, сдвинуть и сбросить; None, если так в target не попасть"""
+    rot, x, y = start
+    target_rot, target_x, target_y = target
+    path = []
+    while rot != target_rot:
+        rot = (rot + 1) % 4
+        if not _fits(rows, width, height, ROTATIONS[kind][rot][1], x, y):
+            return None
+        path.append("rotate")
+    masks = ROTATIONS[kind][rot][1]
+    step = 1 if target_x > x else -1
+    while x != target_x:
+        x += step
+        if not _fits(rows, width, height, masks, x, y):
+            return None
+        path.append("right" if step > 0 else "left")
+    while _fits(rows, width, height, masks, x, y + 1):
+        y += 1
+    return path + ["drop"] if y == target_y else None
+
+
+def reachable_placements(rows, width, height, kind, rotation, x, y):
+    """BFS по состояниям (поворот, x, y) из текущего положения фигуры.
+
+    Возвращает {(поворот, x, y): путь} для положений, где фигура
+    фиксируется. Путь — «повернуть, сдвинуть, сбросить», если так можно,
+    иначе кратчайший путь BFS (например, с подсовыванием под навес).
+    """
+    start = (rotation, x, y)
+    parents = {start: None}
+    queue = deque([start])
+    resting = []
+    while queue:
+        state = queue.popleft()
+        rot, px, py = state
+        for name, d_rot, dx, dy in MOVES:
+            nxt = ((rot + d_rot) % 4, px + dx, py + dy)
+            if nxt in parents:
+                continue
+            if _fits(rows, width, height, ROTATIONS[kind][nxt[0]][1], nxt[1], nxt[2]):
+                parents[nxt] = (state, name)
+                queue.append(nxt)
+        if not _fits(rows, width, height, ROTATIONS[kind][rot][1], px, py + 1):
+            resting.append(state)
+
+    placements = {}
+    for state in resting:
+        simple = _simple_path(rows, width, height, kind, start, state)
+        if simple is not None:
+            placements[state] = simple
+            continue
+        path = []
+        node = state
+        while parents[node] is not None:
+            node, name = parents[node]
+            path.append(name)
+        path.reverse()
+        # Хвост из «вниз» заменяет мгновенное падение
+        while path and path[-1] == "down":
+            path.pop()
+        placements[state] = path + ["drop"]
+    return placements
+
+
+def _best_drop_value(rows, width, height, kind):
+    """Лучшая оценка для фигуры kind, сброшенной с точки появления (без поиска пути)"""
+    best = None
+    seen_masks = set()
+    for rot in range(4):
+        masks = ROTATIONS[kind][rot][1]
+        if masks in seen_masks:
+            continue
+        seen_masks.add(masks)
+        for x in range(width):
+            if not _fits(rows, width, height, masks, x, 0):
+                continue
+            y = 0
+            while _fits(rows, width, height, masks, x, y + 1):
+                y += 1
+            after, lines = _place(rows, width, height, masks, x, y)
+            value = evaluate(after, width, height, lines)
+            if best is None or value > best:
+                best = value
+    # Следующей фигуре некуда встать — это проигрыш
+    return best if best is not None else -1e9
+
+
+def search(key, lookahead=True, deadline=None):
+    """Лучшее положение текущей фигуры.
+
+    key — (строки, ширина, высота, фигура, поворот, x, y). С lookahead
+    каждое положение дополнительно оценивается средним по всем семи
+    возможным следующим фигурам. Если deadline (time.time()) наступил,
+    возвращается лучшее из уже просчитанного, с partial=True.
+    """
+    rows, width, height, kind, rotation, x, y = key
+    placements = reachable_placements(rows, width, height, kind, rotation, x, y)
+    if not placements:
+        return None
+
+    candidates = []
+    for (rot, px, py), path in placements.items():
+        after, lines = _place(rows, width, height, ROTATIONS[kind][rot][1], px, py)
+        candidates.append((evaluate(after, width, height, lines), lines, after, (rot, px, py), path))
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    best = candidates[0]
+    best_value = best[0]
+    partial = False
+
+    if lookahead:
+        # Самые многообещающие первыми: при нехватке времени выбираем из них.
+        # Не успели оценить ни одного — остается лучшее положение без lookahead
+        best_lookahead = None
+        for base, lines, after, placement, path in candidates:
+            if deadline is not None and time.time() > deadline:
+                partial = True
+                break
+            value = LINES_WEIGHT * lines + sum(
+                _best_drop_value(after, width, height, next_kind) for next_kind in range(len(SHAPES))
+            ) / len(SHAPES)
+            if best_lookahead is None or value > best_lookahead:
+                best_lookahead = value
+                best = (base, lines, after, placement, path)
+        if best_lookahead is not None:
+            best_value = best_lookahead
+
+    _, lines, _, (rot, px, py), path = best
+    return {
+        "rotation": rot,
+        "x": px,
+        "y": py,
+        "path": path,
+        "lines": lines,
+        "score": round(best_value, 3),
+        "candidates": len(candidates),
+        "partial": partial,
+    }
+
+
+def format_hint(hint) -> str:
+    """Путь подсказки в виде кнопок: ↻×2 →×3 ⏏️"""
+    parts = []
+    for name in hint["path"]:
+        label = MOVE_LABELS[name]
+        if parts and parts[-1][0] == label:
+            parts[-1][1] += 1
+        else:
+            parts.append([label, 1])
+    text = " ".join(label if count == 1 else f"{label}×{count}" for label, count in parts)
+    if hint["lines"]:
+        text += f" (линий: {hint['lines']})"
+    return text
+
+
+# ===== СЕРВИС В ЦИКЛЕ СОБЫТИЙ =====
+class HintService:
+    """Поиск подсказок в пуле процессов с LRU-кэшем и жестким бюджетом времени"""
+
+    def __init__(self, workers=2, budget=1.5, lookahead=True, cache_size=4096):
+        self.workers = workers
+        self.budget = budget
+        self.lookahead = lookahead
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._pool = None
+        self.requests = 0
+        self.cache_hits = 0
+        self.timeouts = 0
+        self.partial = 0
+        self.errors = 0
+
+    @staticmethod
+    def key_for(tetris):
+        return (tuple(tetris.rows), tetris.width, tetris.height,
+                tetris.kind, tetris.rotation, tetris.piece_x, tetris.piece_y)
+
+    def start(self) -> None:
+        if self._pool is None:
+            # Пул и multiprocessing загружаются только при запуске сервиса
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            # Прогрев: процессы поднимаются сразу, а не на первой подсказке
+            for _ in range(self.workers):
+                self._pool.submit(search, ((0,) * 4, 4, 4, 1, 0, 1, 0), False)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def best_move(self, tetris):
+        """Подсказка для текущей фигуры или None (некуда ставить / не уложились в бюджет / ошибка пула)"""
+        self.requests += 1
+        key = self.key_for(tetris)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return self._cache[key]
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        # Поиск сам останавливает lookahead чуть раньше бюджета
+        deadline = time.time() + self.budget * 0.8
+        try:
+            future = loop.run_in_executor(self._pool, search, key, self.lookahead, deadline)
+            hint = await asyncio.wait_for(future, self.budget)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning("Поиск подсказки не уложился в бюджет")
+            return None
+        except Exception as e:
+            # Процесс пула упал или поиск бросил исключение — подсказки просто нет
+            self.errors += 1
+            logger.error(f"Ошибка поиска подсказки: {e}")
+            from concurrent.futures.process import BrokenProcessPool
+            if isinstance(e, BrokenProcessPool):
+                # Сломанный пул не принимает задач: следующий запрос поднимет новый
+                self.shutdown()
+            return None
+
+        if hint is not None and hint["partial"]:
+            self.partial += 1
+        else:
+            # Неполные результаты не кэшируем: в следующий раз может хватить времени
+            self._cache[key] = hint
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return hint
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "cached": len(self._cache),
+            "timeouts": self.timeouts,
+            "partial": self.partial,
+            "errors": self.errors,
+        }
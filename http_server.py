@@ -0,0 +1,139 @@
+import asyncio
+import logging
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+MAX_HEADER_BYTES = 16 * 1024
+KEEP_ALIVE_TIMEOUT = 15.0
+
+
+class Request:
+    """Разобранный HTTP-запрос"""
+
+    def __init__(self, method, target, headers, body=b""):
+        self.method = method
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = parse_qs(parts.query)
+        # Заголовки с именами в нижнем регистре
+        self.headers = headers
+        self.body = body
+
+
+class Response:
+    def __init__(self, status=200, body=b"", headers=None, content_type="text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.headers = dict(headers or {})
+        if content_type and "Content-Type" not in self.headers:
+            self.headers["Content-Type"] = content_type
+
+
+class HttpServer:
+    """Минимальный асинхронный HTTP/1.1 сервер, работающий в цикле событий бота.
+
+    Обработчики — корутины, принимающие Request и возвращающие Response.
+    """
+
+    def __init__(self, host="0.0.0.0", port=8080, max_body=1024 * 1024):
+        self.host = host
+        self.port = port
+        self.max_body = max_body
+        self._routes = {}
+        self._prefix_routes = []
+        self._server = None
+
+    def route(self, method, path, handler):
+        self._routes[(method, path)] = handler
+
+    def route_prefix(self, method, prefix, handler):
+        self._prefix_routes.append((method, prefix, handler))
+
+    def _find_handler(self, method, path):
+        # HEAD обслуживается GET-обработчиком, тело не отправляется
+        lookup_method = "GET" if method == "HEAD" else method
+        handler = self._routes.get((lookup_method, path))
+        if handler is not None:
+            return handler
+        for route_method, prefix, prefix_handler in self._prefix_routes:
+            if route_method == lookup_method and path.startswith(prefix):
+                return prefix_handler
+        return None
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        logger.info(f"HTTP-сервер запущен на порту: {self.port}")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0) or 0)
+        if length > self.max_body:
+            raise ValueError("Тело запроса слишком большое")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method, target, headers, body), version
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request, version = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except (ValueError, asyncio.LimitOverrunError):
+                    await self._write(writer, Response(400, "Bad Request"), "HTTP/1.1", False)
+                    break
+
+                response = await self._dispatch(request)
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and request.headers.get("connection", "").lower() != "close"
+                )
+                await self._write(writer, response, version, keep_alive, request.method == "HEAD")
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        handler = self._find_handler(request.method, request.path)
+        if handler is None:
+            return Response(404, "Файл не найден")
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"Ошибка обработки {request.method} {request.path}: {e}")
+            return Response(500, "Internal Server Error")
+
+    async def _write(self, writer, response, version, keep_alive, head_only=False):
+        reason = HTTPStatus(response.status).phrase
+        headers = dict(response.headers)
+        headers.setdefault("Content-Length", str(len(response.body)))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        head = f"{version} {response.status} {reason}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        ) + "\r\n"
+        writer.write(head.encode("latin-1"))
+        if response.body and not head_only:
+            writer.write(response.body)
+        await writer.drain()
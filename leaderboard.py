@@ -0,0 +1,255 @@
+"""Таблицы рекордов тетриса: по чату и общая.
+
+Результаты законченных игр пишутся в SQLite, а в памяти лежат
+отсортированные списки ключей (-очки, время, id): вставка и поиск места —
+O(log n), первые K записей — срез. Воркеры шардов пишут в одну базу;
+чужие записи подтягиваются по PRAGMA data_version перед каждым запросом,
+читаются только строки с id больше уже виденного.
+"""
+import logging
+import sqlite3
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+try:
+    from sortedcontainers import SortedList
+except ImportError:  # sortedcontainers необязателен: без него — список с bisect
+    SortedList = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER,
+    name TEXT,
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    ended REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scores_chat ON scores (chat_id);
+"""
+
+INSERT = (
+    "INSERT INTO scores (chat_id, user_id, name, score, lines, level, ended) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+class _BisectList:
+    """Замена SortedList: вставка через insort (сдвиг памяти), поиск — bisect"""
+
+    def __init__(self):
+        self._items = []
+
+    def add(self, item):
+        insort(self._items, item)
+
+    def remove(self, item):
+        index = bisect_left(self._items, item)
+        if index < len(self._items) and self._items[index] == item:
+            del self._items[index]
+        else:
+            raise ValueError(f"{item!r} нет в списке")
+
+    def bisect_left(self, item):
+        return bisect_left(self._items, item)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _sorted_list():
+    return SortedList() if SortedList is not None else _BisectList()
+
+
+def _key(row):
+    # Больше очков — выше; при равенстве выше тот, кто набрал раньше
+    score_id, score, ended = row[0], row[4], row[7]
+    return (-score, ended, score_id)
+
+
+class Leaderboard:
+    """Рекорды по чатам (все игры чата) и общий рейтинг (лучшая игра каждого чата)"""
+
+    def __init__(self, path="leaderboard.sqlite3", cached_chats=1024):
+        # База открывается при первой записи или запросе, а не при создании
+        self.path = path
+        self._conn = None
+        self.cached_chats = cached_chats
+
+        # id -> строка таблицы scores (только для записей, лежащих в списках)
+        self._rows = {}
+        # Общий рейтинг: по ключу на чат и текущий ключ лучшей игры чата
+        self._global = _sorted_list()
+        self._best = {}
+        # Рейтинги чатов поднимаются из базы при первом обращении
+        self._chats = OrderedDict()
+        self._data_version = None
+        self._last_id = 0
+
+        self.recorded = 0
+        self.synced = 0
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=10)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._conn = db
+        return self._conn
+
+    # ===== СИНХРОНИЗАЦИЯ С БАЗОЙ =====
+    def _load_global(self):
+        # Лучшая игра каждого чата; один проход при первом обращении, а не при запуске
+        rows = self._db.execute(
+            "SELECT s.* FROM scores s WHERE s.id = ("
+            "SELECT id FROM scores WHERE chat_id = s.chat_id ORDER BY score DESC, ended, id LIMIT 1)"
+        ).fetchall()
+        for row in rows:
+            self._offer_global(row)
+        self._last_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM scores").fetchone()[0]
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        logger.info(f"Рекорды загружены: чатов в рейтинге {len(self._global)}")
+
+    def _sync(self, force=False):
+        """Подтягивает записи, сделанные другими процессами (или только что нами)"""
+        if self._data_version is None:
+            self._load_global()
+            return
+        data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if not force and data_version == self._data_version:
+            return
+        self._data_version = data_version
+        rows = self._db.execute("SELECT * FROM scores WHERE id > ? ORDER BY id", (self._last_id,)).fetchall()
+        for row in rows:
+            self._apply(row)
+            self._last_id = row[0]
+        self.synced += len(rows)
+
+    def _apply(self, row):
+        self._offer_global(row)
+        board = self._chats.get(row[1])
+        if board is not None:
+            board.add(_key(row))
+            self._rows[row[0]] = row
+
+    def _offer_global(self, row):
+        chat_id = row[1]
+        key = _key(row)
+        current = self._best.get(chat_id)
+        if current is not None:
+            if current <= key:
+                return
+            self._global.remove(current)
+            self._forget(current[2])
+        self._global.add(key)
+        self._best[chat_id] = key
+        self._rows[row[0]] = row
+
+    def _forget(self, score_id):
+        # Строка нужна, пока она есть в общем рейтинге или в загруженном рейтинге чата
+        row = self._rows.get(score_id)
+        if row is not None and row[1] not in self._chats:
+            del self._rows[score_id]
+
+    def _chat_board(self, chat_id):
+        board = self._chats.get(chat_id)
+        if board is not None:
+            self._chats.move_to_end(chat_id)
+            return board
+        board = self._chats[chat_id] = _sorted_list()
+        for row in self._db.execute("SELECT * FROM scores WHERE chat_id = ? AND id <= ?",
+                                    (chat_id, self._last_id)):
+            board.add(_key(row))
+            self._rows[row[0]] = row
+        while len(self._chats) > self.cached_chats:
+            old_chat_id, old_board = self._chats.popitem(last=False)
+            best = self._best.get(old_chat_id)
+            for index in range(len(old_board)):
+                key = old_board[index]
+                if key != best:
+                    self._rows.pop(key[2], None)
+        return board
+
+    # ===== ЗАПИСЬ И ЗАПРОСЫ =====
+    def record(self, chat_id, game, user=None):
+        """Записывает итог игры; возвращает (место в чате, всего игр чата).
+
+        Игры без очков не записываются — тогда None.
+        """
+        if not game.score:
+            return None
+        ended = time.time()
+        cursor = self._db.execute(
+            INSERT,
+            (chat_id, user.id if user else None, user.full_name if user else None,
+             game.score, game.lines_cleared, game.level, ended)
+        )
+        self.recorded += 1
+        # Своя запись не меняет data_version нашего соединения — читаем её явно
+        self._sync(force=True)
+        board = self._chat_board(chat_id)
+        return board.bisect_left((-game.score, ended, cursor.lastrowid)) + 1, len(board)
+
+    def record_many(self, entries) -> int:
+        """Записывает пачку итогов одной транзакцией.
+
+        entries — кортежи (chat_id, user_id, name, score, lines, level, ended);
+        записи без очков пропускаются. Возвращает число записанных.
+        """
+        entries = [entry for entry in entries if entry[3]]
+        if not entries:
+            return 0
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(INSERT, entries)
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        self.recorded += len(entries)
+        self._sync(force=True)
+        return len(entries)
+
+    def top(self, chat_id=None, limit=10):
+        """Лучшие записи чата или общего рейтинга: [(место, строка)]"""
+        self._sync()
+        board = self._global if chat_id is None else self._chat_board(chat_id)
+        return [(place, self._row(board[place - 1])) for place in range(1, min(limit, len(board)) + 1)]
+
+    def rank(self, chat_id):
+        """Лучшая игра чата и её место в общем рейтинге: (место, всего, строка) или None"""
+        self._sync()
+        key = self._best.get(chat_id)
+        if key is None:
+            return None
+        return self._global.bisect_left(key) + 1, len(self._global), self._row(key)
+
+    def _row(self, key):
+        row = self._rows.get(key[2])
+        if row is None:
+            row = self._rows[key[2]] = self._db.execute("SELECT * FROM scores WHERE id = ?", (key[2],)).fetchone()
+        return row
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "chats_ranked": len(self._global),
+            "chat_boards_cached": len(self._chats),
+            "recorded": self.recorded,
+            "synced": self.synced,
+            "sorted_list": "sortedcontainers" if SortedList is not None else "bisect",
+        }
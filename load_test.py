@@ -0,0 +1,224 @@
+"""Нагрузочный тест бота на локальной замене Bot API.
+
+    python load_test.py --chats 10,100,1000 --duration 30 --output load.json
+
+Запускает mock_bot_api.MockBotApiServer и main.py в отдельном процессе
+(или использует уже запущенного бота с --no-spawn), затем ступенями
+увеличивает число одновременных чатов. Каждый чат начинает /tetris,
+жмёт кнопки и иногда вызывает /love, дожидаясь ответа бота перед
+следующим действием. Задержка — от появления обновления в getUpdates
+до ответа бота: answerCallbackQuery для кнопок, sendPhoto для /tetris,
+sendMessage для /love.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_bot import FAKE_TOKEN
+from mock_bot_api import MockBotApiServer
+from webhook import percentile
+
+BUTTONS = ("left", "right", "down", "rotate", "drop")
+
+
+def _summary(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+    }
+
+
+class LoadTest:
+    def __init__(self, server, think_time=(0.2, 1.0), love_share=0.05, timeout=10.0, seed=1):
+        self.server = server
+        server.on_call = self.on_call
+        self.think_time = think_time
+        self.love_share = love_share
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        # Ключ ожидаемого ответа -> (future, время отправки обновления, вид действия)
+        self._waiters = {}
+        self._board_messages = {}
+        self._ids = itertools.count(1)
+        self.ready = asyncio.Event()
+        self._reset_level()
+
+    def _reset_level(self):
+        self.latencies = {"tetris": [], "button": [], "love": []}
+        self.timeouts = 0
+
+    # ===== ОТВЕТЫ БОТА =====
+    def on_call(self, method, params, result):
+        if method == "getUpdates":
+            self.ready.set()
+            return
+        if method == "sendPhoto" and isinstance(result, dict):
+            self._board_messages[result["chat"]["id"]] = result["message_id"]
+
+        if method == "answerCallbackQuery":
+            key = ("button", params.get("callback_query_id"))
+        elif method in ("sendPhoto", "sendMessage"):
+            key = (method, int(params.get("chat_id", 0)))
+        else:
+            return
+        waiter = self._waiters.pop(key, None)
+        if waiter is not None and not waiter[0].done():
+            future, sent_at, kind = waiter
+            self.latencies[kind].append((time.monotonic() - sent_at) * 1000)
+            future.set_result(None)
+
+    async def _act(self, key, kind, update):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[key] = (future, time.monotonic(), kind)
+        self.server.push_update(update)
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._waiters.pop(key, None)
+            self.timeouts += 1
+
+    # ===== ДЕЙСТВИЯ ПОЛЬЗОВАТЕЛЯ =====
+    @staticmethod
+    def _user(chat_id):
+        return {"id": chat_id, "is_bot": False, "first_name": f"Load{chat_id}", "username": f"load{chat_id}"}
+
+    def _command(self, chat_id, command):
+        return {"message": {
+            "message_id": next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self._user(chat_id),
+            "text": command,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }}
+
+    def _button(self, chat_id, callback_id, data):
+        return {"callback_query": {
+            "id": callback_id,
+            "from": self._user(chat_id),
+            "chat_instance": str(chat_id),
+            "data": data,
+            "message": {
+                "message_id": self._board_messages[chat_id],
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+            },
+        }}
+
+    async def run_chat(self, chat_id, deadline):
+        await self._act(("sendPhoto", chat_id), "tetris", self._command(chat_id, "/tetris"))
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.rng.uniform(*self.think_time))
+            if self.rng.random() < self.love_share:
+                await self._act(("sendMessage", chat_id), "love", self._command(chat_id, "/love"))
+            elif chat_id in self._board_messages:
+                callback_id = str(next(self._ids))
+                await self._act(("button", callback_id), "button",
+                                self._button(chat_id, callback_id, self.rng.choice(BUTTONS)))
+            else:
+                await self._act(("sendPhoto", chat_id), "tetris", self._command(chat_id, "/tetris"))
+
+    async def run_level(self, chats, duration, first_chat_id):
+        self._reset_level()
+        rate_limited_before = self.server.rate_limited
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            self.run_chat(chat_id, deadline)
+            for chat_id in range(first_chat_id, first_chat_id + chats)
+        ))
+        elapsed = time.monotonic() - started
+        everything = [value for values in self.latencies.values() for value in values]
+        return {
+            "chats": chats,
+            "duration_s": round(elapsed, 2),
+            "actions": len(everything),
+            "throughput_per_s": round(len(everything) / elapsed, 1),
+            "timeouts": self.timeouts,
+            "rate_limited": self.server.rate_limited - rate_limited_before,
+            **_summary(everything),
+            "by_action": {kind: _summary(values) for kind, values in self.latencies.items()},
+        }
+
+
+def spawn_bot(api_url):
+    """Запускает main.py, направленный на локальный Bot API"""
+    directory = tempfile.mkdtemp(prefix="tetris-load-")
+    env = dict(os.environ)
+    env.update({
+        "TELEGRAM_BOT_TOKEN": FAKE_TOKEN,
+        "TELEGRAM_API_URL": api_url,
+        "GAMES_DB": os.path.join(directory, "games.sqlite3"),
+        "LEADERBOARD_DB": os.path.join(directory, "leaderboard.sqlite3"),
+        "PORT": env.get("LOAD_BOT_PORT", "0"),
+    })
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    return subprocess.Popen([sys.executable, main_path], env=env, cwd=os.path.dirname(main_path))
+
+
+async def run(args):
+    server = MockBotApiServer(args.host, args.port, chat_rate=args.chat_rate, global_rate=args.global_rate)
+    load = LoadTest(server, think_time=(args.think_min, args.think_max), timeout=args.timeout)
+    await server.start()
+    bot = None if args.no_spawn else spawn_bot(f"http://{args.host}:{args.port}/bot")
+    try:
+        await asyncio.wait_for(load.ready.wait(), 60)
+        levels = []
+        first_chat_id = 1
+        for chats in args.chats:
+            result = await load.run_level(chats, args.duration, first_chat_id)
+            # Новые чаты на каждой ступени: /tetris каждый раз с нуля
+            first_chat_id += chats
+            levels.append(result)
+            print(
+                f"{chats} чатов: {result['throughput_per_s']} действий/с, "
+                f"p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, p99 {result['p99_ms']} мс, "
+                f"таймаутов {result['timeouts']}, 429: {result['rate_limited']}",
+                file=sys.stderr
+            )
+        return {"levels": levels, "api_calls": server.stats()["calls"]}
+    finally:
+        if bot is not None:
+            bot.terminate()
+            # Бот при остановке ещё обращается к getUpdates — сервер должен отвечать
+            await asyncio.get_running_loop().run_in_executor(None, bot.wait, 30)
+        await server.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота на локальном Bot API")
+    parser.add_argument("--chats", default="10,100,1000", help="ступени числа одновременных чатов")
+    parser.add_argument("--duration", type=float, default=30.0, help="секунд на ступень")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--chat-rate", type=float, default=1.0)
+    parser.add_argument("--global-rate", type=float, default=30.0)
+    parser.add_argument("--think-min", type=float, default=0.2)
+    parser.add_argument("--think-max", type=float, default=1.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="сколько ждать ответа бота")
+    parser.add_argument("--no-spawn", action="store_true", help="бот уже запущен с TELEGRAM_API_URL")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    args = parser.parse_args()
+    args.chats = [int(value) for value in args.chats.split(",")]
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
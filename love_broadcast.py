@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import Counter
+
+from telegram import Update
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import CallbackContext
+
+import hearts
+from rate_limit import TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = os.getenv("LOVECAST_CHECKPOINT", "lovecast_checkpoint.json")
+CONCURRENCY = int(os.getenv("LOVECAST_CONCURRENCY", 16))
+# Чуть ниже глобального лимита Telegram в 30 сообщений в секунду
+RATE = float(os.getenv("LOVECAST_RATE", 25))
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 5.0
+
+
+class Broadcast:
+    """Рассылка сердечек с ограничением параллельности и скорости.
+
+    Прогресс периодически сохраняется в файл, поэтому прерванную
+    рассылку можно продолжить с того же места. global_bucket — общее с
+    планировщиком правок ведро: рассылка и правки полей вместе не
+    превышают глобальный лимит бота.
+    """
+
+    def __init__(self, broadcast_id, recipients, checkpoint_file=CHECKPOINT_FILE,
+                 done=None, failed=None, global_bucket=None):
+        self.id = broadcast_id
+        # Список (user_id, relation)
+        self.recipients = recipients
+        self.checkpoint_file = checkpoint_file
+        self.done = set(done or ())
+        self.failed = dict(failed or {})
+        self.failures = Counter(self.failed.values())
+        self.skipped = 0
+        self.sent = 0
+        self.retries = 0
+        self.started = time.monotonic()
+        self.bucket = TokenBucket(RATE)
+        self.global_bucket = global_bucket
+        self._variants = {}
+
+    @classmethod
+    def from_relations(cls, relations, global_bucket=None):
+        recipients = []
+        skipped = 0
+        for key, record in relations.items():
+            # Написать можно только по user_id, записи username_xxx пропускаем
+            if key.isdigit() and record["relation"] in hearts.HEART_TYPES:
+                recipients.append((key, record["relation"]))
+            else:
+                skipped += 1
+        broadcast = cls(uuid.uuid4().hex[:8], recipients, global_bucket=global_bucket)
+        broadcast.skipped = skipped
+        return broadcast
+
+    @classmethod
+    def load(cls, checkpoint_file=CHECKPOINT_FILE, global_bucket=None):
+        """Восстанавливает рассылку из файла контрольной точки"""
+        if not os.path.exists(checkpoint_file):
+            return None
+        with open(checkpoint_file, "r", encoding='utf-8') as f:
+            state = json.load(f)
+        broadcast = cls(
+            state["id"], [tuple(r) for r in state["recipients"]], checkpoint_file,
+            done=state["done"], failed=state["failed"], global_bucket=global_bucket
+        )
+        broadcast.skipped = state.get("skipped", 0)
+        return broadcast
+
+    @property
+    def total(self) -> int:
+        return len(self.recipients)
+
+    @property
+    def finished(self) -> bool:
+        return len(self.done) >= self.total
+
+    def save_checkpoint(self) -> None:
+        state = {
+            "id": self.id,
+            "recipients": self.recipients,
+            "done": sorted(self.done),
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+        tmp_file = self.checkpoint_file + ".tmp"
+        with open(tmp_file, "w", encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def _message_for(self, relation: str) -> str:
+        if relation not in self._variants:
+            self._variants[relation] = hearts.heart_variants(relation)
+        return random.choice(self._variants[relation])
+
+    def progress_text(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return (
+            f"📤 Рассылка {self.id}: {len(self.done)}/{self.total}\n"
+            f"✅ Отправлено: {self.sent}\n"
+            f"❌ Ошибок: {len(self.failed)}"
+            + (f" ({', '.join(f'{k}: {v}' for k, v in self.failures.items())})" if self.failures else "")
+            + f"\n⏱ {elapsed:.0f} с, повторов: {self.retries}"
+        )
+
+    async def run(self, bot, on_progress=None) -> None:
+        queue = asyncio.Queue()
+        for user_id, relation in self.recipients:
+            if user_id not in self.done:
+                queue.put_nowait((user_id, relation, 1))
+
+        # Рендерим все варианты заранее, до начала отправки
+        for relation in {relation for _, relation in self.recipients}:
+            self._message_for(relation)
+
+        workers = [asyncio.create_task(self._worker(bot, queue)) for _ in range(CONCURRENCY)]
+        joined = asyncio.create_task(queue.join())
+        try:
+            while not joined.done():
+                await asyncio.wait({joined}, timeout=PROGRESS_INTERVAL)
+                self.save_checkpoint()
+                if on_progress is not None:
+                    await on_progress(self)
+        finally:
+            joined.cancel()
+            for worker in workers:
+                worker.cancel()
+            self.save_checkpoint()
+
+    async def _worker(self, bot, queue) -> None:
+        while True:
+            user_id, relation, attempt = await queue.get()
+            try:
+                await self.bucket.acquire()
+                if self.global_bucket is not None:
+                    await self.global_bucket.acquire()
+                await bot.send_message(
+                    chat_id=int(user_id),
+                    text=self._message_for(relation),
+                    parse_mode='HTML'
+                )
+                self.sent += 1
+                self.done.add(user_id)
+            except RetryAfter as e:
+                # Лимит общий для бота — приостанавливаем всех отправителей,
+                # включая правки полей и зрителей на глобальном ведре
+                delay = retry_after_seconds(e)
+                self.bucket.block(delay)
+                if self.global_bucket is not None:
+                    self.global_bucket.block(delay)
+                self.retries += 1
+                if attempt < MAX_ATTEMPTS:
+                    queue.put_nowait((user_id, relation, attempt + 1))
+                else:
+                    self._fail(user_id, e)
+            except TelegramError as e:
+                self._fail(user_id, e)
+            except Exception as e:
+                # Любая другая ошибка (битый id в контрольной точке, сеть) — провал
+                # получателя, а не смерть воркера: иначе queue.join() не дождется
+                self._fail(user_id, e)
+            finally:
+                queue.task_done()
+
+    def _fail(self, user_id, error) -> None:
+        reason = type(error).__name__
+        self.failed[user_id] = reason
+        self.failures[reason] += 1
+        self.done.add(user_id)
+        logger.warning(f"Не удалось отправить сердечко {user_id}: {error}")
+
+
+# Текущая рассылка (одна на процесс) и общее ведро глобального лимита бота
+_current = {"broadcast": None, "task": None, "global_bucket": None}
+
+
+def use_global_bucket(bucket) -> None:
+    """Рассылки будут делить глобальный лимит с этим ведром (edit_scheduler.global_bucket)"""
+    _current["global_bucket"] = bucket
+
+
+async def love_broadcast(update: Update, context: CallbackContext) -> None:
+    """Обработчик /lovecast [resume|stop]"""
+    if not hearts.is_admin(update.message.from_user.username):
+        await update.message.reply_text("❌ Недостаточно прав.")
+        return
+
+    action = context.args[0].lower() if context.args else "start"
+    task = _current["task"]
+    running = task is not None and not task.done()
+
+    if action == "stop":
+        if not running:
+            await update.message.reply_text("ℹ️ Рассылка не запущена.")
+            return
+        task.cancel()
+        await update.message.reply_text(
+            f"⏹ Рассылка остановлена. Продолжить: /lovecast resume\n\n"
+            f"{_current['broadcast'].progress_text()}"
+        )
+        return
+
+    if running:
+        await update.message.reply_text(f"ℹ️ Рассылка уже идёт.\n\n{_current['broadcast'].progress_text()}")
+        return
+
+    if action == "resume":
+        broadcast = Broadcast.load(global_bucket=_current["global_bucket"])
+        if broadcast is None or broadcast.finished:
+            await update.message.reply_text("ℹ️ Нет незавершённой рассылки.")
+            return
+    else:
+        broadcast = Broadcast.from_relations(hearts.get_relations(), _current["global_bucket"])
+        if not broadcast.total:
+            await update.message.reply_text("ℹ️ Нет пользователей с известным user_id.")
+            return
+
+    status = await update.message.reply_text(
+        f"📤 Рассылка {broadcast.id}: получателей {broadcast.total}, "
+        f"пропущено без user_id: {broadcast.skipped}"
+    )
+
+    async def on_progress(current: Broadcast) -> None:
+        try:
+            await status.edit_text(current.progress_text())
+        except TelegramError:
+            pass
+
+    async def run() -> None:
+        try:
+            await broadcast.run(context.bot, on_progress)
+            await status.reply_text(f"🏁 Рассылка завершена.\n\n{broadcast.progress_text()}")
+        except asyncio.CancelledError:
+            logger.info(f"Рассылка {broadcast.id} остановлена: {len(broadcast.done)}/{broadcast.total}")
+
+    _current["broadcast"] = broadcast
+    _current["task"] = asyncio.create_task(run())
@@ -1,8 +1,14 @@
+from startup import STARTUP  # Первым: отсчет времени запуска
+
 import os
+import ssl
+import sys
+import asyncio
 import logging
-from hearts import setup_handlers
-from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+import certifi
+from urllib.parse import quote
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, WebAppInfo
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -11,12 +17,41 @@ from telegram.ext import (
     MessageHandler,
     filters
 )
-from my_tetris import Tetris
-from flask import Flask, send_from_directory
-import threading
+STARTUP.mark("import_telegram")
+
+# Pillow (рендерер), pygame, numpy и пул процессов подсказок здесь не
+# импортируются: они загружаются при первом использовании
+from hearts import setup_handlers
+from bitboard_tetris import LEFT, RIGHT, DOWN, ROTATE, HARD_DROP, PAUSE, RESET
+from frame_cache import FrameCache
+from edit_scheduler import GLOBAL_RATE, EditScheduler
+from game_store import GameStore
+from gravity import GravityScheduler
+from hint import HintService, format_hint
+from leaderboard import Leaderboard
+from replay import recorded_game
+from replay_export import ReplayExporter, game_bounds
+from rate_limit import RecentEvents
+from score_api import ScoreSubmissions
+from spectator import SpectatorHub, spectator_caption
+from text_board import render_text
+from metrics import REGISTRY, MetricsRequest, instrument_handlers
+from http_server import HttpServer, Request, Response
+from static_files import StaticFiles
+from webhook import run_webhook
+STARTUP.mark("import_modules")
+
+# Запущенный как скрипт (или в процессе шарда как __mp_main__) модуль доступен
+# и под именем main: повторный import main не создаст вторую копию игр,
+# хранилищ и регистраций метрик
+sys.modules.setdefault("main", sys.modules[__name__])
 
 # ===== ИНИЦИАЛИЗАЦИЯ =====
-load_dotenv()  # Загружаем переменные из .env
+# Загружаем переменные из .env рядом с main.py; без файла python-dotenv не нужен вовсе
+DOTENV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(DOTENV_PATH):
+    from dotenv import load_dotenv
+    load_dotenv(DOTENV_PATH)
 
 # ===== НАСТРОЙКА ЛОГИРОВАНИЯ =====
 logging.basicConfig(
@@ -27,38 +62,145 @@ logger = logging.getLogger(__name__)
 
 # ===== КОНФИГУРАЦИЯ =====
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-if not TOKEN:
-    logger.error("Токен не найден! Проверьте .env файл")
-    exit(1)
 
-# Глобальное хранилище игр в тетрис
-games = {}
+# Адрес Bot API: можно направить бота на локальную замену (mock_bot_api.py)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
 
-# ===== FLASK SERVER ДЛЯ HTML-ФАЙЛОВ =====
-app = Flask(__name__)
+# Глобальное хранилище игр в тетрис: активные в памяти, простаивающие на диске
+games = GameStore(
+    os.getenv("GAMES_DB", "games.sqlite3"),
+    max_resident=int(os.getenv("GAMES_MAX_RESIDENT", 1000)),
+    idle_ttl=float(os.getenv("GAMES_IDLE_TTL", 600))
+)
 
-@app.route('/')
-def index():
-    return "Сервер запущен для обслуживания HTML-файлов"
+# Кэш кадров: одинаковые кадры отправляются по file_id без повторной загрузки
+frame_cache = FrameCache(max_entries=int(os.getenv("FRAME_CACHE_SIZE", 2048)))
 
-@app.route('/<path:filename>')
-def serve_file(filename):
-    try:
-        return send_from_directory('.', filename)
-    except FileNotFoundError:
-        return "Файл не найден", 404
+# Не больше одного редактирования поля в чат за TETRIS_EDIT_INTERVAL секунд
+edit_scheduler = EditScheduler(min_interval=float(os.getenv("TETRIS_EDIT_INTERVAL", 1.0)))
 
-def run_flask():
-    port = int(os.environ.get("PORT", 8080))
-    logger.info(f"Запуск Flask на порту: {port}")
-    app.run(host='0.0.0.0', port=port)
+# Зрители (/watch): кадр игры рендерится и загружается один раз и расходится по file_id,
+# правки зрителям делят общий лимит Telegram с планировщиком правок
+spectators = SpectatorHub(
+    frame_cache,
+    max_viewers=int(os.getenv("SPECTATOR_MAX_VIEWERS", 50)),
+    max_concurrency=int(os.getenv("SPECTATOR_CONCURRENCY", 8)),
+    global_bucket=edit_scheduler.global_bucket
+)
 
-# Запускаем Flask в отдельном потоке
-threading.Thread(target=run_flask, daemon=True).start()
+# Гравитация: фигуры падают сами, скорость растет с уровнем
+TETRIS_GRAVITY = os.getenv("TETRIS_GRAVITY", "1") != "0"
+gravity = GravityScheduler(
+    games,
+    tick=float(os.getenv("TETRIS_GRAVITY_TICK", 0.25)),
+    idle_timeout=float(os.getenv("TETRIS_GRAVITY_IDLE", 120))
+)
+
+# Режим поля по умолчанию: photo — картинка, text — эмодзи, auto — картинка,
+# а при частых 429 на правках картинок — эмодзи. Обратно на картинки не раньше
+# чем через TETRIS_AUTO_TEXT_HOLD секунд и после TETRIS_AUTO_TEXT_QUIET секунд без 429:
+# каждая смена режима — перевыкладка поля во всех auto-чатах
+TETRIS_RENDER_MODE = os.getenv("TETRIS_RENDER_MODE", "auto")
+RENDER_MODES = ("photo", "text", "auto")
+photo_rate_limits = RecentEvents(
+    window=float(os.getenv("TETRIS_AUTO_TEXT_WINDOW", 60)),
+    threshold=int(os.getenv("TETRIS_AUTO_TEXT_THRESHOLD", 3)),
+    hold=float(os.getenv("TETRIS_AUTO_TEXT_HOLD", 300)),
+    quiet=float(os.getenv("TETRIS_AUTO_TEXT_QUIET", 120))
+)
+
+# Подсказки: поиск лучшего хода в отдельных процессах, не дольше HINT_BUDGET секунд
+hints = HintService(
+    workers=int(os.getenv("HINT_WORKERS", 2)),
+    budget=float(os.getenv("HINT_BUDGET", 1.5))
+)
+
+# Повторы законченных игр (/replay): анимация собирается в отдельном процессе
+# не дольше REPLAY_BUDGET секунд, не больше REPLAY_MAX_FRAMES кадров и REPLAY_MAX_BYTES байт
+replays = ReplayExporter(
+    workers=int(os.getenv("REPLAY_WORKERS", 1)),
+    budget=float(os.getenv("REPLAY_BUDGET", 15)),
+    image_format=os.getenv("REPLAY_FORMAT", "GIF"),
+    max_frames=int(os.getenv("REPLAY_MAX_FRAMES", 400)),
+    max_bytes=int(os.getenv("REPLAY_MAX_BYTES", 2_000_000))
+)
+
+# Рекорды: итоги законченных игр по чатам и общий рейтинг
+leaderboard = Leaderboard(os.getenv("LEADERBOARD_DB", "leaderboard.sqlite3"))
+
+# ===== HTTP-СЕРВЕР ДЛЯ HTML-ФАЙЛОВ =====
+# Работает в цикле событий бота и отдает только файлы игр
+http_server = HttpServer(port=int(os.environ.get("PORT", 8080)))
+static_files = StaticFiles()
+static_files.register(http_server)
+
+async def index(request: Request) -> Response:
+    return Response(200, "Сервер запущен для обслуживания HTML-файлов")
+
+http_server.route("GET", "/", index)
+
+# Результаты веб-тетриса: POST /api/score, запись в рекорды пачками
+scores = ScoreSubmissions(
+    leaderboard,
+    TOKEN or "",
+    queue_size=int(os.getenv("SCORE_QUEUE_SIZE", 10000)),
+    batch_size=int(os.getenv("SCORE_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("SCORE_FLUSH_INTERVAL", 1.0)),
+    user_rate=float(os.getenv("SCORE_USER_RATE", 0.1)),
+    user_burst=float(os.getenv("SCORE_USER_BURST", 3))
+)
+scores.register(http_server)
+
+# ===== МЕТРИКИ =====
+def render_stats() -> dict:
+    # Рендерер загружается с первым кадром; до него и считать нечего
+    if "board_renderer" not in sys.modules:
+        return {"rendered_total": 0, "render_seconds_total": 0.0, "encode_seconds_total": 0.0, "last_bytes": 0}
+    from board_renderer import get_renderer
+    stats = get_renderer().stats
+    return {
+        "rendered_total": stats.frames,
+        "render_seconds_total": stats.total_render_ms / 1000,
+        "encode_seconds_total": stats.total_encode_ms / 1000,
+        "last_bytes": stats.bytes,
+    }
+
+REGISTRY.collect_stats("tetris_games", games.stats, counters=("hibernations", "rehydrations"))
+REGISTRY.collect_stats("tetris_frame_cache", frame_cache.stats,
+                       counters=("hits", "misses", "file_id_hits", "evictions"))
+REGISTRY.collect_stats("tetris_edits", edit_scheduler.stats,
+                       counters=("edits_sent", "edits_coalesced", "retries", "errors"))
+REGISTRY.collect_stats("tetris_gravity", gravity.stats, counters=("ticks", "drops", "lag_ticks"))
+REGISTRY.collect_stats("tetris_frames", render_stats,
+                       counters=("rendered_total", "render_seconds_total", "encode_seconds_total"))
+REGISTRY.collect_stats("tetris_hints", hints.stats,
+                       counters=("requests", "cache_hits", "timeouts", "partial", "errors"))
+REGISTRY.collect_stats("tetris_spectators", spectators.stats, counters=("edits", "uploads", "dropped", "errors"))
+REGISTRY.collect_labeled_stats("tetris_spectator_game", spectators.game_stats, "chat_id",
+                               counters=("frames", "edits", "uploads", "dropped", "retries", "errors"))
+REGISTRY.collect_stats("tetris_replays", replays.stats, counters=("exports", "timeouts", "errors", "bytes_total"))
+REGISTRY.collect_stats("tetris_leaderboard", leaderboard.stats, counters=("recorded", "synced"))
+REGISTRY.collect_stats("web_scores", scores.stats, counters=(
+    "accepted", "rejected_full", "rejected_invalid", "rejected_auth",
+    "rejected_duplicate", "rejected_rate", "flushed", "batches", "errors"
+))
+REGISTRY.collect_stats("tetris_photo_rate_limits", lambda: {
+    "total": photo_rate_limits.total,
+    "recent": photo_rate_limits.count(),
+    "auto_text": int(photo_rate_limits.active()),
+    "auto_text_switches": photo_rate_limits.activations,
+}, counters=("total", "auto_text_switches"))
+REGISTRY.collect_stats("bot_startup", STARTUP.stats)
+REGISTRY.register_endpoint(http_server)
+STARTUP.mark("config")
 
 # ===== ГАРАНТИРОВАННО РАБОЧИЕ ССЫЛКИ НА ИГРЫ =====
-HEART_GAME_URL = "https://rawcdn.githack.com/ghhghfhfh/telegram-bot-games/refs/heads/main/hearts.html"
-TETRIS_GAME_URL = "https://rawcdn.githack.com/ghhghfhfh/telegram-bot-games/refs/heads/main/tetris.html"
+# PUBLIC_BASE_URL — адрес встроенного HTTP-сервера, если игры раздает он сам
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://rawcdn.githack.com/ghhghfhfh/telegram-bot-games/refs/heads/main").rstrip("/")
+HEART_GAME_URL = f"{PUBLIC_BASE_URL}/hearts.html"
+TETRIS_GAME_URL = f"{PUBLIC_BASE_URL}/tetris.html"
+# Куда веб-тетрис отправляет результаты; пусто — на тот же сервер, с которого открыт
+SCORE_API_URL = os.getenv("SCORE_API_URL", "")
 
 # ===== ОБРАБОТЧИКИ КОМАНД =====
 async def start(update: Update, context: CallbackContext) -> None:
@@ -69,6 +211,12 @@ async def start(update: Update, context: CallbackContext) -> None:
         "/help - показать справку\n"
         "/tetris - начать игру в тетрис\n"
         "/stop - завершить игру\n"
+        "/hint - подсказать лучший ход\n"
+        "/tetrismode - поле картинкой или эмодзи\n"
+        "/top - рекорды чата (/top all - общий рейтинг)\n"
+        "/rank - место чата в общем рейтинге\n"
+        "/replay - повтор последней игры\n"
+        "/share - пригласить зрителей, /watch КОД - смотреть чужую игру\n"
         "/heartgame - открыть игру с сердечками\n"
         "/webtetris - открыть веб-версию тетриса\n"
         "/love - получить красивое сердечко"
@@ -82,6 +230,11 @@ async def help_command(update: Update, context: CallbackContext) -> None:
         "2. Игра в тетрис:\n"
         "   /tetris - начать новую игру\n"
         "   /stop - завершить текущую игру\n"
+        "   /hint - подсказать лучший ход\n"
+        "   /top - рекорды чата, /top all - общий рейтинг\n"
+        "   /rank - место чата в общем рейтинге\n"
+        "   /replay - повтор последней игры анимацией\n"
+        "   /share - код для зрителей, /watch КОД - смотреть игру, /unwatch - перестать\n"
         "3. HTML-игры:\n"
         "   /heartgame - открыть игру с сердечками\n"
         "   /webtetris - открыть веб-версию тетриса\n\n"
@@ -90,7 +243,9 @@ async def help_command(update: Update, context: CallbackContext) -> None:
         "↓ - ускорить падение\n"
         "↻ - поворот фигуры\n"
         "⏏️ - мгновенное падение\n"
-        "⏯ - пауза/продолжить"
+        "⏯ - пауза/продолжить\n"
+        "💡 - подсказка\n\n"
+        "/tetrismode photo|text|auto - поле картинкой или эмодзи"
     )
 
 # ===== ОТПРАВКА ССЫЛОК НА HTML-ФАЙЛЫ =====
@@ -107,9 +262,17 @@ async def show_heart_game(update: Update, context: CallbackContext) -> None:
 
 async def show_web_tetris(update: Update, context: CallbackContext) -> None:
     try:
+        reply_markup = None
+        if update.effective_chat.type == "private":
+            # Кнопки WebApp работают только в личке; открытая так игра присылает результат в /top
+            url = f"{TETRIS_GAME_URL}?api={quote(SCORE_API_URL, safe='')}" if SCORE_API_URL else TETRIS_GAME_URL
+            reply_markup = InlineKeyboardMarkup([[
+                InlineKeyboardButton("🎮 Играть с рекордами", web_app=WebAppInfo(url))
+            ]])
         await update.message.reply_text(
             f"🎮 Веб-версия тетриса:\n{TETRIS_GAME_URL}",
-            disable_web_page_preview=True
+            disable_web_page_preview=True,
+            reply_markup=reply_markup
         )
         logger.info(f"Отправлена ссылка на tetris.html: {TETRIS_GAME_URL}")
     except Exception as e:
@@ -117,74 +280,339 @@ async def show_web_tetris(update: Update, context: CallbackContext) -> None:
         await update.message.reply_text("Произошла ошибка при отправке ссылки")
 
 # ===== ОБРАБОТЧИКИ ТЕТРИСА =====
+def finish_game(chat_id, tetris, user) -> str:
+    """Записывает итог игры в рекорды и её журнал для /replay; текст для игрока или пустая строка"""
+    if tetris.log is not None:
+        games.archive(chat_id, tetris, game_bounds(tetris.log)[0])
+    result = leaderboard.record(chat_id, tetris, user)
+    if result is None:
+        return ""
+    place, total = result
+    return f"\n🏆 {tetris.score} очков — {place}-е место из {total} в чате"
+
 async def start_tetris(update: Update, context: CallbackContext) -> None:
     chat_id = update.effective_chat.id
-    games[chat_id] = Tetris()
+    edit_scheduler.cancel(chat_id)
+    # Новая игра поверх старой: итог старой сохраняем
+    old = games.get(chat_id)
+    if old is not None:
+        finish_game(chat_id, old, update.effective_user)
+    # Своё зерно и журнал ходов: игру можно восстановить и повторить
+    games[chat_id] = recorded_game()
     await send_tetris_board(update, context)
+    gravity.touch(chat_id, games[chat_id])
 
 async def stop_tetris(update: Update, context: CallbackContext) -> None:
     chat_id = update.effective_chat.id
     if chat_id in games:
-        del games[chat_id]
-        await update.message.reply_text("Игра завершена!")
+        edit_scheduler.cancel(chat_id)
+        gravity.remove(chat_id)
+        spectators.close(chat_id)
+        result = finish_game(chat_id, games.pop(chat_id), update.effective_user)
+        await update.message.reply_text("Игра завершена!" + result)
     else:
         await update.message.reply_text("Активная игра не найдена.")
 
-async def send_tetris_board(update: Update, context: CallbackContext, is_callback=False):
+async def hint_text(tetris) -> str:
+    """Текст подсказки для текущей фигуры"""
+    if tetris.game_over:
+        return "Игра окончена — начните новую"
+    if tetris.paused:
+        return "Игра на паузе"
+    hint = await hints.best_move(tetris)
+    if hint is None:
+        return "Не успел найти ход, попробуйте еще раз"
+    return f"💡 {format_hint(hint)}"
+
+async def hint_command(update: Update, context: CallbackContext) -> None:
     chat_id = update.effective_chat.id
+    if chat_id not in games:
+        await update.message.reply_text("Активная игра не найдена. Начните новую игру /tetris")
+        return
+    await update.message.reply_text(await hint_text(games[chat_id]))
 
-    # Создаем новую игру, если нужно
+async def replay_command(update: Update, context: CallbackContext) -> None:
+    chat_id = update.effective_chat.id
+    # Законченная, но не закрытая игра; иначе — последняя сохраненная
+    current = games.get(chat_id)
+    if current is not None and current.game_over and current.log is not None:
+        log = current.log
+        start, stop = game_bounds(log)
+    else:
+        archived = games.last_replay(chat_id)
+        if archived is None:
+            await update.message.reply_text("Повторять пока нечего — сыграйте в /tetris")
+            return
+        log, start, stop = archived
+
+    await context.bot.send_chat_action(chat_id, "upload_video")
+    data = await replays.export(log, start, stop)
+    if data is None:
+        await update.message.reply_text("Не успел собрать повтор, попробуйте позже")
+        return
+    if replays.image_format == "WEBP":
+        # sendAnimation принимает только GIF и MP4, анимированный WebP уходит файлом
+        await context.bot.send_document(chat_id, data, filename="replay.webp", caption="🎬 Повтор игры")
+    else:
+        await context.bot.send_animation(chat_id, data, filename="replay.gif", caption="🎬 Повтор игры")
+
+async def share_command(update: Update, context: CallbackContext) -> None:
+    chat_id = update.effective_chat.id
     if chat_id not in games:
-        games[chat_id] = Tetris()
+        await update.message.reply_text("Активная игра не найдена. Начните новую игру /tetris")
+        return
+    code = spectators.share(chat_id)
+    await update.message.reply_text(f"👀 Чтобы смотреть эту игру, отправьте в другом чате:\n/watch {code}")
 
-    tetris = games[chat_id]
+async def watch_command(update: Update, context: CallbackContext) -> None:
+    chat_id = update.effective_chat.id
+    if not context.args:
+        await update.message.reply_text("Укажите код: /watch КОД (его дает /share в чате с игрой)")
+        return
+    game_chat_id = spectators.game_for(context.args[0])
+    tetris = games.get(game_chat_id) if game_chat_id is not None else None
+    if tetris is None:
+        await update.message.reply_text("Игра не найдена или уже завершена")
+        return
+    if game_chat_id == chat_id:
+        await update.message.reply_text("Это игра этого чата")
+        return
+    if spectators.watching(chat_id) != game_chat_id and not spectators.can_watch(game_chat_id):
+        await update.message.reply_text("У этой игры уже слишком много зрителей")
+        return
 
-    # Создаем клавиатуру управления
-    keyboard = [
-        [
-            InlineKeyboardButton("←", callback_data="left"),
-            InlineKeyboardButton("↓", callback_data="down"),
-            InlineKeyboardButton("→", callback_data="right")
-        ],
-        [
-            InlineKeyboardButton("↻ Поворот", callback_data="rotate"),
-            InlineKeyboardButton("⏏️ Падение", callback_data="drop")
-        ],
-        [
-            InlineKeyboardButton("⏯ Пауза", callback_data="pause"),
-            InlineKeyboardButton("🔄 Новая игра", callback_data="new"),
-            InlineKeyboardButton("❌ Выход", callback_data="stop")
-        ]
-    ]
+    # Первый кадр — новым сообщением; дальше оно редактируется при каждом ходе
+    frame_key, frame, text = render_board(game_chat_id, tetris)
+    caption = spectator_caption(text)
+    message = await context.bot.send_photo(chat_id=chat_id, photo=frame.media, caption=caption)
+    frame_cache.remember_file_id(frame_key, message)
+    spectators.add_viewer(game_chat_id, chat_id, message.message_id, shown=(frame_key, caption))
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
+async def unwatch_command(update: Update, context: CallbackContext) -> None:
+    if spectators.remove_viewer(update.effective_chat.id) is None:
+        await update.message.reply_text("Вы не смотрите ни одной игры")
+    else:
+        await update.message.reply_text("Больше не смотрим 👋")
+
+def publish_spectators(bot, chat_id, tetris) -> None:
+    """Отдает зрителям текущий кадр игры (рендер общий с владельцем через кэш кадров)"""
+    if spectators.watched(chat_id):
+        frame_key, frame, text = render_board(chat_id, tetris)
+        spectators.publish(bot, chat_id, frame_key, frame, text)
+
+async def tetris_mode_command(update: Update, context: CallbackContext) -> None:
+    chat_id = update.effective_chat.id
+    chat_data = context.chat_data
+    if not context.args:
+        mode = chat_data.get('tetris_mode', TETRIS_RENDER_MODE)
+        await update.message.reply_text(
+            f"Режим поля: {mode} (сейчас {board_mode(chat_data)}).\n"
+            "/tetrismode photo — картинка, text — эмодзи, auto — эмодзи при перегрузке"
+        )
+        return
+
+    mode = context.args[0].lower()
+    if mode not in RENDER_MODES:
+        await update.message.reply_text("Неизвестный режим. Доступны: photo, text, auto")
+        return
+    chat_data['tetris_mode'] = mode
+    await update.message.reply_text(f"Режим поля: {mode}")
+    # Открытое поле переедет в новый режим при ближайшем обновлении
+    if chat_id in games and 'tetris_message' in chat_data:
+        edit_scheduler.request(chat_id, lambda: refresh_board(context.bot, chat_id, chat_data))
 
-    # Получаем изображение и текст состояния
-    board_img = tetris.get_board_image()
+async def top_command(update: Update, context: CallbackContext) -> None:
+    chat_id = update.effective_chat.id
+    overall = bool(context.args) and context.args[0].lower() == "all"
+    entries = leaderboard.top(None if overall else chat_id)
+    if not entries:
+        await update.message.reply_text("Рекордов пока нет — сыграйте в /tetris")
+        return
+    title = "🏆 Общий рейтинг:" if overall else "🏆 Рекорды чата:"
+    lines = [title]
+    for place, row in entries:
+        name = row[3] or "Игрок"
+        lines.append(f"{place}. {name} — {row[4]} (линий: {row[5]}, уровень {row[6]})")
+    await update.message.reply_text("\n".join(lines))
+
+async def rank_command(update: Update, context: CallbackContext) -> None:
+    result = leaderboard.rank(update.effective_chat.id)
+    if result is None:
+        await update.message.reply_text("В этом чате еще нет рекордов — сыграйте в /tetris")
+        return
+    place, total, row = result
+    await update.message.reply_text(f"🏆 Лучший результат чата: {row[4]} очков — {place}-е место из {total}")
+
+# Кнопки -> действия движка (пишутся в журнал ходов)
+BUTTON_ACTIONS = {
+    "left": LEFT,
+    "right": RIGHT,
+    "down": DOWN,
+    "rotate": ROTATE,
+    "drop": HARD_DROP,
+    "pause": PAUSE,
+    "new": RESET,
+}
+
+# Клавиатура управления
+TETRIS_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("←", callback_data="left"),
+        InlineKeyboardButton("↓", callback_data="down"),
+        InlineKeyboardButton("→", callback_data="right")
+    ],
+    [
+        InlineKeyboardButton("↻ Поворот", callback_data="rotate"),
+        InlineKeyboardButton("⏏️ Падение", callback_data="drop"),
+        InlineKeyboardButton("💡 Подсказка", callback_data="hint")
+    ],
+    [
+        InlineKeyboardButton("⏯ Пауза", callback_data="pause"),
+        InlineKeyboardButton("🔄 Новая игра", callback_data="new"),
+        InlineKeyboardButton("❌ Выход", callback_data="stop")
+    ]
+])
+
+def render_board(chat_id, tetris):
+    """Кадр поля (из кэша или рендерим) и текст состояния"""
+    frame_key, frame = frame_cache.get_or_render(tetris)
     text = tetris.get_state_text()
+    if logger.isEnabledFor(logging.DEBUG):
+        from board_renderer import get_renderer
+        logger.debug(
+            f"Кадр для чата {chat_id}: {get_renderer().stats.as_dict()}, "
+            f"кэш: {frame_cache.stats()}"
+        )
+    return frame_key, frame, text
+
+def board_mode(chat_data) -> str:
+    """Как показывать поле в чате сейчас: photo или text"""
+    mode = chat_data.get('tetris_mode', TETRIS_RENDER_MODE)
+    if mode == "auto":
+        # Правки картинок упираются в лимиты — пережидаем на тексте
+        return "text" if photo_rate_limits.active() else "photo"
+    return mode
+
+async def send_tetris_board(update: Update, context: CallbackContext, is_callback=False):
+    chat_id = update.effective_chat.id
+
+    # Игру успели завершить, пока редактирование ждало своей очереди
+    if is_callback and chat_id not in games:
+        return
 
-    # Отправляем/обновляем сообщение
     if is_callback:
-        query = update.callback_query
-        await query.message.edit_media(
-            media=InputMediaPhoto(media=board_img, caption=text),
-            reply_markup=reply_markup
-        )
-        await query.answer()
-    else:
-        if 'tetris_message' in context.chat_data:
-            try:
-                await context.bot.delete_message(chat_id, context.chat_data['tetris_message'])
-            except:
-                pass
+        context.chat_data['tetris_message'] = update.callback_query.message.message_id
+        await refresh_board(context.bot, chat_id, context.chat_data)
+        return
+
+    # Создаем новую игру, если нужно
+    if chat_id not in games:
+        games[chat_id] = recorded_game()
+
+    await post_board(context.bot, chat_id, context.chat_data, games[chat_id])
+    publish_spectators(context.bot, chat_id, games[chat_id])
+
+async def post_board(bot, chat_id, chat_data, tetris) -> None:
+    """Отправляет поле новым сообщением, удаляя прежнее"""
+    mode = board_mode(chat_data)
+    if 'tetris_message' in chat_data:
+        try:
+            await bot.delete_message(chat_id, chat_data['tetris_message'])
+        except:
+            pass
 
-        message = await context.bot.send_photo(
+    if mode == "text":
+        text = render_text(tetris)
+        message = await bot.send_message(chat_id=chat_id, text=text, reply_markup=TETRIS_KEYBOARD)
+        chat_data['tetris_frame'] = ("text", text)
+    else:
+        frame_key, frame, text = render_board(chat_id, tetris)
+        message = await bot.send_photo(
             chat_id=chat_id,
-            photo=board_img,
+            photo=frame.media,
             caption=text,
-            reply_markup=reply_markup
+            reply_markup=TETRIS_KEYBOARD
+        )
+        frame_cache.remember_file_id(frame_key, message)
+        chat_data['tetris_frame'] = (frame_key, text)
+    chat_data['tetris_message'] = message.message_id
+    chat_data['tetris_message_mode'] = mode
+
+async def refresh_board(bot, chat_id, chat_data) -> None:
+    """Перерисовывает поле в уже отправленном сообщении (кнопки и гравитация)"""
+    tetris = games.get(chat_id)
+    if tetris is None or 'tetris_message' not in chat_data:
+        return
+    try:
+        await update_board(bot, chat_id, chat_data, tetris)
+    finally:
+        # Зрителям — после владельца: в режиме картинки кадр уже загружен и есть file_id
+        publish_spectators(bot, chat_id, tetris)
+
+async def update_board(bot, chat_id, chat_data, tetris) -> None:
+    """Обновляет поле владельца в его режиме: картинка или эмодзи"""
+    mode = board_mode(chat_data)
+    if mode != chat_data.get('tetris_message_mode', "photo"):
+        # Картинку нельзя отредактировать в текст и обратно — отправляем поле заново
+        await post_board(bot, chat_id, chat_data, tetris)
+        return
+
+    if mode == "text":
+        text = render_text(tetris)
+        # Видимый текст не изменился (например, ход в стену) — запрос не нужен
+        if chat_data.get('tetris_frame') != ("text", text):
+            await edit_text_board(bot, chat_id, chat_data['tetris_message'], text)
+            chat_data['tetris_frame'] = ("text", text)
+        return
+
+    frame_key, frame, text = render_board(chat_id, tetris)
+    # Кадр и подпись не изменились — редактировать нечего
+    if chat_data.get('tetris_frame') != (frame_key, text):
+        try:
+            await edit_board_message(bot, chat_id, chat_data['tetris_message'], frame_key, frame, text)
+        except RetryAfter:
+            # Повтор сделает планировщик правок; режим auto учтет лимит
+            photo_rate_limits.hit()
+            raise
+        chat_data['tetris_frame'] = (frame_key, text)
+
+async def edit_text_board(bot, chat_id, message_id, text):
+    """Редактирует текстовое поле; «не изменилось» — не ошибка"""
+    try:
+        await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=text,
+            reply_markup=TETRIS_KEYBOARD
+        )
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+async def edit_board_message(bot, chat_id, message_id, frame_key, frame, text):
+    """Редактирует сообщение с полем, по возможности отправляя кадр по file_id"""
+    try:
+        result = await bot.edit_message_media(
+            chat_id=chat_id,
+            message_id=message_id,
+            media=InputMediaPhoto(media=frame.media, caption=text),
+            reply_markup=TETRIS_KEYBOARD
+        )
+    except BadRequest as e:
+        if "not modified" in str(e).lower():
+            return
+        if frame.file_id is None:
+            raise
+        # file_id больше не принимается — загружаем кадр заново
+        logger.warning(f"Не удалось отправить кадр по file_id: {e}")
+        frame_cache.forget_file_id(frame_key)
+        result = await bot.edit_message_media(
+            chat_id=chat_id,
+            message_id=message_id,
+            media=InputMediaPhoto(media=frame.data, caption=text),
+            reply_markup=TETRIS_KEYBOARD
         )
-        context.chat_data['tetris_message'] = message.message_id
+    frame_cache.remember_file_id(frame_key, result)
 
 async def button_handler(update: Update, context: CallbackContext) -> None:
     query = update.callback_query
@@ -197,50 +625,167 @@ async def button_handler(update: Update, context: CallbackContext) -> None:
 
     tetris = games[chat_id]
 
-    if data == "left":
-        tetris.move(-1, 0)
-    elif data == "right":
-        tetris.move(1, 0)
-    elif data == "down":
-        tetris.move(0, 1)
-    elif data == "rotate":
-        tetris.rotate_piece()
-    elif data == "drop":
-        while tetris.drop():
-            pass
-    elif data == "pause":
-        tetris.paused = not tetris.paused
-    elif data == "new":
-        tetris.reset()
+    notice = None
+    if data == "new":
+        # Итог и журнал предыдущей игры сохраняются до сброса
+        notice = finish_game(chat_id, tetris, update.effective_user).strip() or None
+
+    if data in BUTTON_ACTIONS:
+        tetris.apply(BUTTON_ACTIONS[data])
     elif data == "stop":
-        del games[chat_id]
+        edit_scheduler.cancel(chat_id)
+        gravity.remove(chat_id)
+        spectators.close(chat_id)
+        result = finish_game(chat_id, games.pop(chat_id), update.effective_user)
         await query.message.delete()
-        await query.answer("Игра завершена!")
+        await query.answer("Игра завершена!" + result)
         return
+    elif data == "hint":
+        # Поле не меняется: подсказка приходит всплывающим уведомлением
+        gravity.touch(chat_id, tetris)
+        await query.answer(await hint_text(tetris), show_alert=True)
+        return
+
+    gravity.touch(chat_id, tetris)
 
-    await send_tetris_board(update, context, is_callback=True)
+    # Отвечаем на нажатие сразу, а поле обновится с учетом всех накопившихся ходов
+    await query.answer(notice)
+    edit_scheduler.request(chat_id, lambda: send_tetris_board(update, context, is_callback=True))
 
 # ===== ЗАПУСК БОТА =====
-def main() -> None:
-    application = Application.builder().token(TOKEN).build()
+def start_gravity(application: Application) -> None:
+    """Запускает гравитацию; упавшие фигуры перерисовываются через планировщик правок"""
+    if not TETRIS_GRAVITY:
+        return
+
+    def on_tick(chat_id):
+        chat_data = application.chat_data.get(chat_id, {})
+        edit_scheduler.request(chat_id, lambda: refresh_board(application.bot, chat_id, chat_data))
+
+    gravity.on_tick = on_tick
+    gravity.start()
+
+def report_startup() -> None:
+    STARTUP.mark("initialize")
+    logger.info(STARTUP.report())
+
+async def post_init(application: Application) -> None:
+    """Запускает HTTP-сервер, гравитацию и пул подсказок"""
+    await http_server.start()
+    start_gravity(application)
+    hints.start()
+    report_startup()
+
+async def post_init_worker(application: Application) -> None:
+    """Воркер шарда: HTTP обслуживает фронтальный процесс"""
+    start_gravity(application)
+    hints.start()
+    report_startup()
+
+async def post_shutdown(application: Application) -> None:
+    """Останавливает HTTP-сервер и гравитацию, сохраняет игры на диск"""
+    gravity.stop()
+    edit_scheduler.cancel_all()
+    hints.shutdown()
+    replays.shutdown()
+    await http_server.stop()
+    await scores.stop()
+    leaderboard.close()
+    logger.info(f"Сохранение игр: {games.stats()}")
+    games.close()
+
+def shard_worker(shards=1):
+    """Приложение воркера шарда и состояние, которым управляет sharding (вызывается в процессе шарда)"""
+    # Лимит Telegram общий на бота: каждому из shards процессов — своя доля
+    edit_scheduler.global_bucket.set_rate(GLOBAL_RATE / shards)
+    return build_application(serve_http=False), games, edit_scheduler, gravity
+
+def require_token() -> None:
+    if not TOKEN:
+        logger.error("Токен не найден! Проверьте .env файл")
+        sys.exit(1)
+
+def build_application(serve_http=True) -> Application:
+    """Создает приложение бота со всеми обработчиками"""
+    require_token()
+    # Один SSL-контекст на оба HTTP-клиента: сертификаты читаются один раз, а не дважды
+    ssl_context = ssl.create_default_context(cafile=certifi.where())
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        # Запросы к Bot API считаются для /metrics
+        .request(MetricsRequest(connection_pool_size=256, httpx_kwargs={"verify": ssl_context}))
+        .get_updates_request(MetricsRequest(connection_pool_size=1, httpx_kwargs={"verify": ssl_context}))
+        .post_shutdown(post_shutdown)
+    )
+    if serve_http:
+        builder = builder.post_init(post_init)
+    else:
+        # Воркер шарда: обновления приходят от фронтального процесса
+        builder = builder.post_init(post_init_worker).updater(None)
+    application = builder.build()
 
     # Регистрация обработчиков команд
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("tetris", start_tetris))
     application.add_handler(CommandHandler("stop", stop_tetris))
+    application.add_handler(CommandHandler("hint", hint_command))
+    application.add_handler(CommandHandler("tetrismode", tetris_mode_command))
+    application.add_handler(CommandHandler("top", top_command))
+    application.add_handler(CommandHandler("rank", rank_command))
+    application.add_handler(CommandHandler("replay", replay_command))
+    application.add_handler(CommandHandler("share", share_command))
+    application.add_handler(CommandHandler("watch", watch_command))
+    application.add_handler(CommandHandler("unwatch", unwatch_command))
     application.add_handler(CommandHandler("heartgame", show_heart_game))
     application.add_handler(CommandHandler("webtetris", show_web_tetris))
 
-    # Добавляем обработчики из hearts.py
-    setup_handlers(application)
+    # Добавляем обработчики из hearts.py; рассылка сердечек делит глобальный лимит с правками полей
+    setup_handlers(application, edit_scheduler.global_bucket)
 
     # Обработчик инлайн-кнопок
     application.add_handler(CallbackQueryHandler(button_handler))
 
-    # Запуск бота
-    logger.info("Бот запущен и работает...")
-    application.run_polling()
+    # Время и ошибки всех обработчиков, включая обработчики из hearts.py
+    instrument_handlers(application)
+    STARTUP.mark("build_application")
+    return application
+
+def main() -> None:
+    require_token()
+    if os.getenv("BOT_MODE", "polling") == "sharded":
+        # Чаты распределяются по процессам-воркерам, этот процесс только принимает обновления
+        from sharding import run_front
+        logger.info("Бот запущен в режиме шардирования...")
+        asyncio.run(run_front(
+            http_server,
+            shard_worker,
+            token=TOKEN,
+            base_url=TELEGRAM_API_URL,
+            scores=scores,
+            leaderboard=leaderboard,
+            shards=int(os.getenv("SHARDS", os.cpu_count() or 2))
+        ))
+        return
+
+    application = build_application()
+
+    # Запуск бота: вебхук с пулом воркеров или long polling
+    if os.getenv("BOT_MODE", "polling") == "webhook":
+        logger.info("Бот запущен в режиме вебхука...")
+        asyncio.run(run_webhook(
+            application,
+            http_server,
+            url=os.getenv("WEBHOOK_URL"),
+            secret_token=os.getenv("WEBHOOK_SECRET"),
+            workers=int(os.getenv("WEBHOOK_WORKERS", 8)),
+            queue_size=int(os.getenv("WEBHOOK_QUEUE_SIZE", 10000))
+        ))
+    else:
+        logger.info("Бот запущен и работает...")
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+"""Метрики в текстовом формате Prometheus на встроенном HTTP-сервере.
+
+Счётчики и гистограммы обновляются за несколько операций со словарём,
+а статистика компонентов (игры, кэш кадров, рендер и т. д.) читается
+из их stats() только в момент запроса /metrics.
+"""
+import functools
+import time
+from bisect import bisect_left
+
+from telegram.request import HTTPXRequest
+
+from http_server import Response
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, labels=(), amount=1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по корзинам (последняя — +Inf), сумма]
+        self._values = {}
+
+    def observe(self, value, labels=()) -> None:
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class StatsCollector:
+    """Числовые поля stats() компонента как метрики prefix_<поле>.
+
+    Поля из counters экспортируются как счётчики, остальные — как gauge.
+    """
+
+    def __init__(self, prefix, stats, counters=()):
+        self.prefix = prefix
+        self.stats = stats
+        self.counters = set(counters)
+
+    def collect(self):
+        lines = []
+        for key, value in self.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            kind = "counter" if key in self.counters else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+
+class LabeledStatsCollector:
+    """Статистика по объектам (например, по играм): {значение метки: stats()}.
+
+    Каждое числовое поле — одна метрика prefix_<поле> с меткой label.
+    """
+
+    def __init__(self, prefix, stats, label, counters=()):
+        self.prefix = prefix
+        self.stats = stats
+        self.label = label
+        self.counters = set(counters)
+
+    def collect(self):
+        series = {}
+        for label_value, stats in self.stats().items():
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                series.setdefault(key, []).append((label_value, value))
+        lines = []
+        for key, values in series.items():
+            name = f"{self.prefix}_{key}"
+            kind = "counter" if key in self.counters else "gauge"
+            lines.append(f"# TYPE {name} {kind}")
+            for label_value, value in values:
+                lines.append(f"{name}{_format_labels((self.label,), (label_value,))} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def collect_stats(self, prefix, stats, counters=()) -> None:
+        self.register(StatsCollector(prefix, stats, counters))
+
+    def collect_labeled_stats(self, prefix, stats, label, counters=()) -> None:
+        self.register(LabeledStatsCollector(prefix, stats, label, counters))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    async def handle(self, request) -> Response:
+        return Response(200, self.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    def register_endpoint(self, server, path="/metrics") -> None:
+        server.route("GET", path, self.handle)
+
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Время обработки обновления обработчиком", ("handler",)
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Исключения в обработчиках по типу", ("handler", "exception")
+)
+API_LATENCY = REGISTRY.histogram(
+    "telegram_api_request_duration_seconds", "Время запроса к Bot API", ("method",)
+)
+API_CALLS = REGISTRY.counter(
+    "telegram_api_requests_total", "Запросы к Bot API по методу и HTTP-статусу", ("method", "status")
+)
+API_RATE_LIMITED = REGISTRY.counter(
+    "telegram_api_rate_limited_total", "Ответы 429 от Bot API", ("method",)
+)
+API_ERRORS = REGISTRY.counter(
+    "telegram_api_errors_total", "Сетевые ошибки запросов к Bot API", ("method", "exception")
+)
+
+
+def timed_handler(callback, name=None):
+    """Оборачивает корутину-обработчик: гистограмма времени и счётчик исключений"""
+    labels = (name or callback.__name__,)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            HANDLER_ERRORS.inc(labels + (type(e).__name__,))
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, labels)
+    return wrapper
+
+
+def instrument_handlers(application) -> None:
+    """Оборачивает все уже зарегистрированные обработчики приложения"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = timed_handler(handler.callback)
+
+
+class MetricsRequest(HTTPXRequest):
+    """HTTPXRequest, считающий вызовы Bot API, их время и ответы 429"""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        api_method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            status, payload = await super().do_request(url, method, request_data, **kwargs)
+        except Exception as e:
+            API_ERRORS.inc((api_method, type(e).__name__))
+            raise
+        finally:
+            API_LATENCY.observe(time.perf_counter() - started, (api_method,))
+        API_CALLS.inc((api_method, str(status)))
+        if status == 429:
+            API_RATE_LIMITED.inc((api_method,))
+        return status, payload
@@ -0,0 +1,190 @@
+"""Локальная замена Telegram Bot API для нагрузочного тестирования.
+
+    python mock_bot_api.py --port 8081
+    TELEGRAM_API_URL=http://127.0.0.1:8081/bot python main.py
+
+Реализует методы, которыми пользуется бот, и отвечает 429 с retry_after,
+как настоящий Telegram, когда бот превышает лимиты на чат или на бота.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import parse_qsl
+
+from fake_bot import FakeBotApi
+from http_server import HttpServer, Response
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Методы, на которые распространяются лимиты отправки сообщений
+LIMITED_METHODS = {"sendMessage", "sendPhoto", "editMessageMedia", "editMessageText"}
+
+
+def parse_params(request) -> dict:
+    """Параметры вызова из query string, JSON, urlencoded или multipart-тела"""
+    params = {key: values[-1] for key, values in request.query.items()}
+    content_type = request.headers.get("content-type", "")
+    if not request.body:
+        return params
+    if content_type.startswith("application/json"):
+        params.update(json.loads(request.body))
+    elif content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + request.body
+        )
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                # Загруженный файл: содержимое не нужно, только факт загрузки
+                params[name] = f"attach://{name}"
+            else:
+                params[name] = part.get_content()
+    else:
+        params.update(parse_qsl(request.body.decode()))
+    return params
+
+
+class MockBotApiServer:
+    """HTTP-сервер Bot API поверх FakeBotApi с лимитами и long polling.
+
+    on_call(method, params, result) вызывается после каждого успешного
+    вызова — так нагрузочный тест узнает, когда бот ответил.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8081, api=None,
+                 chat_rate=1.0, group_rate=20 / 60, global_rate=30.0, on_call=None):
+        self.api = api or FakeBotApi()
+        self.server = HttpServer(host, port, max_body=20 * 1024 * 1024)
+        self.server.route_prefix("POST", "/bot", self.handle)
+        self.server.route_prefix("GET", "/bot", self.handle)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.global_bucket = TokenBucket(global_rate) if global_rate else None
+        self._chat_buckets = {}
+        self.on_call = on_call
+        self._next_update_id = 1
+        self._updates = []
+        self._updates_event = asyncio.Event()
+        self.rate_limited = 0
+
+    # ===== ОБНОВЛЕНИЯ =====
+    def push_update(self, update: dict) -> int:
+        """Кладет обновление в очередь getUpdates; возвращает его update_id"""
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append({"update_id": update_id, **update})
+        self._updates_event.set()
+        return update_id
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        if offset:
+            # Telegram забывает обновления, получение которых подтверждено offset
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._updates_event.clear()
+            try:
+                await asyncio.wait_for(self._updates_event.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+
+    # ===== ЛИМИТЫ =====
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket(rate, capacity=max(1.0, rate * 3))
+        return bucket
+
+    def _retry_after(self, method, params):
+        """Через сколько секунд можно повторить вызов; 0 — лимит не превышен"""
+        if method not in LIMITED_METHODS:
+            return 0
+        buckets = []
+        if self.chat_rate and "chat_id" in params:
+            buckets.append(self._chat_bucket(int(params["chat_id"])))
+        if self.global_bucket is not None:
+            buckets.append(self.global_bucket)
+        exceeded = [(bucket, bucket.delay()) for bucket in buckets]
+        exceeded = [(bucket, wait) for bucket, wait in exceeded if wait > 0]
+        if exceeded:
+            retry_after = max(1, math.ceil(max(wait for _, wait in exceeded)))
+            # Повторы раньше срока тоже получают 429 (только там, где лимит превышен)
+            for bucket, _ in exceeded:
+                bucket.block(retry_after)
+            return retry_after
+        for bucket in buckets:
+            bucket.try_acquire()
+        return 0
+
+    # ===== HTTP =====
+    async def handle(self, request) -> Response:
+        method = request.path.rsplit("/", 1)[-1]
+        try:
+            params = parse_params(request)
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._error(400, f"Bad Request: {e}")
+
+        retry_after = self._retry_after(method, params)
+        if retry_after:
+            self.rate_limited += 1
+            return self._error(429, f"Too Many Requests: retry after {retry_after}",
+                               {"retry_after": retry_after})
+
+        if method == "getUpdates":
+            result = await self._get_updates(params)
+        else:
+            result = self.api.handle(method, params)
+        if self.on_call is not None:
+            self.on_call(method, params, result)
+        return Response(200, json.dumps({"ok": True, "result": result}), content_type="application/json")
+
+    @staticmethod
+    def _error(code, description, parameters=None):
+        body = {"ok": False, "error_code": code, "description": description}
+        if parameters:
+            body["parameters"] = parameters
+        return Response(code, json.dumps(body), content_type="application/json")
+
+    async def start(self) -> None:
+        await self.server.start()
+
+    async def stop(self) -> None:
+        # Отпускаем ждущие getUpdates, иначе их отменит закрытие цикла событий
+        self._updates_event.set()
+        await asyncio.sleep(0)
+        await self.server.stop()
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.api.counts), "rate_limited": self.rate_limited}
+
+
+async def _serve(args):
+    server = MockBotApiServer(args.host, args.port, chat_rate=args.chat_rate, global_rate=args.global_rate)
+    await server.start()
+    try:
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"Mock Bot API: {server.stats()}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--chat-rate", type=float, default=1.0, help="сообщений в секунду на чат (0 — без лимита)")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="сообщений в секунду на бота (0 — без лимита)")
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+
+
+class TokenBucket:
+    """Асинхронное «ведро токенов»: rate токенов в секунду, не больше capacity.
+
+    Ожидающие acquire обслуживаются по очереди прихода (FIFO): ждет
+    пополнения только первый из них, остальные стоят за ним в очереди и
+    не просыпаются все разом на каждый новый токен.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # До этого момента токены не выдаются (например, после 429 с retry_after)
+        self.blocked_until = 0.0
+        # Очередь ожидающих acquire; asyncio.Lock будит ждущих строго по порядку
+        self._queue = None
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Сколько секунд ждать, пока можно будет взять tokens токенов"""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < tokens:
+            wait = max(wait, (tokens - self.tokens) / self.rate)
+        return wait
+
+    def waiting(self) -> bool:
+        """Есть ожидающие acquire"""
+        return self._queue is not None and self._queue.locked()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        # Без очереди вперед ожидающих не проходим
+        if self.waiting() or self.delay(tokens) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        if self.try_acquire(tokens):
+            return
+        if self._queue is None:
+            self._queue = asyncio.Lock()
+        async with self._queue:
+            while True:
+                wait = self.delay(tokens)
+                if wait <= 0:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
+
+    def set_rate(self, rate: float, capacity: float = None) -> None:
+        """Меняет скорость (и емкость) ведра; накопленное сверх новой емкости сгорает"""
+        self._refill(time.monotonic())
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def block(self, seconds: float) -> None:
+        """Запрещает выдачу токенов на seconds секунд"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def idle(self) -> bool:
+        """Ведро полное и не заблокировано — его можно выбросить"""
+        return not self.waiting() and self.delay(self.capacity) == 0
+
+
+def retry_after_seconds(error) -> float:
+    """retry_after из telegram.error.RetryAfter в секундах (int или timedelta)"""
+    value = error.retry_after
+    if hasattr(value, "total_seconds"):
+        return value.total_seconds()
+    return float(value)
+
+
+class RecentEvents:
+    """Сколько событий (например, ответов 429) было за последние window секунд.
+
+    active() включается, когда событий за окно не меньше threshold, и
+    выключается только спустя hold секунд после включения и quiet секунд
+    без новых событий: иначе под нагрузкой режим переключался бы туда и
+    обратно с каждым опустевшим окном.
+    """
+
+    def __init__(self, window: float = 60.0, threshold: int = 3, hold: float = 0.0, quiet: float = 0.0):
+        self.window = window
+        self.threshold = threshold
+        self.hold = hold
+        self.quiet = quiet
+        self._times = deque()
+        self._last = None
+        self._active_since = None
+        self.total = 0
+        self.activations = 0
+
+    def hit(self) -> None:
+        self._last = time.monotonic()
+        self._times.append(self._last)
+        self.total += 1
+
+    def count(self) -> int:
+        cutoff = time.monotonic() - self.window
+        while self._times and self._times[0] < cutoff:
+            self._times.popleft()
+        return len(self._times)
+
+    def active(self) -> bool:
+        """Событий за окно не меньше threshold (с удержанием hold и тишиной quiet)"""
+        now = time.monotonic()
+        if self.count() >= self.threshold:
+            if self._active_since is None:
+                self._active_since = now
+                self.activations += 1
+            return True
+        if self._active_since is None:
+            return False
+        if now - self._active_since >= self.hold and now - self._last >= self.quiet:
+            self._active_since = None
+            return False
+        return True
@@ -0,0 +1,241 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+def load_data(filename: str) -> Dict[str, Any]:
+    """Загружает данные из JSON файла с автоматическим преобразованием формата"""
+    if os.path.exists(filename):
+        try:
+            with open(filename, "r", encoding='utf-8') as f:
+                data = json.load(f)
+                # Конвертация старого формата в новый
+                new_data = {}
+                for key, value in data.items():
+                    if isinstance(value, str):  # Старый формат: "user_id": "relation"
+                        new_data[key] = {"relation": value, "username": None}
+                    else:  # Новый формат: "user_id": {"relation": "...", "username": "..."}
+                        new_data[key] = value
+                return new_data
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Ошибка загрузки данных: {e}")
+            return {}
+    return {}
+
+
+def save_data(data: Dict[str, Any], filename: str) -> bool:
+    """Сохраняет данные в JSON файл"""
+    try:
+        with open(filename, "w", encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return True
+    except IOError as e:
+        print(f"Ошибка сохранения данных: {e}")
+        return False
+
+
+def storage_key_for(user_identifier: str) -> Tuple[str, Optional[str]]:
+    """Ключ хранения и username для записи: user_id как есть, username — username_xxx"""
+    if user_identifier.isdigit():
+        return user_identifier, None
+    return f"username_{user_identifier.lower()}", user_identifier
+
+
+class _WatchedFile(ABC):
+    """Перечитывает JSON файл, только если изменились его inode, mtime или размер"""
+
+    def __init__(self, filename: str, check_interval: float = 1.0):
+        self.filename = filename
+        self.check_interval = check_interval
+        self._stamp = None
+        self._checked_at = None
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        # stat не чаще раза в check_interval: горячий путь обходится без диска
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        stamp = self._file_stamp()
+        if stamp != self._stamp or self._stamp is None:
+            self._reload(load_data(self.filename))
+            self._stamp = stamp
+
+    def _save(self, data: Dict[str, Any]) -> bool:
+        saved = save_data(data, self.filename)
+        if saved:
+            # Свою же запись перечитывать не нужно
+            self._stamp = self._file_stamp()
+            self._checked_at = time.monotonic()
+        return saved
+
+    @abstractmethod
+    def _reload(self, data: Dict[str, Any]) -> None:
+        """Заменяет данные в памяти прочитанными из файла"""
+
+
+class RelationRepository(_WatchedFile):
+    """Отношения пользователей с индексами по user_id и username (в нижнем регистре)"""
+
+    def __init__(self, filename: str, check_interval: float = 1.0):
+        super().__init__(filename, check_interval)
+        self._data = {}
+        self._by_username = {}
+
+    def _reload(self, data: Dict[str, Any]) -> None:
+        self._data = data
+        self._by_username = {}
+        for key, record in data.items():
+            self._index(key, record)
+        # Ключи username_xxx — запасной вариант, записи с полем username важнее
+        for key in data:
+            if key.startswith("username_"):
+                self._by_username.setdefault(key[len("username_"):], key)
+
+    def _index(self, key: str, record: Dict[str, Any]) -> None:
+        username = record.get("username")
+        if username:
+            self._by_username.setdefault(username.lower(), key)
+
+    @staticmethod
+    def _usernames(key: str, record: Dict[str, Any]) -> List[str]:
+        """username (в нижнем регистре), которыми запись может владеть в индексе"""
+        usernames = []
+        if record.get("username"):
+            usernames.append(record["username"].lower())
+        if key.startswith("username_"):
+            usernames.append(key[len("username_"):])
+        return usernames
+
+    def _reindex(self, usernames: Iterable[str]) -> None:
+        """Заново находит владельцев username после удаления или перезаписи записей.
+
+        Порядок как в _reload: первая запись с таким полем username,
+        иначе ключ username_xxx.
+        """
+        for username in set(usernames):
+            owner = next((
+                key for key, record in self._data.items()
+                if (record.get("username") or "").lower() == username
+            ), None)
+            if owner is None and f"username_{username}" in self._data:
+                owner = f"username_{username}"
+            if owner is None:
+                self._by_username.pop(username, None)
+            else:
+                self._by_username[username] = owner
+
+    def find(self, user_id: str, username: Optional[str]) -> Optional[str]:
+        """Отношение по user_id, а затем по username"""
+        self._refresh()
+        record = self._data.get(user_id)
+        if record is None and username:
+            key = self._by_username.get(username.lower())
+            record = self._data.get(key) if key else None
+        return record["relation"] if record else None
+
+    def items(self):
+        self._refresh()
+        return list(self._data.items())
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._data)
+
+    def set(self, user_identifier: str, relation: str) -> bool:
+        """Устанавливает отношение; возвращает результат сохранения"""
+        return self.set_many([user_identifier], relation)
+
+    def set_many(self, user_identifiers: Iterable[str], relation: str) -> bool:
+        """Устанавливает отношение сразу многим пользователям одной записью файла"""
+        self._refresh()
+        for user_identifier in user_identifiers:
+            storage_key, username = storage_key_for(user_identifier)
+            record = {"relation": relation, "username": username}
+            affected = self._usernames(storage_key, record)
+            if storage_key in self._data:
+                affected += self._usernames(storage_key, self._data[storage_key])
+            self._data[storage_key] = record
+            self._reindex(affected)
+        return self._save(self._data)
+
+    def remove(self, user_identifier: str) -> Optional[bool]:
+        """Удаляет отношения; None — пользователь не найден, иначе результат сохранения"""
+        removed, saved = self.remove_many([user_identifier])
+        return saved if removed else None
+
+    def remove_many(self, user_identifiers: Iterable[str]) -> Tuple[List[str], bool]:
+        """Удаляет отношения многих пользователей; возвращает (найденные, сохранено ли)"""
+        self._refresh()
+        removed = []
+        for user_identifier in user_identifiers:
+            keys = self._keys_for(user_identifier)
+            if not keys:
+                continue
+            affected = []
+            for key in keys:
+                affected += self._usernames(key, self._data.pop(key))
+            self._reindex(affected)
+            removed.append(user_identifier)
+        if not removed:
+            return removed, True
+        return removed, self._save(self._data)
+
+    def _keys_for(self, user_identifier: str):
+        if user_identifier.isdigit():
+            return [user_identifier] if user_identifier in self._data else []
+        lowered = user_identifier.lower()
+        keys = [
+            key for key, record in self._data.items()
+            if (record.get("username") or "").lower() == lowered
+        ]
+        username_key = f"username_{lowered}"
+        if username_key in self._data and username_key not in keys:
+            keys.append(username_key)
+        return keys
+
+
+class AdminRepository(_WatchedFile):
+    """Список администраторов из admin_data.json, закэшированный в памяти"""
+
+    def __init__(self, filename: str, main_admin: str, check_interval: float = 1.0):
+        super().__init__(filename, check_interval)
+        self.main_admin = main_admin.lower()
+        self._names = []
+        self._admins = frozenset()
+
+    def _reload(self, data: Dict[str, Any]) -> None:
+        self._names = list(data.get("admins", []))
+        self._admins = frozenset(a.lower() for a in self._names)
+
+    def is_admin(self, username: Optional[str]) -> bool:
+        if not username:
+            return False
+        self._refresh()
+        lowered = username.lower()
+        return lowered == self.main_admin or lowered in self._admins
+
+    def add(self, username: str) -> bool:
+        """Добавляет администратора; возвращает результат сохранения"""
+        self._refresh()
+        if username.lower() not in self._admins:
+            self._reload({"admins": self._names + [username]})
+        return self._save({"admins": self._names})
+
+    def remove(self, username: str) -> Optional[bool]:
+        """Удаляет администратора; None — его не было, иначе результат сохранения"""
+        self._refresh()
+        lowered = username.lower()
+        if lowered not in self._admins:
+            return None
+        self._reload({"admins": [name for name in self._names if name.lower() != lowered]})
+        return self._save({"admins": self._names})
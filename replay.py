@@ -0,0 +1,163 @@
+"""Журнал ходов и повтор игры.
+
+Игра с PieceRandom полностью определяется зерном и последовательностью
+действий, поэтому вместо истории полей хранится ActionLog: один байт на
+действие плюс время в виде разностей в миллисекундах (varint, обычно
+1–2 байта). Replay восстанавливает состояние на любом шаге, начиная с
+ближайшего ключевого кадра — снимка, сохраненного каждые N шагов.
+"""
+import struct
+import time
+
+from bitboard_tetris import ACTION_NAMES, BitboardTetris, PieceRandom
+
+# Заголовок журнала: версия, зерно, ширина, высота, время начала, число действий
+LOG_HEADER = struct.Struct("<BQBBdI")
+LOG_VERSION = 1
+
+
+def _write_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varints(data, count):
+    values = []
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        if len(values) == count:
+            break
+        value = shift = 0
+    if len(values) != count:
+        raise ValueError("Журнал обрезан: не хватает отметок времени")
+    return values
+
+
+class ActionLog:
+    """Журнал действий игры только на дозапись"""
+
+    __slots__ = ("seed", "width", "height", "started", "actions", "_deltas", "_last_ms")
+
+    def __init__(self, seed, width=10, height=20, started=None):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.started = time.time() if started is None else started
+        self.actions = bytearray()
+        self._deltas = bytearray()
+        self._last_ms = 0
+
+    def append(self, action, now=None) -> None:
+        now = time.time() if now is None else now
+        # Часы могут пойти назад — время в журнале при этом не убывает
+        elapsed_ms = max(self._last_ms, int((now - self.started) * 1000))
+        _write_varint(self._deltas, elapsed_ms - self._last_ms)
+        self._last_ms = elapsed_ms
+        self.actions.append(action)
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def timestamps(self):
+        """Время каждого действия в секундах от начала игры"""
+        elapsed = 0
+        result = []
+        for delta in _read_varints(self._deltas, len(self.actions)):
+            elapsed += delta
+            result.append(elapsed / 1000)
+        return result
+
+    def names(self):
+        return [ACTION_NAMES[action] for action in self.actions]
+
+    def new_game(self) -> BitboardTetris:
+        """Игра в начальном состоянии: с ней журнал и начинался"""
+        return BitboardTetris(self.width, self.height, rng=PieceRandom(self.seed))
+
+    # ===== СЕРИАЛИЗАЦИЯ =====
+    def to_bytes(self) -> bytes:
+        header = LOG_HEADER.pack(LOG_VERSION, self.seed, self.width, self.height,
+                                 self.started, len(self.actions))
+        return header + bytes(self.actions) + bytes(self._deltas)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        version, seed, width, height, started, count = LOG_HEADER.unpack_from(data)
+        if version != LOG_VERSION:
+            raise ValueError(f"Неизвестная версия журнала: {version}")
+        log = cls(seed, width, height, started)
+        offset = LOG_HEADER.size
+        log.actions = bytearray(data[offset:offset + count])
+        if len(log.actions) != count:
+            raise ValueError("Журнал обрезан: не хватает действий")
+        log._deltas = bytearray(data[offset + count:])
+        log._last_ms = sum(_read_varints(log._deltas, count)) if count else 0
+        return log
+
+
+def recorded_game(width=10, height=20, seed=None) -> BitboardTetris:
+    """Новая игра со своим зерном и журналом ходов"""
+    rng = PieceRandom(seed)
+    log = ActionLog(rng.state, width, height)
+    game = BitboardTetris(width, height, rng=rng)
+    game.log = log
+    return game
+
+
+class Replay:
+    """Повтор игры по журналу с ключевыми кадрами каждые keyframe_interval шагов.
+
+    Шаг n — состояние после первых n действий (шаг 0 — начало игры).
+    """
+
+    def __init__(self, log: ActionLog, keyframe_interval=64):
+        self.log = log
+        self.keyframe_interval = keyframe_interval
+        # Один проход по журналу: снимки (с состоянием ГСЧ) на каждом интервале
+        game = log.new_game()
+        self.keyframes = [game.to_bytes()]
+        for step, action in enumerate(log.actions, 1):
+            game.apply(action)
+            if step % keyframe_interval == 0:
+                self.keyframes.append(game.to_bytes())
+        self.final = game
+
+    def __len__(self) -> int:
+        return len(self.log)
+
+    def game_at(self, step) -> BitboardTetris:
+        """Отдельная копия игры на шаге step; не дольше keyframe_interval действий"""
+        step = max(0, min(step, len(self.log)))
+        index = step // self.keyframe_interval
+        game = BitboardTetris.from_bytes(self.keyframes[index])
+        for action in self.log.actions[index * self.keyframe_interval:step]:
+            game.apply(action)
+        return game
+
+    def frame_at(self, step):
+        """Строки поля с фигурой на шаге step (как frame_rows)"""
+        return self.game_at(step).frame_rows()
+
+    def games(self, start=0, stop=None, every=1):
+        """Последовательный проход: (шаг, игра) для каждого every-го шага.
+
+        Отдается один и тот же объект игры, его нельзя хранить между шагами.
+        """
+        stop = len(self.log) if stop is None else min(stop, len(self.log))
+        game = self.game_at(start)
+        for step in range(start, stop + 1):
+            if step > start:
+                game.apply(self.log.actions[step - 1])
+            if (step - start) % every == 0:
+                yield step, game
+
+    def matches(self, game) -> bool:
+        """Совпадает ли повтор с живой игрой (для разбора споров)"""
+        return self.final.to_bytes() == game.to_bytes()
@@ -0,0 +1,197 @@
+"""Повтор законченной игры анимацией GIF или WebP.
+
+Кадры рисует тот же BoardRenderer, что и поле в чате: одна игра проходит
+журнал ходов, и на каждом кадре перерисовываются только изменившиеся
+клетки. Одинаковые подряд кадры склеиваются в один с суммарной
+длительностью, все кадры в одной палитре (она пишется один раз), а
+кодировщики сохраняют только прямоугольник отличий от предыдущего кадра.
+Экспорт идёт в отдельном процессе с бюджетом на кадры, байты и время:
+по истечении срока процесс сам бросает работу и освобождается для
+следующего /replay.
+"""
+import asyncio
+import functools
+import io
+import logging
+import math
+import time
+
+from bitboard_tetris import RESET, game_status
+from replay import ActionLog, Replay
+
+logger = logging.getLogger(__name__)
+
+# Длительность кадра по реальному времени ходов, но без долгих пауз
+MIN_FRAME_MS = 60
+MAX_FRAME_MS = 1000
+LAST_FRAME_MS = 2500
+
+
+def game_bounds(log, stop=None):
+    """Шаги последней игры в журнале: от последнего сброса (RESET) до stop"""
+    stop = len(log) if stop is None else stop
+    return log.actions.rfind(RESET, 0, stop) + 1, stop
+
+
+def _check_deadline(deadline):
+    if deadline is not None and time.time() > deadline:
+        raise TimeoutError("Экспорт повтора не уложился в бюджет")
+
+
+def _distinct_steps(replay, start, stop, deadline=None):
+    """Шаги, на которых картинка отличается от предыдущей"""
+    steps = []
+    previous = None
+    for step, game in replay.games(start, stop):
+        _check_deadline(deadline)
+        key = (game.frame_rows(), game_status(game))
+        if key != previous:
+            steps.append(step)
+            previous = key
+    return steps
+
+
+def _durations(steps, times):
+    durations = []
+    for index, step in enumerate(steps):
+        if index + 1 < len(steps):
+            elapsed = (times[steps[index + 1]] - times[step]) * 1000
+            durations.append(int(min(MAX_FRAME_MS, max(MIN_FRAME_MS, elapsed))))
+        else:
+            durations.append(LAST_FRAME_MS)
+    return durations
+
+
+def _encode(images, durations, image_format):
+    buffer = io.BytesIO()
+    if image_format == "WEBP":
+        images[0].save(buffer, format="WEBP", save_all=True, append_images=images[1:],
+                       duration=durations, loop=0, lossless=True, minimize_size=True)
+    else:
+        # optimize=False: палитра не пересчитывается, у всех кадров она общая
+        images[0].save(buffer, format="GIF", save_all=True, append_images=images[1:],
+                       duration=durations, loop=0, disposal=1, optimize=False)
+    return buffer.getvalue()
+
+
+def render_animation(log_bytes, start=0, stop=None, image_format="GIF",
+                     max_frames=400, max_bytes=2_000_000, cell_size=16, deadline=None):
+    """Анимация шагов [start, stop] журнала; выполняется в процессе пула.
+
+    Если различающихся кадров больше max_frames, берется каждый k-й;
+    если файл вышел больше max_bytes, k удваивается и кадры кодируются заново.
+    Возвращает (байты, сведения об экспорте). Если deadline (time.time())
+    наступил, бросает TimeoutError.
+    """
+    # Pillow нужен только здесь, в процессе экспорта
+    from board_renderer import BoardRenderer
+
+    started = time.perf_counter()
+    log = ActionLog.from_bytes(log_bytes)
+    stop = len(log) if stop is None else min(stop, len(log))
+    replay = Replay(log)
+    # Время шага n — время n-го действия; шаг 0 — начало журнала
+    times = [0.0] + log.timestamps()
+    steps = _distinct_steps(replay, start, stop, deadline)
+    stride = max(1, math.ceil(len(steps) / max_frames))
+
+    while True:
+        kept = steps[::stride]
+        if kept[-1] != steps[-1]:
+            # Финальное поле показываем всегда
+            kept.append(steps[-1])
+        renderer = BoardRenderer(cell_size=cell_size, padding=cell_size // 2)
+        images = []
+        wanted = iter(kept)
+        next_step = next(wanted)
+        for step, game in replay.games(kept[0], kept[-1]):
+            _check_deadline(deadline)
+            if step == next_step:
+                images.append(renderer.render(game).copy())
+                next_step = next(wanted, None)
+        _check_deadline(deadline)
+        data = _encode(images, _durations(kept, times), image_format.upper())
+        if len(data) <= max_bytes or len(kept) <= 2:
+            break
+        stride *= 2
+
+    return data, {
+        "steps": stop - start,
+        "distinct_frames": len(steps),
+        "frames": len(kept),
+        "stride": stride,
+        "bytes": len(data),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+class ReplayExporter:
+    """Экспорт повторов в пуле процессов с жестким бюджетом времени"""
+
+    def __init__(self, workers=1, budget=15.0, image_format="GIF",
+                 max_frames=400, max_bytes=2_000_000):
+        self.workers = workers
+        self.budget = budget
+        self.image_format = image_format.upper()
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self._pool = None
+        self.exports = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.bytes_total = 0
+        self.last = {}
+
+    def start(self) -> None:
+        if self._pool is None:
+            # Как у подсказок: пул и multiprocessing загружаются при первом повторе
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def export(self, log, start=0, stop=None):
+        """Байты анимации или None, если не уложились в бюджет или экспорт не удался"""
+        self.start()
+        loop = asyncio.get_running_loop()
+        # Процесс сам прекращает экспорт чуть раньше бюджета: брошенный
+        # wait_for экспорт иначе держал бы процесс и все следующие /replay
+        deadline = time.time() + self.budget * 0.9
+        try:
+            future = loop.run_in_executor(self._pool, functools.partial(
+                render_animation, log.to_bytes(), start, stop, self.image_format,
+                max_frames=self.max_frames, max_bytes=self.max_bytes, deadline=deadline
+            ))
+            data, info = await asyncio.wait_for(future, self.budget)
+        except (asyncio.TimeoutError, TimeoutError):
+            self.timeouts += 1
+            logger.warning("Экспорт повтора не уложился в бюджет")
+            return None
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Ошибка экспорта повтора: {e}")
+            from concurrent.futures.process import BrokenProcessPool
+            if isinstance(e, BrokenProcessPool):
+                # Сломанный пул не принимает задач: следующий повтор поднимет новый
+                self.shutdown()
+            return None
+        self.exports += 1
+        self.bytes_total += len(data)
+        self.last = info
+        logger.info(f"Повтор готов: {info}")
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "exports": self.exports,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "bytes_total": self.bytes_total,
+            "last_frames": self.last.get("frames", 0),
+            "last_bytes": self.last.get("bytes", 0),
+            "last_seconds": self.last.get("seconds", 0.0),
+        }
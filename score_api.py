@@ -0,0 +1,267 @@
+"""Прием результатов веб-тетриса (tetris.html) в таблицу рекордов.
+
+tetris.html, открытый как Telegram WebApp, после конца игры отправляет
+POST /api/score с initData и итогом партии. Подпись initData проверяется
+по токену бота, и результат встает в ограниченную очередь. Отдельная задача
+пишет очередь в Leaderboard пачками, по одной транзакции на пачку, а не
+по записи на запрос. Если очередь полна, клиент получает 503 с
+Retry-After и повторяет позже.
+
+initData одна на весь сеанс WebApp, поэтому страница шлет еще game_id —
+случайный номер партии. Пара (пользователь, game_id) помнится, пока
+initData не устареет, и повторная отправка той же партии получает 409.
+Кроме того, у каждого пользователя свое ведро токенов: частые отправки
+получают 429 с Retry-After.
+
+Локально (initData подписывается тем же токеном, что у бота):
+
+    curl -X POST -d '{"init_data": "...", "game_id": "g1", "score": 1200, "lines": 12, "level": 2}' \\
+         http://localhost:8080/api/score
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import math
+import time
+from urllib.parse import parse_qsl
+
+from http_server import Response
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Страница может лежать на другом домене (githack), поэтому ответы с CORS
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+    "Access-Control-Expose-Headers": "Retry-After",
+}
+
+# Больше за одну партию в веб-тетрисе не набрать
+MAX_SCORE = 10_000_000
+MAX_LINES = 100_000
+MAX_GAME_ID = 64
+
+
+def validate_init_data(init_data, token, max_age=86400, now=None):
+    """Поля initData WebApp, если подпись верна и данные не старше max_age секунд; иначе None.
+
+    Проверка по документации Telegram: secret = HMAC_SHA256("WebAppData", token),
+    hash = HMAC_SHA256(secret, отсортированные "ключ=значение" через \\n без hash).
+    """
+    try:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError:
+        return None
+    received_hash = fields.pop("hash", "")
+    check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", token.encode(), hashlib.sha256).digest()
+    expected = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received_hash):
+        return None
+
+    now = time.time() if now is None else now
+    try:
+        auth_date = int(fields.get("auth_date", 0))
+    except ValueError:
+        return None
+    if now - auth_date > max_age:
+        return None
+    for key in ("user", "chat", "receiver"):
+        if key in fields:
+            try:
+                fields[key] = json.loads(fields[key])
+            except ValueError:
+                return None
+    return fields
+
+
+def _bounded_int(value, limit):
+    # bool — подкласс int, но счетом не считается
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= limit:
+        raise ValueError(f"Недопустимое значение: {value!r}")
+    return value
+
+
+class ScoreSubmissions:
+    """HTTP-прием результатов и отложенная запись пачками"""
+
+    def __init__(self, leaderboard, token, path="/api/score", queue_size=10000,
+                 batch_size=500, flush_interval=1.0, max_age=86400,
+                 user_rate=0.1, user_burst=3):
+        self.leaderboard = leaderboard
+        self.token = token
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.queue_size = queue_size
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self._queue = None
+        self._task = None
+        # Выставляется, когда в очереди набралась целая пачка
+        self._batch_ready = None
+        # Пачка, собираемая сейчас: уже вынута из очереди, но еще не записана
+        self._batch = []
+        # Принятые initData: ключ -> когда initData устареет (time.time())
+        self._seen = {}
+        self._next_prune = 0.0
+        self._user_buckets = {}
+
+        self.accepted = 0
+        self.rejected_full = 0
+        self.rejected_invalid = 0
+        self.rejected_auth = 0
+        self.rejected_duplicate = 0
+        self.rejected_rate = 0
+        self.flushed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch = 0
+
+    def register(self, server) -> None:
+        server.route("POST", self.path, self.handle)
+        server.route("OPTIONS", self.path, self.handle_options)
+
+    async def handle_options(self, request) -> Response:
+        return Response(204, headers=CORS_HEADERS, content_type=None)
+
+    async def handle(self, request) -> Response:
+        try:
+            payload = json.loads(request.body)
+            init_data = payload["init_data"]
+            score = _bounded_int(payload["score"], MAX_SCORE)
+            lines = _bounded_int(payload.get("lines", 0), MAX_LINES)
+            level = _bounded_int(payload.get("level", 1), MAX_LINES)
+            game_id = payload.get("game_id")
+            if not isinstance(init_data, str):
+                raise ValueError("init_data должен быть строкой")
+            if game_id is not None and (not isinstance(game_id, str) or not 0 < len(game_id) <= MAX_GAME_ID):
+                raise ValueError(f"Недопустимый game_id: {game_id!r}")
+        except (ValueError, TypeError, KeyError) as e:
+            self.rejected_invalid += 1
+            logger.debug(f"Некорректный результат: {e}")
+            return Response(400, "Bad Request", CORS_HEADERS)
+
+        fields = validate_init_data(init_data, self.token, self.max_age)
+        user = fields.get("user") if fields else None
+        if not isinstance(user, dict) or "id" not in user:
+            self.rejected_auth += 1
+            return Response(403, "Forbidden", CORS_HEADERS)
+
+        now = time.time()
+        self._prune(now)
+        # Старые страницы без game_id ограничивает только ведро пользователя
+        replay_key = (user["id"], game_id) if game_id is not None else None
+        if replay_key is not None and replay_key in self._seen:
+            self.rejected_duplicate += 1
+            return Response(409, "Conflict", CORS_HEADERS)
+        bucket = self._user_buckets.get(user["id"])
+        if bucket is None:
+            bucket = self._user_buckets[user["id"]] = TokenBucket(self.user_rate, self.user_burst)
+        wait = bucket.delay()
+        if wait > 0:
+            self.rejected_rate += 1
+            return Response(429, "Too Many Requests", {**CORS_HEADERS, "Retry-After": str(math.ceil(wait))})
+
+        # Из меню вложений приходит чат; из кнопки в личке — только пользователь,
+        # и личный чат с ботом имеет тот же id
+        chat = fields.get("chat")
+        chat_id = chat["id"] if isinstance(chat, dict) and "id" in chat else user["id"]
+        name = " ".join(part for part in (user.get("first_name"), user.get("last_name")) if part) or None
+        entry = (chat_id, user["id"], name, score, lines, level, now)
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.rejected_full += 1
+            return Response(503, "Busy", {**CORS_HEADERS, "Retry-After": "1"})
+        # Отмечаем только принятое: повтор после 503 не считается дублем
+        if replay_key is not None:
+            self._seen[replay_key] = int(fields.get("auth_date", 0)) + self.max_age
+        bucket.try_acquire()
+        self.accepted += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return Response(202, "Accepted", CORS_HEADERS)
+
+    def _prune(self, now) -> None:
+        """Раз в минуту забывает партии с устаревшей initData и простаивающие ведра"""
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        self._seen = {key: expires for key, expires in self._seen.items() if expires >= now}
+        for user_id in [user_id for user_id, bucket in self._user_buckets.items() if bucket.idle()]:
+            del self._user_buckets[user_id]
+
+    # ===== ОТЛОЖЕННАЯ ЗАПИСЬ =====
+    def _ensure_started(self) -> None:
+        # Очередь и задача создаются в цикле событий HTTP-сервера при первом запросе:
+        # так прием работает и во фронтальном процессе шардирования
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+            self._batch_ready = asyncio.Event()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while True:
+            self._batch.append(await self._queue.get())
+            # Копим пачку flush_interval секунд с первой записи или пока не наберется batch_size
+            if self._queue.qsize() < self.batch_size - 1:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._batch_ready.clear()
+            while len(self._batch) < self.batch_size and not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            batch, self._batch = self._batch, []
+            self._write(batch)
+
+    def _write(self, batch) -> None:
+        try:
+            self.leaderboard.record_many(batch)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Не удалось записать {len(batch)} результатов: {e}")
+            return
+        self.batches += 1
+        self.flushed += len(batch)
+        self.last_batch = len(batch)
+
+    async def stop(self) -> None:
+        """Останавливает запись и сохраняет всё, что осталось в очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        batch, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            self._write(batch)
+
+    def stats(self) -> dict:
+        return {
+            "accepted": self.accepted,
+            "rejected_full": self.rejected_full,
+            "rejected_invalid": self.rejected_invalid,
+            "rejected_auth": self.rejected_auth,
+            "rejected_duplicate": self.rejected_duplicate,
+            "rejected_rate": self.rejected_rate,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_batch": self.last_batch,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "remembered_games": len(self._seen),
+        }
@@ -0,0 +1,330 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from telegram import Bot, Update
+from telegram.error import TelegramError
+
+from http_server import Response
+from webhook import UpdateWorkerPool, stop_event_on_signals
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 10.0
+# Сколько ждать готовности только что запущенного воркера
+STARTUP_TIMEOUT = 60.0
+# Как часто воркер сбрасывает игры на диск, чтобы их можно было передать другому шарду
+CHECKPOINT_INTERVAL = 10.0
+# Сколько ждать подтверждений от шардов при смене состава
+RELEASE_TIMEOUT = 3.0
+
+
+def shard_for(chat_id, shards):
+    """Владелец чата среди живых шардов (rendezvous hashing).
+
+    При выпадении шарда переезжают только его чаты, при возвращении —
+    только они же возвращаются обратно.
+    """
+    def weight(shard_id):
+        digest = hashlib.blake2b(f"{chat_id}:{shard_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+    return max(shards, key=weight)
+
+
+# ===== ВОРКЕР =====
+def worker_main(shard_id, inbox, outbox, make_worker, shards):
+    """Точка входа процесса-воркера.
+
+    make_worker — функция модуля бота (передается по имени при spawn),
+    принимает число шардов, чтобы поделить между ними общий лимит бота,
+    и возвращает (application, games, edit_scheduler, gravity) этого процесса.
+    """
+    asyncio.run(_worker_loop(shard_id, inbox, outbox, make_worker, shards))
+
+
+async def _worker_loop(shard_id, inbox, outbox, make_worker, shards):
+    application, games, edit_scheduler, gravity = make_worker(shards)
+    membership = [shard_id]
+
+    def release_if_moved(update):
+        # Чат уже принадлежит другому шарду — сразу сохраняем игру для него
+        chat = update.effective_chat
+        if chat is not None and shard_for(chat.id, membership) != shard_id:
+            edit_scheduler.cancel(chat.id)
+            games.hibernate(chat.id)
+
+    pool = UpdateWorkerPool(
+        application,
+        workers=int(os.getenv("SHARD_WORKERS", 8)),
+        on_processed=release_if_moved
+    )
+
+    async def heartbeat():
+        last_checkpoint = time.monotonic()
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                games.flush()
+                last_checkpoint = time.monotonic()
+            if not multiprocessing.parent_process().is_alive():
+                # Фронт умер, не остановив шард: сохраняем игры и выходим сами
+                inbox.put(("stop",))
+            outbox.put(("heartbeat", shard_id, {
+                **pool.stats(),
+                "resident_games": len(games),
+                "gravity": gravity.stats(),
+                "pid": os.getpid(),
+            }))
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    pool.start()
+    heartbeat_task = asyncio.create_task(heartbeat())
+    outbox.put(("ready", shard_id, os.getpid()))
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            kind = message[0]
+            if kind == "update":
+                await pool.submit(Update.de_json(message[1], application.bot))
+            elif kind == "membership":
+                _, epoch, shards = message
+                membership = list(shards)
+                released = games.hibernate_where(lambda chat_id: shard_for(chat_id, membership) != shard_id)
+                outbox.put(("released", shard_id, epoch, released))
+            elif kind == "stop":
+                break
+    finally:
+        heartbeat_task.cancel()
+        await pool.stop()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
+
+
+# ===== ФРОНТ =====
+class _Shard:
+    def __init__(self, shard_id):
+        self.id = shard_id
+        self.process = None
+        self.inbox = None
+        self.ready = False
+        self.started_at = 0.0
+        self.last_heartbeat = 0.0
+        self.restarts = 0
+        self.routed = 0
+        self.report = {}
+
+
+class ShardSupervisor:
+    """Запускает воркеров, следит за их здоровьем и распределяет чаты"""
+
+    def __init__(self, num_shards, make_worker):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.make_worker = make_worker
+        self.outbox = self.ctx.Queue()
+        self.shards = {shard_id: _Shard(shard_id) for shard_id in range(num_shards)}
+        # Шарды, по которым сейчас маршрутизируются обновления
+        self.routing = []
+        self.epoch = 0
+        self._pending = None  # (epoch, новый состав, ожидаемые подтверждения, срок)
+
+    def start_shard(self, shard):
+        shard.inbox = self.ctx.Queue()
+        # Не демон: у воркера свой пул процессов подсказок, а демонам дочерние процессы запрещены
+        shard.process = self.ctx.Process(
+            target=worker_main,
+            args=(shard.id, shard.inbox, self.outbox, self.make_worker, len(self.shards)),
+            name=f"shard-{shard.id}"
+        )
+        shard.ready = False
+        shard.started_at = time.monotonic()
+        shard.last_heartbeat = shard.started_at
+        shard.process.start()
+        logger.info(f"Запущен шард {shard.id} (pid {shard.process.pid})")
+
+    def start(self):
+        for shard in self.shards.values():
+            self.start_shard(shard)
+
+    def route(self, update) -> None:
+        shards = self.routing or [s.id for s in self.shards.values() if s.ready]
+        if not shards:
+            logger.warning(f"Нет живых шардов, обновление {update.update_id} отброшено")
+            return
+        chat = update.effective_chat
+        key = chat.id if chat is not None else update.update_id
+        shard = self.shards[shard_for(key, shards)]
+        shard.inbox.put(("update", update.to_dict()))
+        shard.routed += 1
+
+    def _change_membership(self, shards):
+        """Рассылает новый состав шардов.
+
+        Если шард добавился, часть чатов переезжает к нему: маршрутизация
+        переключается, когда прежние владельцы подтвердят, что сбросили
+        эти игры на диск (или по таймауту). Если шард выпал, остальные
+        только получают чаты, поэтому переключаемся сразу.
+        """
+        self.epoch += 1
+        shards = sorted(shards)
+        waiting = set()
+        for shard in self.shards.values():
+            if shard.ready:
+                shard.inbox.put(("membership", self.epoch, shards))
+                waiting.add(shard.id)
+        waiting &= set(self.routing)
+        if set(shards) <= set(self.routing) or not waiting:
+            self.routing = shards
+            self._pending = None
+            logger.info(f"Состав шардов: {shards}")
+        else:
+            self._pending = (self.epoch, shards, waiting, time.monotonic() + RELEASE_TIMEOUT)
+
+    def _target(self):
+        """Состав, к которому идёт переключение (или текущий)"""
+        return set(self._pending[1]) if self._pending else set(self.routing)
+
+    def _handle_message(self, message):
+        kind, shard_id = message[0], message[1]
+        shard = self.shards[shard_id]
+        if kind == "ready":
+            shard.ready = True
+            shard.last_heartbeat = time.monotonic()
+            self._change_membership(self._target() | {shard_id})
+        elif kind == "heartbeat":
+            shard.last_heartbeat = time.monotonic()
+            shard.report = message[2]
+        elif kind == "released" and self._pending and message[2] == self._pending[0]:
+            self._pending[2].discard(shard_id)
+
+    async def monitor(self):
+        while True:
+            while True:
+                try:
+                    self._handle_message(self.outbox.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._pending and (not self._pending[2] or time.monotonic() > self._pending[3]):
+                self.routing = self._pending[1]
+                self._pending = None
+                logger.info(f"Состав шардов: {self.routing}")
+
+            now = time.monotonic()
+            for shard in self.shards.values():
+                alive = shard.process.is_alive()
+                timeout = HEARTBEAT_TIMEOUT if shard.ready else STARTUP_TIMEOUT
+                stale = now - shard.last_heartbeat > timeout
+                if alive and not stale:
+                    continue
+                logger.error(f"Шард {shard.id} не отвечает (alive={alive}), перезапуск")
+                if alive:
+                    shard.process.terminate()
+                shard.ready = False
+                shard.restarts += 1
+                # Чаты упавшего шарда сразу уходят к остальным
+                if shard.id in self._target() or shard.id in self.routing:
+                    self._change_membership(self._target() - {shard.id})
+                self.start_shard(shard)
+
+            await asyncio.sleep(0.5)
+
+    def stop(self):
+        for shard in self.shards.values():
+            if shard.process.is_alive():
+                shard.inbox.put(("stop",))
+        for shard in self.shards.values():
+            shard.process.join(timeout=10)
+            if shard.process.is_alive():
+                logger.error(f"Шард {shard.id} не остановился, завершаем принудительно")
+                shard.process.terminate()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "epoch": self.epoch,
+            "routing": self.routing,
+            "shards": {
+                shard.id: {
+                    "alive": shard.process.is_alive() if shard.process else False,
+                    "ready": shard.ready,
+                    "restarts": shard.restarts,
+                    "routed": shard.routed,
+                    "heartbeat_age_s": round(now - shard.last_heartbeat, 1),
+                    **shard.report,
+                }
+                for shard in self.shards.values()
+            },
+        }
+
+
+async def run_front(http_server, make_worker, token, base_url, scores=None, leaderboard=None, shards=2):
+    """Фронтальный процесс: long polling и маршрутизация обновлений по шардам.
+
+    scores и leaderboard — прием результатов веб-тетриса, который обслуживает
+    HTTP-сервер фронта: при остановке очередь дописывается, база закрывается.
+    """
+    supervisor = ShardSupervisor(shards, make_worker)
+    supervisor.start()
+
+    async def shard_stats(request):
+        return Response(200, json.dumps(supervisor.stats()), content_type="application/json")
+
+    http_server.route("GET", "/shards", shard_stats)
+    await http_server.start()
+
+    stop_event = stop_event_on_signals()
+    monitor_task = asyncio.create_task(supervisor.monitor())
+
+    async def report():
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"Нагрузка по шардам: {supervisor.stats()}")
+
+    report_task = asyncio.create_task(report())
+
+    telegram_bot = Bot(token, base_url=base_url)
+    await telegram_bot.initialize()
+    await telegram_bot.delete_webhook()
+    offset = None
+    try:
+        while not stop_event.is_set():
+            try:
+                poll = asyncio.create_task(telegram_bot.get_updates(
+                    offset=offset, timeout=30, allowed_updates=Update.ALL_TYPES
+                ))
+                stop_wait = asyncio.create_task(stop_event.wait())
+                done, _ = await asyncio.wait({poll, stop_wait}, return_when=asyncio.FIRST_COMPLETED)
+                stop_wait.cancel()
+                if poll not in done:
+                    poll.cancel()
+                    break
+                for update in poll.result():
+                    supervisor.route(update)
+                    offset = update.update_id + 1
+            except TelegramError as e:
+                logger.error(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(1)
+    finally:
+        monitor_task.cancel()
+        report_task.cancel()
+        supervisor.stop()
+        await telegram_bot.shutdown()
+        await http_server.stop()
+        # Результаты веб-тетриса принимает фронтальный процесс — дописываем очередь
+        if scores is not None:
+            await scores.stop()
+        if leaderboard is not None:
+            leaderboard.close()
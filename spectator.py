@@ -0,0 +1,261 @@
+"""Зрители чужих игр в тетрис: /share, /watch, /unwatch.
+
+Каждый кадр наблюдаемой игры рендерится один раз (через общий FrameCache)
+и загружается в Telegram не больше одного раза. Если владелец видит поле
+картинкой, кадр уже загружен и у него есть file_id. Иначе кадр загружает
+первый зритель, остальные ждут его file_id. Дальше кадр по file_id
+расходится по сообщениям зрителей, одновременно не больше max_concurrency
+правок. У каждого зрителя хранится только последний непоказанный кадр:
+медленный зритель пропускает промежуточные кадры, а не копит очередь.
+
+Зрители живут в памяти процесса. В режиме шардирования смотреть можно
+игры, которые обслуживает тот же шард.
+"""
+import asyncio
+import logging
+import secrets
+
+from telegram import InputMediaPhoto
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from edit_scheduler import GROUP_CHAT_RATE, PRIVATE_CHAT_RATE
+from rate_limit import TokenBucket, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+def _message_gone(error) -> bool:
+    """BadRequest о том, что сообщения зрителя больше нет"""
+    text = str(error).lower()
+    return "message to edit not found" in text or "message not found" in text
+
+
+def spectator_caption(text) -> str:
+    return f"👀 {text}"
+
+
+class Viewer:
+    """Сообщение зрителя и последний кадр, который ему еще нужно показать"""
+
+    __slots__ = ("chat_id", "message_id", "shown", "pending", "task", "bucket")
+
+    def __init__(self, chat_id, message_id, shown=None):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        # (ключ кадра, подпись) в сообщении сейчас
+        self.shown = shown
+        # (ключ кадра, кадр, подпись), ждущий отправки; новый кадр заменяет старый
+        self.pending = None
+        self.task = None
+        rate = GROUP_CHAT_RATE if chat_id < 0 else PRIVATE_CHAT_RATE
+        self.bucket = TokenBucket(rate, capacity=1)
+
+
+class FanoutStats:
+    """Счетчики рассылки одной игры"""
+
+    __slots__ = ("frames", "edits", "uploads", "dropped", "retries", "errors")
+
+    def __init__(self):
+        self.frames = self.edits = self.uploads = self.dropped = self.retries = self.errors = 0
+
+
+class SpectatorHub:
+    def __init__(self, frame_cache, max_viewers=50, max_concurrency=8, global_bucket=None):
+        self.frame_cache = frame_cache
+        self.max_viewers = max_viewers
+        self.max_concurrency = max_concurrency
+        # Общее с планировщиком правок ведро: вместе не больше ~30 запросов в секунду
+        self.global_bucket = global_bucket
+        # chat_id игры -> {chat_id зрителя: Viewer}
+        self._viewers = {}
+        # chat_id зрителя -> chat_id игры
+        self._watching = {}
+        # Код приглашения <-> chat_id игры
+        self._codes = {}
+        self._code_of = {}
+        self._fanout = {}
+        # Ключ кадра -> Future загрузки, которую выполняет первый зритель
+        self._uploads = {}
+        self._semaphore = None
+
+        self.edits = 0
+        self.uploads = 0
+        self.dropped = 0
+        self.errors = 0
+
+    # ===== ПРИГЛАШЕНИЯ И ЗРИТЕЛИ =====
+    def share(self, chat_id) -> str:
+        """Код, по которому можно смотреть игру чата (один на чат)"""
+        code = self._code_of.get(chat_id)
+        if code is None:
+            code = secrets.token_urlsafe(6)
+            self._codes[code] = chat_id
+            self._code_of[chat_id] = code
+        return code
+
+    def game_for(self, code):
+        return self._codes.get(code)
+
+    def can_watch(self, game_chat_id) -> bool:
+        return len(self._viewers.get(game_chat_id, ())) < self.max_viewers
+
+    def add_viewer(self, game_chat_id, chat_id, message_id, shown=None) -> None:
+        """Регистрирует сообщение зрителя; прежняя игра зрителя перестает транслироваться ему"""
+        self.remove_viewer(chat_id)
+        self._viewers.setdefault(game_chat_id, {})[chat_id] = Viewer(chat_id, message_id, shown)
+        self._watching[chat_id] = game_chat_id
+        self._fanout.setdefault(game_chat_id, FanoutStats())
+
+    def remove_viewer(self, chat_id):
+        """Отписывает зрителя; chat_id игры, которую он смотрел, или None"""
+        game_chat_id = self._watching.pop(chat_id, None)
+        if game_chat_id is None:
+            return None
+        viewers = self._viewers.get(game_chat_id, {})
+        viewer = viewers.pop(chat_id, None)
+        if viewer is not None and viewer.task is not None and viewer.task is not asyncio.current_task():
+            viewer.task.cancel()
+        if not viewers:
+            self._viewers.pop(game_chat_id, None)
+            self._fanout.pop(game_chat_id, None)
+        return game_chat_id
+
+    def close(self, game_chat_id) -> int:
+        """Игра закрыта: код больше не действует, зрители отписаны; возвращает их число"""
+        code = self._code_of.pop(game_chat_id, None)
+        if code is not None:
+            del self._codes[code]
+        viewers = list(self._viewers.get(game_chat_id, ()))
+        for chat_id in viewers:
+            self.remove_viewer(chat_id)
+        return len(viewers)
+
+    def watched(self, game_chat_id) -> bool:
+        return game_chat_id in self._viewers
+
+    def watching(self, chat_id):
+        return self._watching.get(chat_id)
+
+    # ===== РАССЫЛКА =====
+    def publish(self, bot, game_chat_id, frame_key, frame, text) -> None:
+        """Новый кадр игры: каждому зрителю уйдет последний кадр на момент его отправки"""
+        viewers = self._viewers.get(game_chat_id)
+        if not viewers:
+            return
+        fanout = self._fanout[game_chat_id]
+        fanout.frames += 1
+        caption = spectator_caption(text)
+        for viewer in viewers.values():
+            if viewer.shown == (frame_key, caption):
+                continue
+            if viewer.pending is not None:
+                # Зритель не успел получить прошлый кадр — он уже не нужен
+                fanout.dropped += 1
+                self.dropped += 1
+            viewer.pending = (frame_key, frame, caption)
+            if viewer.task is None:
+                viewer.task = asyncio.create_task(self._deliver(bot, game_chat_id, viewer, fanout))
+
+    async def _deliver(self, bot, game_chat_id, viewer, fanout):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            while viewer.pending is not None:
+                await viewer.bucket.acquire()
+                if self.global_bucket is not None:
+                    await self.global_bucket.acquire()
+                frame_key, frame, caption = viewer.pending
+                viewer.pending = None
+                try:
+                    async with self._semaphore:
+                        await self._edit(bot, viewer, frame_key, frame, caption, fanout)
+                    viewer.shown = (frame_key, caption)
+                except RetryAfter as e:
+                    delay = retry_after_seconds(e)
+                    fanout.retries += 1
+                    viewer.bucket.block(delay)
+                    # Повторяем, если за это время не пришел кадр свежее
+                    if viewer.pending is None:
+                        viewer.pending = (frame_key, frame, caption)
+                except (BadRequest, Forbidden) as e:
+                    if "not modified" in str(e).lower():
+                        viewer.shown = (frame_key, caption)
+                        continue
+                    if isinstance(e, Forbidden) or _message_gone(e):
+                        # Сообщение удалили или бота убрали из чата — зритель ушел
+                        logger.info(f"Зритель {viewer.chat_id} отписан: {e}")
+                        self.remove_viewer(viewer.chat_id)
+                        return
+                    # Прочие BadRequest — ошибка кадра, а не ушедший зритель
+                    fanout.errors += 1
+                    self.errors += 1
+                    logger.error(f"Не удалось показать игру {game_chat_id} зрителю {viewer.chat_id}: {e}")
+                except Exception as e:
+                    fanout.errors += 1
+                    self.errors += 1
+                    logger.error(f"Ошибка при показе игры {game_chat_id} зрителю {viewer.chat_id}: {e}")
+        finally:
+            viewer.task = None
+
+    async def _edit(self, bot, viewer, frame_key, frame, caption, fanout):
+        if frame.file_id is None:
+            upload = self._uploads.get(frame_key)
+            if upload is not None:
+                # Кадр уже загружает другой зритель — ждем его file_id
+                await asyncio.shield(upload)
+        if frame.file_id is None:
+            await self._upload(bot, viewer, frame_key, frame, caption, fanout)
+        else:
+            try:
+                await self._send(bot, viewer, frame.file_id, caption)
+            except BadRequest as e:
+                if "not modified" in str(e).lower() or _message_gone(e):
+                    raise
+                # file_id больше не принимается — один раз загружаем кадр заново
+                logger.warning(f"Не удалось показать кадр по file_id: {e}")
+                self.frame_cache.forget_file_id(frame_key)
+                frame.file_id = None
+                await self._upload(bot, viewer, frame_key, frame, caption, fanout)
+        fanout.edits += 1
+        self.edits += 1
+
+    async def _upload(self, bot, viewer, frame_key, frame, caption, fanout):
+        upload = self._uploads[frame_key] = asyncio.get_running_loop().create_future()
+        try:
+            message = await self._send(bot, viewer, frame.data, caption)
+            self.frame_cache.remember_file_id(frame_key, message)
+            fanout.uploads += 1
+            self.uploads += 1
+        finally:
+            upload.set_result(None)
+            if self._uploads.get(frame_key) is upload:
+                del self._uploads[frame_key]
+
+    @staticmethod
+    async def _send(bot, viewer, media, caption):
+        return await bot.edit_message_media(
+            chat_id=viewer.chat_id,
+            message_id=viewer.message_id,
+            media=InputMediaPhoto(media=media, caption=caption)
+        )
+
+    def stats(self) -> dict:
+        return {
+            "games_watched": len(self._viewers),
+            "viewers": len(self._watching),
+            "edits": self.edits,
+            "uploads": self.uploads,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+    def game_stats(self):
+        """Счетчики рассылки по играм: {chat_id игры: {...}}"""
+        return {
+            game_chat_id: {
+                "viewers": len(self._viewers.get(game_chat_id, ())),
+                **{name: getattr(fanout, name) for name in FanoutStats.__slots__},
+            }
+            for game_chat_id, fanout in self._fanout.items()
+        }
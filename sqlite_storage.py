@@ -0,0 +1,200 @@
+"""Хранилища отношений и администраторов в SQLite (STORAGE_BACKEND=sqlite).
+
+user_relations.json и admin_data.json переносятся в базу один раз, при
+первом запуске; после этого файлы не читаются, и их правки боту не видны.
+Отношения меняются командами /setuser и /removeuser, администраторы —
+командами /addadmin и /removeadmin.
+"""
+import logging
+import sqlite3
+from typing import Iterable, List, Optional, Tuple
+
+from relation_repo import load_data, storage_key_for
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS relations (
+    storage_key TEXT PRIMARY KEY,
+    relation TEXT NOT NULL,
+    username TEXT,
+    username_lower TEXT
+);
+CREATE INDEX IF NOT EXISTS relations_username ON relations (username_lower);
+CREATE TABLE IF NOT EXISTS admins (
+    username_lower TEXT PRIMARY KEY,
+    username TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Открывает базу в режиме WAL и создаёт таблицы при необходимости"""
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _relation_row(storage_key: str, record: dict) -> tuple:
+    username = record.get("username")
+    if username:
+        username_lower = username.lower()
+    elif storage_key.startswith("username_"):
+        username_lower = storage_key[len("username_"):]
+    else:
+        username_lower = None
+    return storage_key, record["relation"], username, username_lower
+
+
+def migrate_json_to_sqlite(path: str, relations_file: str, admins_file: str) -> bool:
+    """Однократно переносит user_relations.json и admin_data.json в SQLite.
+
+    Понимает и старый ("user_id": "relation"), и новый формат — тот же,
+    что читает load_data. Возвращает True, если перенос выполнялся.
+    """
+    conn = connect(path)
+    try:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            return False
+
+        relations = load_data(relations_file)
+        admin_names = load_data(admins_file).get("admins", [])
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO relations (storage_key, relation, username, username_lower) "
+                "VALUES (?, ?, ?, ?)",
+                [_relation_row(key, record) for key, record in relations.items()]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO admins (username_lower, username) VALUES (?, ?)",
+                [(name.lower(), name) for name in admin_names]
+            )
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', datetime('now'))")
+        logger.info(f"Перенесено в SQLite: отношений {len(relations)}, администраторов {len(admin_names)}")
+        return True
+    finally:
+        conn.close()
+
+
+class SqliteRelationRepository:
+    """Отношения пользователей в SQLite; интерфейс как у RelationRepository"""
+
+    def __init__(self, path: str):
+        self._db = connect(path)
+
+    def find(self, user_id: str, username: Optional[str]) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT relation FROM relations WHERE storage_key = ?", (user_id,)
+        ).fetchone()
+        if row is None and username:
+            # Записи с явным username важнее ключей username_xxx
+            row = self._db.execute(
+                "SELECT relation FROM relations WHERE username_lower = ? "
+                "ORDER BY username IS NULL, rowid LIMIT 1",
+                (username.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def items(self):
+        return [
+            (key, {"relation": relation, "username": username})
+            for key, relation, username in self._db.execute(
+                "SELECT storage_key, relation, username FROM relations"
+            )
+        ]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM relations").fetchone()[0]
+
+    def set(self, user_identifier: str, relation: str) -> bool:
+        return self.set_many([user_identifier], relation)
+
+    def set_many(self, user_identifiers: Iterable[str], relation: str) -> bool:
+        """Устанавливает отношение многим пользователям в одной транзакции"""
+        rows = []
+        for user_identifier in user_identifiers:
+            storage_key, username = storage_key_for(user_identifier)
+            rows.append(_relation_row(storage_key, {"relation": relation, "username": username}))
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO relations (storage_key, relation, username, username_lower) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения отношений: {e}")
+            return False
+
+    def remove(self, user_identifier: str) -> Optional[bool]:
+        removed, saved = self.remove_many([user_identifier])
+        return saved if removed else None
+
+    def remove_many(self, user_identifiers: Iterable[str]) -> Tuple[List[str], bool]:
+        """Удаляет отношения многих пользователей в одной транзакции"""
+        removed = []
+        try:
+            with self._db:
+                for user_identifier in user_identifiers:
+                    if user_identifier.isdigit():
+                        cursor = self._db.execute(
+                            "DELETE FROM relations WHERE storage_key = ?", (user_identifier,)
+                        )
+                    else:
+                        cursor = self._db.execute(
+                            "DELETE FROM relations WHERE username_lower = ?", (user_identifier.lower(),)
+                        )
+                    if cursor.rowcount:
+                        removed.append(user_identifier)
+            return removed, True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления отношений: {e}")
+            return [], False
+
+
+class SqliteAdminRepository:
+    """Администраторы в SQLite; интерфейс как у AdminRepository"""
+
+    def __init__(self, path: str, main_admin: str):
+        self._db = connect(path)
+        self.main_admin = main_admin.lower()
+
+    def is_admin(self, username: Optional[str]) -> bool:
+        if not username:
+            return False
+        lowered = username.lower()
+        if lowered == self.main_admin:
+            return True
+        return self._db.execute(
+            "SELECT 1 FROM admins WHERE username_lower = ?", (lowered,)
+        ).fetchone() is not None
+
+    def add(self, username: str) -> bool:
+        try:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO admins (username_lower, username) VALUES (?, ?)",
+                    (username.lower(), username)
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка сохранения администратора: {e}")
+            return False
+
+    def remove(self, username: str) -> Optional[bool]:
+        try:
+            with self._db:
+                cursor = self._db.execute(
+                    "DELETE FROM admins WHERE username_lower = ?", (username.lower(),)
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Ошибка удаления администратора: {e}")
+            return False
+        return True if cursor.rowcount else None
@@ -0,0 +1,55 @@
+"""Время запуска бота по фазам.
+
+main.py импортирует этот модуль первым и отмечает фазы (импорт
+telegram, импорт модулей бота, конфигурация, сборка приложения,
+инициализация). Отчет пишется в лог после post_init и доступен на
+/metrics как bot_startup_*.
+"""
+import os
+import time
+
+
+def _process_age():
+    """Сколько секунд назад запущен процесс (по /proc, точность ~10 мс); None без /proc"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Имя процесса в скобках может содержать пробелы; starttime — 22-е поле
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases = []
+        age = _process_age()
+        if age is not None:
+            # Запуск интерпретатора и site до первой строки main.py
+            self.phases.append(("interpreter", max(0.0, age)))
+
+    def mark(self, phase) -> float:
+        """Закрывает фазу, начатую предыдущей отметкой; возвращает её длительность"""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases.append((phase, elapsed))
+        return elapsed
+
+    def total(self) -> float:
+        return sum(elapsed for _, elapsed in self.phases)
+
+    def report(self) -> str:
+        parts = ", ".join(f"{phase} {elapsed:.3f}" for phase, elapsed in self.phases)
+        return f"Запуск за {self.total():.3f} с: {parts}"
+
+    def stats(self) -> dict:
+        stats = {f"{phase}_seconds": round(elapsed, 4) for phase, elapsed in self.phases}
+        stats["total_seconds"] = round(self.total(), 4)
+        return stats
+
+
+STARTUP = StartupTimer()
@@ -0,0 +1,143 @@
+import gzip
+import hashlib
+import os
+import time
+
+from http_server import Response
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаём gzip
+    brotli = None
+
+# Только эти файлы доступны по HTTP
+GAME_FILES = {
+    "hearts.html": "text/html; charset=utf-8",
+    "tetris.html": "text/html; charset=utf-8",
+}
+
+CACHE_CONTROL = "public, max-age=300"
+
+
+class _Asset:
+    """Файл в памяти вместе с заранее сжатыми вариантами"""
+
+    def __init__(self, data: bytes, stamp, content_type: str):
+        self.stamp = stamp
+        self.content_type = content_type
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        # Для каждого варианта сжатия свой строгий ETag
+        self.variants = {"identity": (data, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(data, compresslevel=9, mtime=0), f'"{digest}-gz"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(data, quality=11), f'"{digest}-br"')
+
+
+class StaticFiles:
+    """Раздача HTML-игр из памяти: ETag/304, gzip и brotli, Range-запросы"""
+
+    def __init__(self, root=".", files=GAME_FILES, check_interval=2.0):
+        self.root = root
+        self.files = files
+        self.check_interval = check_interval
+        self._assets = {}
+        self._checked = {}
+        self.hits = 0
+        self.not_modified = 0
+
+    def _asset(self, name):
+        """Файл из кэша; перечитывается, только если изменился на диске"""
+        asset = self._assets.get(name)
+        now = time.monotonic()
+        if asset is not None and now - self._checked.get(name, 0.0) < self.check_interval:
+            return asset
+        self._checked[name] = now
+
+        path = os.path.join(self.root, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._assets.pop(name, None)
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if asset is None or asset.stamp != stamp:
+            with open(path, "rb") as f:
+                asset = _Asset(f.read(), stamp, self.files[name])
+            self._assets[name] = asset
+        return asset
+
+    @staticmethod
+    def _choose_encoding(asset, accept_encoding: str) -> str:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in accept_encoding.split(",")
+            if part.strip() and not part.strip().endswith("q=0")
+        }
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in asset.variants:
+                return encoding
+        return "identity"
+
+    @staticmethod
+    def _parse_range(header: str, size: int):
+        """Один диапазон bytes=start-end; None — заголовок не понят"""
+        if not header.startswith("bytes=") or "," in header:
+            return None
+        start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+        try:
+            if start_text:
+                start = int(start_text)
+                end = int(end_text) if end_text else size - 1
+            else:
+                # bytes=-N — последние N байт
+                start = max(0, size - int(end_text))
+                end = size - 1
+        except ValueError:
+            return None
+        return start, min(end, size - 1)
+
+    async def handle(self, request) -> Response:
+        name = request.path.lstrip("/")
+        if name not in self.files:
+            return Response(404, "Файл не найден")
+        asset = self._asset(name)
+        if asset is None:
+            return Response(404, "Файл не найден")
+
+        range_header = request.headers.get("range")
+        # Диапазоны отдаём только по несжатому варианту
+        encoding = "identity" if range_header else self._choose_encoding(
+            asset, request.headers.get("accept-encoding", "")
+        )
+        data, etag = asset.variants[encoding]
+        headers = {
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+            "Accept-Ranges": "bytes",
+        }
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+            self.not_modified += 1
+            return Response(304, b"", headers, content_type=None)
+
+        self.hits += 1
+        if range_header:
+            if_range = request.headers.get("if-range")
+            parsed = self._parse_range(range_header, len(data))
+            if parsed is not None and (not if_range or if_range == etag):
+                start, end = parsed
+                if start > end or start >= len(data):
+                    headers["Content-Range"] = f"bytes */{len(data)}"
+                    return Response(416, b"", headers, content_type=None)
+                headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+                return Response(206, data[start:end + 1], headers, asset.content_type)
+
+        return Response(200, data, headers, asset.content_type)
+
+    def register(self, server) -> None:
+        for name in self.files:
+            server.route("GET", f"/{name}", self.handle)
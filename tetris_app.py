@@ -1,163 +1,147 @@
 import pygame
-import random
 import sys
 import time
 
-class Tetris:
-    def __init__(self, width=10, height=20):
-        self.width = width
-        self.height = height
-        self.reset()
-
-    def reset(self):
-        self.board = [[0 for _ in range(self.width)] for _ in range(self.height)]
-        self.score = 0
-        self.level = 1
-        self.lines_cleared = 0
-        self.game_over = False
-        self.paused = False
-        self.new_piece()
-
-    def new_piece(self):
-        shapes = [
-            [[1, 1, 1, 1]],  # I
-            [[1, 1], [1, 1]],  # O
-            [[0, 1, 0], [1, 1, 1]],  # T
-            [[0, 1, 1], [1, 1, 0]],  # S
-            [[1, 1, 0], [0, 1, 1]],  # Z
-            [[1, 0, 0], [1, 1, 1]],  # J
-            [[0, 0, 1], [1, 1, 1]]   # L
-        ]
+from bitboard_tetris import game_status
+from tetris_engine import Tetris, status_font
 
-        self.current_piece = random.choice(shapes)
-        self.piece_x = self.width // 2 - len(self.current_piece[0]) // 2
-        self.piece_y = 0
-
-        if not self.is_valid_position():
-            self.game_over = True
-
-    def rotate_piece(self):
-        rotated = [[self.current_piece[y][x] 
-                  for y in range(len(self.current_piece)-1, -1, -1)] 
-                  for x in range(len(self.current_piece[0]))]
-
-        old_piece = self.current_piece
-        self.current_piece = rotated
-
-        if not self.is_valid_position():
-            self.current_piece = old_piece
-
-    def is_valid_position(self, x_offset=0, y_offset=0):
-        for y in range(len(self.current_piece)):
-            for x in range(len(self.current_piece[0])):
-                if self.current_piece[y][x]:
-                    pos_x, pos_y = self.piece_x + x + x_offset, self.piece_y + y + y_offset
-
-                    if (pos_x < 0 or pos_x >= self.width or 
-                        pos_y >= self.height or 
-                        (pos_y >= 0 and self.board[pos_y][pos_x])):
-                        return False
-        return True
-
-    def move(self, dx, dy):
-        if not self.paused and not self.game_over and self.is_valid_position(x_offset=dx, y_offset=dy):
-            self.piece_x += dx
-            self.piece_y += dy
-            return True
-        return False
-
-    def drop(self):
-        if not self.paused and not self.game_over and self.move(0, 1):
-            return True
-
-        if self.paused or self.game_over:
-            return False
-
-        for y in range(len(self.current_piece)):
-            for x in range(len(self.current_piece[0])):
-                if self.current_piece[y][x]:
-                    if 0 <= self.piece_y + y < self.height:
-                        self.board[self.piece_y + y][self.piece_x + x] = 1
-
-        self.clear_lines()
-        self.new_piece()
-        return False
-
-    def clear_lines(self):
-        lines_to_clear = []
-        for y in range(self.height):
-            if all(self.board[y]):
-                lines_to_clear.append(y)
-
-        for line in lines_to_clear:
-            del self.board[line]
-            self.board.insert(0, [0 for _ in range(self.width)])
-
-        cleared = len(lines_to_clear)
-        if cleared > 0:
-            self.lines_cleared += cleared
-            self.score += [0, 100, 300, 500, 800][min(cleared, 4)] * self.level
-            self.level = self.lines_cleared // 10 + 1
-
-    def draw(self, screen, cell_size=30, padding=20):
-        colors = [
-            (40, 40, 60),      # Пустая клетка
-            (255, 0, 0),       # Красный
-            (255, 255, 0),     # Желтый
-            (128, 0, 128),     # Фиолетовый
-            (0, 255, 0),       # Зеленый
-            (255, 165, 0),     # Оранжевый
-            (0, 0, 255),       # Синий
-            (0, 255, 255)      # Голубой
-        ]
+# Цвета как в Tetris.draw
+BACKGROUND = (40, 40, 60)
+GRID = (70, 70, 90)
+FILLED = (255, 0, 0)
+TEXT = (255, 255, 255)
+OVERLAY = (160, 220, 160)
+
+STATUS_TEXT = {"play": "🟢 Играем", "paused": "⏸ Пауза", "over": "🔴 Игра окончена"}
 
-        # Рисуем фон
-        screen.fill((40, 40, 60))
 
-        # Рисуем сетку
+class BoardView:
+    """Отрисовка поля грязными прямоугольниками.
+
+    Фон с пустой сеткой и плитки клеток рисуются один раз; за кадр
+    перерисовываются только клетки, изменившиеся с прошлого кадра
+    (по frame_rows), а текст состояния — только при смене счета, уровня,
+    линий или статуса. draw() возвращает прямоугольники для
+    pygame.display.update.
+    """
+
+    # Оверлей FPS обновляется не чаще, чем раз в OVERLAY_INTERVAL секунд
+    OVERLAY_INTERVAL = 0.5
+
+    def __init__(self, screen, width, height, cell_size=30, padding=20):
+        self.screen = screen
+        self.width = width
+        self.height = height
+        self.cell_size = cell_size
+        self.padding = padding
+
+        self._tiles = {False: self._make_tile(BACKGROUND), True: self._make_tile(FILLED)}
+        self._background = self._make_background()
+        self._font = status_font()
+        self._overlay_font = status_font(20)
+
+        self._info_rect = pygame.Rect(
+            padding, padding + height * cell_size + 10,
+            screen.get_width() - padding * 2, 4 * 35
+        )
+        # Оверлей FPS — в верхнем отступе над полем
+        self._overlay_rect = pygame.Rect(padding, 2, screen.get_width() - padding * 2, padding - 4)
+        self.show_overlay = True
+        self._overlay_text = None
+        self._overlay_time = 0.0
+
+        self.invalidate()
+
+    def _make_tile(self, color):
+        tile = pygame.Surface((self.cell_size, self.cell_size)).convert()
+        tile.fill(color)
+        pygame.draw.rect(tile, GRID, tile.get_rect(), 1)
+        return tile
+
+    def _make_background(self):
+        background = pygame.Surface(self.screen.get_size()).convert()
+        background.fill(BACKGROUND)
         for y in range(self.height):
             for x in range(self.width):
-                color_idx = self.board[y][x]
-                rect = pygame.Rect(
-                    padding + x * cell_size,
-                    padding + y * cell_size,
-                    cell_size, cell_size
-                )
-                pygame.draw.rect(screen, colors[color_idx], rect)
-                pygame.draw.rect(screen, (70, 70, 90), rect, 1)
-
-        # Рисуем текущую фигуру
-        if not self.game_over:
-            for y in range(len(self.current_piece)):
-                for x in range(len(self.current_piece[0])):
-                    if self.current_piece[y][x]:
-                        rect = pygame.Rect(
-                            padding + (self.piece_x + x) * cell_size,
-                            padding + (self.piece_y + y) * cell_size,
-                            cell_size, cell_size
-                        )
-                        pygame.draw.rect(screen, colors[1], rect)
-                        pygame.draw.rect(screen, (70, 70, 90), rect, 1)
-
-        # Рисуем информацию о игре
-        font = pygame.font.SysFont(None, 36)
-        status = "🟢 Играем" if not self.paused and not self.game_over else \
-                 "⏸ Пауза" if self.paused else \
-                 "🔴 Игра окончена"
-
+                background.blit(self._tiles[False], self._cell_origin(x, y))
+        return background
+
+    def _cell_origin(self, x, y):
+        return (self.padding + x * self.cell_size, self.padding + y * self.cell_size)
+
+    def invalidate(self) -> None:
+        """Следующий кадр рисуется целиком (первый кадр, окно перекрыли)"""
+        self._rows = None
+        self._info = None
+        self._overlay_text = None
+
+    def draw(self, tetris, fps=0.0, frame_ms=0.0) -> list:
+        """Рисует изменения с прошлого кадра; возвращает грязные прямоугольники"""
+        dirty = []
+        rows = tetris.frame_rows()
+        if self._rows is None:
+            self.screen.blit(self._background, (0, 0))
+            dirty.append(self.screen.get_rect())
+            previous = (0,) * len(rows)
+        else:
+            previous = self._rows
+
+        tiles = self._tiles
+        for y, (row, old_row) in enumerate(zip(rows, previous)):
+            changed = row ^ old_row
+            if not changed:
+                continue
+            # Один прямоугольник на строку: от первой до последней изменившейся клетки
+            first = (changed & -changed).bit_length() - 1
+            last = changed.bit_length() - 1
+            for x in range(first, last + 1):
+                if (changed >> x) & 1:
+                    self.screen.blit(tiles[bool((row >> x) & 1)], self._cell_origin(x, y))
+            left, top = self._cell_origin(first, y)
+            dirty.append(pygame.Rect(left, top, (last - first + 1) * self.cell_size, self.cell_size))
+        self._rows = rows
+
+        info = (tetris.score, tetris.level, tetris.lines_cleared, game_status(tetris))
+        if info != self._info:
+            self._info = info
+            dirty.append(self._draw_info(info))
+
+        now = time.monotonic()
+        if self._overlay_text is None or now - self._overlay_time >= self.OVERLAY_INTERVAL:
+            self._overlay_time = now
+            overlay = self._draw_overlay(fps, frame_ms)
+            if overlay is not None:
+                dirty.append(overlay)
+        return dirty
+
+    def _draw_info(self, info):
+        score, level, lines, status = info
         texts = [
-            f"Счет: {self.score}",
-            f"Уровень: {self.level}",
-            f"Линий: {self.lines_cleared}",
-            f"Статус: {status}"
+            f"Счет: {score}",
+            f"Уровень: {level}",
+            f"Линий: {lines}",
+            f"Статус: {STATUS_TEXT[status]}"
         ]
-
+        self.screen.blit(self._background, self._info_rect, self._info_rect)
         for i, text in enumerate(texts):
-            text_surface = font.render(text, True, (255, 255, 255))
-            screen.blit(text_surface, (padding, padding + self.height * cell_size + 10 + i * 35))
+            text_surface = self._font.render(text, True, TEXT)
+            self.screen.blit(text_surface, (self._info_rect.x, self._info_rect.y + i * 35))
+        return self._info_rect
+
+    def _draw_overlay(self, fps, frame_ms):
+        """FPS и время кадра; прямоугольник оверлея или None, если текст не изменился"""
+        text = f"FPS {fps:.0f}  кадр {frame_ms:.2f} мс" if self.show_overlay else ""
+        if text == self._overlay_text:
+            return None
+        self._overlay_text = text
+        self.screen.blit(self._background, self._overlay_rect, self._overlay_rect)
+        if text:
+            self.screen.blit(self._overlay_font.render(text, True, OVERLAY), self._overlay_rect)
+        return self._overlay_rect
+
 
 class TetrisApp:
-    def __init__(self, width=10, height=20):
+    def __init__(self, width=10, height=20, engine=Tetris, full_redraw=False):
         pygame.init()
         self.cell_size = 30
         self.padding = 20
@@ -166,10 +150,15 @@ class TetrisApp:
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height))
         pygame.display.set_caption("Тетрис")
 
-        self.tetris = Tetris(width, height)
+        self.tetris = engine(width, height)
         self.last_drop_time = time.time()
         self.drop_interval = 0.8  # Интервал падения в секундах
 
+        # full_redraw — старый путь (Tetris.draw и flip каждый кадр), для сравнения
+        self.full_redraw = full_redraw
+        self.view = None if full_redraw else BoardView(self.screen, width, height, self.cell_size, self.padding)
+        self.frame_ms = 0.0
+
         self.clock = pygame.time.Clock()
         self.running = True
 
@@ -177,6 +166,10 @@ class TetrisApp:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # Содержимое окна потеряно — перерисовываем всё
+                if self.view is not None:
+                    self.view.invalidate()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_LEFT:
                     self.tetris.move(-1, 0)
@@ -193,6 +186,10 @@ class TetrisApp:
                     self.tetris.paused = not self.tetris.paused
                 elif event.key == pygame.K_r:
                     self.tetris.reset()
+                elif event.key == pygame.K_f:
+                    if self.view is not None:
+                        self.view.show_overlay = not self.view.show_overlay
+                        self.view.invalidate()
                 elif event.key == pygame.K_ESCAPE:
                     self.running = False
 
@@ -202,6 +199,21 @@ class TetrisApp:
             self.tetris.drop()
             self.last_drop_time = current_time
 
+    def render(self):
+        """Рисует кадр; возвращает число перерисованных прямоугольников (0 — ничего)"""
+        started = time.perf_counter()
+        if self.full_redraw:
+            self.tetris.draw(self.screen, self.cell_size, self.padding)
+            pygame.display.flip()
+            self.frame_ms = (time.perf_counter() - started) * 1000
+            return 1
+
+        rects = self.view.draw(self.tetris, self.clock.get_fps(), self.frame_ms)
+        if rects:
+            pygame.display.update(rects)
+        self.frame_ms = (time.perf_counter() - started) * 1000
+        return len(rects)
+
     def run(self):
         while self.running:
             self.handle_events()
@@ -209,13 +221,17 @@ class TetrisApp:
             if not self.tetris.paused and not self.tetris.game_over:
                 self.update()
 
-            self.tetris.draw(self.screen, self.cell_size, self.padding)
-            pygame.display.flip()
+            self.render()
             self.clock.tick(60)
 
         pygame.quit()
         sys.exit()
 
 if __name__ == "__main__":
-    app = TetrisApp()
+    full_redraw = "--full-redraw" in sys.argv
+    if "--bitboard" in sys.argv:
+        from bitboard_tetris import BitboardTetris
+        app = TetrisApp(engine=BitboardTetris, full_redraw=full_redraw)
+    else:
+        app = TetrisApp(full_redraw=full_redraw)
     app.run()
@@ -0,0 +1,189 @@
+"""Движок тетриса на списках без зависимостей.
+
+Окно на pygame (TetrisApp) лежит в tetris_app.py; pygame импортируется
+только внутри draw(), поэтому движок можно загружать на сервере бота.
+"""
+import random
+
+# Шрифты по размеру: SysFont ищет шрифт в системе, это дорого делать каждый кадр
+_fonts = {}
+
+
+def status_font(size=36):
+    import pygame
+    if not _fonts:
+        # После pygame.quit() шрифты недействительны
+        pygame.register_quit(_fonts.clear)
+    font = _fonts.get(size)
+    if font is None:
+        font = _fonts[size] = pygame.font.SysFont(None, size)
+    return font
+
+
+class Tetris:
+    def __init__(self, width=10, height=20):
+        self.width = width
+        self.height = height
+        self.reset()
+
+    def reset(self):
+        self.board = [[0 for _ in range(self.width)] for _ in range(self.height)]
+        self.score = 0
+        self.level = 1
+        self.lines_cleared = 0
+        self.game_over = False
+        self.paused = False
+        self.new_piece()
+
+    def new_piece(self):
+        shapes = [
+            [[1, 1, 1, 1]],  # I
+            [[1, 1], [1, 1]],  # O
+            [[0, 1, 0], [1, 1, 1]],  # T
+            [[0, 1, 1], [1, 1, 0]],  # S
+            [[1, 1, 0], [0, 1, 1]],  # Z
+            [[1, 0, 0], [1, 1, 1]],  # J
+            [[0, 0, 1], [1, 1, 1]]   # L
+        ]
+
+        self.current_piece = random.choice(shapes)
+        self.piece_x = self.width // 2 - len(self.current_piece[0]) // 2
+        self.piece_y = 0
+
+        if not self.is_valid_position():
+            self.game_over = True
+
+    def rotate_piece(self):
+        rotated = [[self.current_piece[y][x] 
+                  for y in range(len(self.current_piece)-1, -1, -1)] 
+                  for x in range(len(self.current_piece[0]))]
+
+        old_piece = self.current_piece
+        self.current_piece = rotated
+
+        if not self.is_valid_position():
+            self.current_piece = old_piece
+
+    def is_valid_position(self, x_offset=0, y_offset=0):
+        for y in range(len(self.current_piece)):
+            for x in range(len(self.current_piece[0])):
+                if self.current_piece[y][x]:
+                    pos_x, pos_y = self.piece_x + x + x_offset, self.piece_y + y + y_offset
+
+                    if (pos_x < 0 or pos_x >= self.width or 
+                        pos_y >= self.height or 
+                        (pos_y >= 0 and self.board[pos_y][pos_x])):
+                        return False
+        return True
+
+    def move(self, dx, dy):
+        if not self.paused and not self.game_over and self.is_valid_position(x_offset=dx, y_offset=dy):
+            self.piece_x += dx
+            self.piece_y += dy
+            return True
+        return False
+
+    def drop(self):
+        if not self.paused and not self.game_over and self.move(0, 1):
+            return True
+
+        if self.paused or self.game_over:
+            return False
+
+        for y in range(len(self.current_piece)):
+            for x in range(len(self.current_piece[0])):
+                if self.current_piece[y][x]:
+                    if 0 <= self.piece_y + y < self.height:
+                        self.board[self.piece_y + y][self.piece_x + x] = 1
+
+        self.clear_lines()
+        self.new_piece()
+        return False
+
+    def clear_lines(self):
+        lines_to_clear = []
+        for y in range(self.height):
+            if all(self.board[y]):
+                lines_to_clear.append(y)
+
+        for line in lines_to_clear:
+            del self.board[line]
+            self.board.insert(0, [0 for _ in range(self.width)])
+
+        cleared = len(lines_to_clear)
+        if cleared > 0:
+            self.lines_cleared += cleared
+            self.score += [0, 100, 300, 500, 800][min(cleared, 4)] * self.level
+            self.level = self.lines_cleared // 10 + 1
+
+    def frame_rows(self):
+        """Строки поля вместе с фигурой битовыми масками, как у BitboardTetris.frame_rows"""
+        rows = [sum(1 << x for x, cell in enumerate(row) if cell) for row in self.board]
+        if not self.game_over:
+            for y, line in enumerate(self.current_piece):
+                row_y = self.piece_y + y
+                if 0 <= row_y < self.height:
+                    for x, cell in enumerate(line):
+                        if cell:
+                            rows[row_y] |= 1 << (self.piece_x + x)
+        return tuple(rows)
+
+    def draw(self, screen, cell_size=30, padding=20):
+        # pygame нужен только окну TetrisApp; бот и тесты движка обходятся без него
+        import pygame
+
+        colors = [
+            (40, 40, 60),      # Пустая клетка
+            (255, 0, 0),       # Красный
+            (255, 255, 0),     # Желтый
+            (128, 0, 128),     # Фиолетовый
+            (0, 255, 0),       # Зеленый
+            (255, 165, 0),     # Оранжевый
+            (0, 0, 255),       # Синий
+            (0, 255, 255)      # Голубой
+        ]
+
+        # Рисуем фон
+        screen.fill((40, 40, 60))
+
+        # Рисуем сетку
+        for y in range(self.height):
+            for x in range(self.width):
+                color_idx = self.board[y][x]
+                rect = pygame.Rect(
+                    padding + x * cell_size,
+                    padding + y * cell_size,
+                    cell_size, cell_size
+                )
+                pygame.draw.rect(screen, colors[color_idx], rect)
+                pygame.draw.rect(screen, (70, 70, 90), rect, 1)
+
+        # Рисуем текущую фигуру
+        if not self.game_over:
+            for y in range(len(self.current_piece)):
+                for x in range(len(self.current_piece[0])):
+                    if self.current_piece[y][x]:
+                        rect = pygame.Rect(
+                            padding + (self.piece_x + x) * cell_size,
+                            padding + (self.piece_y + y) * cell_size,
+                            cell_size, cell_size
+                        )
+                        pygame.draw.rect(screen, colors[1], rect)
+                        pygame.draw.rect(screen, (70, 70, 90), rect, 1)
+
+        # Рисуем информацию о игре
+        font = status_font()
+        status = "🟢 Играем" if not self.paused and not self.game_over else \
+                 "⏸ Пауза" if self.paused else \
+                 "🔴 Игра окончена"
+
+        texts = [
+            f"Счет: {self.score}",
+            f"Уровень: {self.level}",
+            f"Линий: {self.lines_cleared}",
+            f"Статус: {status}"
+        ]
+
+        for i, text in enumerate(texts):
+            text_surface = font.render(text, True, (255, 255, 255))
+            screen.blit(text_surface, (padding, padding + self.height * cell_size + 10 + i * 35))
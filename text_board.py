@@ -0,0 +1,39 @@
+"""Поле тетриса текстом из эмодзи — режим без картинок.
+
+Сообщение обновляется через edit_message_text: ни рендера, ни
+кодирования, ни загрузки кадра, а сам текст — около килобайта.
+"""
+from functools import lru_cache
+
+from bitboard_tetris import ROTATIONS, game_status
+
+# Клетки для каждого статуса игры: пусто, лежащий блок, падающая фигура
+CELLS = {
+    "play": ("⬛", "🟥", "🟨"),
+    "paused": ("⬛", "🟫", "🟫"),
+    "over": ("⬛", "⬜", "⬜"),
+}
+
+
+@lru_cache(maxsize=4096)
+def _row_text(locked, piece, width, status):
+    # Строк с разными масками немного: почти все берутся из кэша
+    empty, block, active = CELLS[status]
+    return "".join(
+        active if piece >> x & 1 else block if locked >> x & 1 else empty
+        for x in range(width)
+    )
+
+
+def render_text(tetris) -> str:
+    """Сетка эмодзи и строки состояния, как подпись к картинке"""
+    status = game_status(tetris)
+    piece_rows = {}
+    if not tetris.game_over:
+        for dy, mask in enumerate(ROTATIONS[tetris.kind][tetris.rotation][1]):
+            piece_rows[tetris.piece_y + dy] = mask << tetris.piece_x
+    grid = "\n".join(
+        _row_text(row, piece_rows.get(y, 0), tetris.width, status)
+        for y, row in enumerate(tetris.rows)
+    )
+    return f"{grid}\n\n{tetris.get_state_text()}"
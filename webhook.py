@@ -0,0 +1,226 @@
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import signal
+import time
+from collections import deque
+
+from telegram import Update
+from telegram.error import TelegramError
+
+from http_server import Response
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class UpdateWorkerPool:
+    """Пул воркеров, обрабатывающих обновления с сохранением порядка в чате.
+
+    Каждый воркер владеет своей очередью, а чат всегда попадает в одну и
+    ту же очередь, поэтому обновления одного чата обрабатываются по порядку,
+    а разные чаты — параллельно.
+    """
+
+    def __init__(self, application, workers=8, queue_size=10000, on_processed=None):
+        self.application = application
+        self.queues = [asyncio.Queue(maxsize=max(1, queue_size // workers)) for _ in range(workers)]
+        # Вызывается после обработки каждого обновления
+        self.on_processed = on_processed
+        self._tasks = []
+        self.received = 0
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+        # Последние задержки от приёма до конца обработки, в мс
+        self.latencies = deque(maxlen=2048)
+
+    def _queue_for(self, update):
+        chat = update.effective_chat
+        key = chat.id if chat is not None else update.update_id
+        return self.queues[hash(key) % len(self.queues)]
+
+    def try_submit(self, update) -> bool:
+        """Ставит обновление в очередь; False — очередь переполнена"""
+        try:
+            self._queue_for(update).put_nowait((time.monotonic(), update))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.received += 1
+        return True
+
+    async def submit(self, update) -> None:
+        """Ставит обновление в очередь, дожидаясь места"""
+        await self._queue_for(update).put((time.monotonic(), update))
+        self.received += 1
+
+    async def _worker(self, queue) -> None:
+        while True:
+            received_at, update = await queue.get()
+            try:
+                await self.application.process_update(update)
+                self.processed += 1
+                if self.on_processed is not None:
+                    self.on_processed(update)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+            finally:
+                self.latencies.append((time.monotonic() - received_at) * 1000)
+                queue.task_done()
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    async def stop(self) -> None:
+        """Дожидается обработки принятых обновлений и останавливает воркеров"""
+        for queue in self.queues:
+            await queue.join()
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return {
+            "queue_depth": self.queue_depth(),
+            "workers": len(self.queues),
+            "received": self.received,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "latency_ms_p50": round(percentile(latencies, 0.5), 3),
+            "latency_ms_p95": round(percentile(latencies, 0.95), 3),
+            "latency_ms_p99": round(percentile(latencies, 0.99), 3),
+        }
+
+
+class WebhookReceiver:
+    """Приём обновлений через вебхук и их передача в UpdateWorkerPool.
+
+    Без секрета любой мог бы прислать поддельное обновление (в том числе
+    админскую команду), поэтому секрет обязателен: им же закрыта и
+    статистика пула. Локально можно проверить так:
+
+        curl -X POST -H 'X-Telegram-Bot-Api-Secret-Token: <secret>' \\
+             -d @update.json http://localhost:8080/telegram
+        curl -H 'X-Telegram-Bot-Api-Secret-Token: <secret>' http://localhost:8080/telegram/stats
+    """
+
+    def __init__(self, application, secret_token, path="/telegram", workers=8, queue_size=10000):
+        if not secret_token:
+            raise ValueError("Для вебхука нужен secret_token")
+        self.application = application
+        self.secret_token = secret_token
+        self.path = path
+        self.pool = UpdateWorkerPool(application, workers, queue_size)
+
+    def register(self, server) -> None:
+        server.route("POST", self.path, self.handle)
+        server.route("GET", f"{self.path}/stats", self.handle_stats)
+
+    def _authorized(self, request) -> bool:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        return hmac.compare_digest(token.encode(), self.secret_token.encode())
+
+    async def handle(self, request) -> Response:
+        if not self._authorized(request):
+            return Response(403, "Forbidden")
+        try:
+            update = Update.de_json(json.loads(request.body), self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Некорректное обновление: {e}")
+            return Response(400, "Bad Request")
+
+        if not self.pool.try_submit(update):
+            # Telegram повторит доставку позже
+            return Response(503, "Busy", {"Retry-After": "1"})
+        return Response(200, "OK")
+
+    async def handle_stats(self, request) -> Response:
+        if not self._authorized(request):
+            return Response(403, "Forbidden")
+        return Response(200, json.dumps(self.stats()), content_type="application/json")
+
+    def start(self) -> None:
+        self.pool.start()
+
+    async def stop(self) -> None:
+        await self.pool.stop()
+
+    def stats(self) -> dict:
+        return self.pool.stats()
+
+
+def stop_event_on_signals() -> asyncio.Event:
+    """Событие, которое выставляется по SIGINT/SIGTERM"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    return stop_event
+
+
+async def run_webhook(application, http_server, url=None, secret_token=None, workers=8, queue_size=10000):
+    """Запускает бота в режиме вебхука.
+
+    Без url вебхук в Telegram не регистрируется (локальная проверка).
+    Если зарегистрировать вебхук не удалось, бот переходит на long polling.
+    Без secret_token генерируется случайный секрет и передается Telegram
+    в set_webhook; для локальной проверки секрет нужно задать явно.
+    """
+    if not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        logger.warning("WEBHOOK_SECRET не задан: сгенерирован случайный секрет для этого запуска")
+    receiver = WebhookReceiver(application, secret_token, workers=workers, queue_size=queue_size)
+    receiver.register(http_server)
+    application.bot_data["webhook"] = receiver
+
+    stop_event = stop_event_on_signals()
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    receiver.start()
+
+    polling = False
+    if url:
+        try:
+            await application.bot.set_webhook(
+                url=url.rstrip("/") + receiver.path,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Вебхук установлен: {url}")
+        except TelegramError as e:
+            logger.error(f"Не удалось установить вебхук ({e}), переходим на polling")
+            await application.bot.delete_webhook()
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            polling = True
+
+    try:
+        await stop_event.wait()
+    finally:
+        if polling:
+            await application.updater.stop()
+        await receiver.stop()
+        await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()